@@ -0,0 +1,118 @@
+import os
+import time
+import random
+import difflib
+import argparse
+from captioner.florence import FlorenceCaptioner, PROFILES, DETAIL_LEVELS, MODELS, DEFAULT_MODEL, IMAGE_EXTENSIONS, load_image
+
+# Runs every generation profile over the same sample of a dataset and
+# reports throughput next to how far each profile's captions drift from the
+# reference profile's (word-level similarity, identical captions, length).
+#
+#   python -m benchmarks.bench_caption_profiles --dataset path/to/dataset --samples 32
+#   python -m benchmarks.bench_caption_profiles --dataset path/to/dataset --detail "Short,More Detailed" --report profiles.md
+#
+# The model runs in this process; stop the caption server first if the GPU
+# cannot hold two copies.
+
+def word_similarity(caption, reference):
+    return difflib.SequenceMatcher(None, caption.lower().split(), reference.lower().split()).ratio()
+
+def run_profile(captioner, images, detail_level, profile, batch_size):
+    # (seconds, captions); images are already decoded so only generation is timed
+    captions = []
+    start = time.perf_counter()
+    for batch_start in range(0, len(images), batch_size):
+        captions += captioner.caption_images(images[batch_start:batch_start + batch_size], detail_level, profile)
+    return time.perf_counter() - start, captions
+
+def summarize(seconds, captions, reference_seconds, reference_captions):
+    similarities = [word_similarity(caption, reference) for caption, reference in zip(captions, reference_captions)]
+    return {
+        "images_per_second": len(captions) / seconds,
+        "speedup": reference_seconds / seconds,
+        "words": sum(len(caption.split()) for caption in captions) / len(captions),
+        "similarity": sum(similarities) / len(similarities),
+        "identical": sum(caption == reference for caption, reference in zip(captions, reference_captions)) / len(captions),
+    }
+
+def format_row(cells, widths):
+    return " ".join(f"{cell:<{width}}" if index == 0 else f"{cell:>{width}}" for index, (cell, width) in enumerate(zip(cells, widths)))
+
+def write_report(path, args, results, names):
+    # Markdown: the summary table, then every sample's captions side by side
+    lines = [f"# Caption profiles: Florence-2 {args.model}, {len(names)} images, batch size {args.batch_size}", ""]
+    lines += ["| Detail | Profile | Images/s | Speedup | Words | Similarity | Identical |", "|---|---|---:|---:|---:|---:|---:|"]
+    for detail_level, profiles in results.items():
+        for profile, (summary, _) in profiles.items():
+            lines.append(f"| {detail_level} | {profile} | {summary['images_per_second']:.2f} | {summary['speedup']:.2f}x | "
+                         f"{summary['words']:.1f} | {summary['similarity']:.2f} | {summary['identical']:.0%} |")
+    for detail_level, profiles in results.items():
+        lines += ["", f"## {detail_level}"]
+        for index, name in enumerate(names):
+            lines += ["", f"### {name}", ""]
+            for profile, (_, captions) in profiles.items():
+                lines.append(f"- **{profile}**: {captions[index]}")
+    with open(path, 'w', encoding='utf-8') as report_file:
+        report_file.write("\n".join(lines) + "\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare caption generation profiles on a sample of a dataset.")
+    parser.add_argument("--dataset", required=True, help="Folder of images to sample")
+    parser.add_argument("--samples", type=int, default=16)
+    parser.add_argument("--detail", default="Short", help=f"Comma-separated detail levels: {', '.join(DETAIL_LEVELS)}")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma-separated profiles to compare")
+    parser.add_argument("--reference", default="Quality", help="Profile the others are compared against")
+    parser.add_argument("--model", choices=list(MODELS), default=DEFAULT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", help="Write a Markdown report with every caption to this file")
+    args = parser.parse_args()
+
+    detail_levels = [value.strip() for value in args.detail.split(",") if value.strip()]
+    profiles = [value.strip() for value in args.profiles.split(",") if value.strip()]
+    for value in detail_levels:
+        if value not in DETAIL_LEVELS:
+            parser.error(f"Unknown detail level: {value}")
+    for value in profiles + [args.reference]:
+        if value not in PROFILES:
+            parser.error(f"Unknown profile: {value}")
+    if args.reference not in profiles:
+        profiles.append(args.reference)
+
+    paths = sorted(os.path.join(args.dataset, name) for name in os.listdir(args.dataset) if name.lower().endswith(IMAGE_EXTENSIONS))
+    random.Random(args.seed).shuffle(paths)
+    paths = sorted(paths[:args.samples])
+    if not paths:
+        parser.error(f"No images in {args.dataset}")
+    images = [load_image(path) for path in paths]
+    names = [os.path.basename(path) for path in paths]
+
+    print(f"Loading Florence-2 {args.model}...")
+    captioner = FlorenceCaptioner(args.model)
+    # Warm-up, so CUDA initialization is not billed to the first profile
+    captioner.caption_images(images[:1], "Short", profiles[0])
+
+    widths = (14, 10, 9, 8, 7, 11, 10)
+    print(format_row(("detail", "profile", "images/s", "speedup", "words", "similarity", "identical"), widths))
+    results = {}
+    for detail_level in detail_levels:
+        reference_seconds, reference_captions = run_profile(captioner, images, detail_level, args.reference, args.batch_size)
+        results[detail_level] = {}
+        for profile in profiles:
+            if profile == args.reference:
+                seconds, captions = reference_seconds, reference_captions
+            else:
+                seconds, captions = run_profile(captioner, images, detail_level, profile, args.batch_size)
+            summary = summarize(seconds, captions, reference_seconds, reference_captions)
+            results[detail_level][profile] = (summary, captions)
+            print(format_row((detail_level, profile, f"{summary['images_per_second']:.2f}", f"{summary['speedup']:.2f}x",
+                              f"{summary['words']:.1f}", f"{summary['similarity']:.2f}", f"{summary['identical']:.0%}"), widths))
+
+    print(f"Similarity is word-level (1.00 = same words in the same order) against {args.reference}.")
+    if args.report:
+        write_report(args.report, args, results, names)
+        print(f"Captions written to {args.report}")
+
+if __name__ == "__main__":
+    main()
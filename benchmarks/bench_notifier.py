@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import logging
+import asyncio
+import argparse
+import tempfile
+from statistics import median
+from PIL import Image
+from watchdog.events import FileClosedEvent, FileModifiedEvent
+from telegram_monitor import OutputFolderHandler, process_queue
+from monitor.roots import MonitorRoot, RootRouter
+from monitor.notifier import TelegramNotifier
+from monitor.image_pipeline import ImageRecompressor
+from benchmarks.fake_bot_api import FakeBotApi, FaultProfile
+
+# Replays a burst of output-folder events through the monitor's event
+# handler, queue, coalescer and notifier against the local fake Bot API, and
+# reports end-to-end latency and throughput. Events are synthetic watchdog
+# events, so filtering, log tailing and metrics parsing are measured too.
+#
+#   python -m benchmarks.bench_notifier --bursts 3 --latency 0.2 --rate-limit-every 7
+
+# One sampling step: five prompt images plus a stream of progress lines
+DEFAULT_BURST = (
+    [{"at": 0.1 * i, "type": "image", "prompt_index": i} for i in range(5)] +
+    [{"at": 0.1 * i, "type": "log", "line": f"step progress {i}"} for i in range(20)]
+)
+
+# Per-line "Log update" messages would bury the report
+logging.getLogger("telegram_monitor").setLevel(logging.WARNING)
+
+def load_events(path):
+    if not path:
+        return DEFAULT_BURST
+    with open(path, 'r') as events_file:
+        return json.load(events_file)
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def write_sample(path, size):
+    Image.effect_noise((size, size), 64).convert("RGB").save(path, "PNG")
+
+async def run_benchmark(args):
+    api = FakeBotApi(faults=FaultProfile(args.latency, args.jitter, args.rate_limit_every, args.retry_after, args.failure_rate, seed=1)).start()
+    work_folder = tempfile.mkdtemp(prefix="bench_notifier_")
+    samples_folder = os.path.join(work_folder, "output", "bench_run", "samples")
+    os.makedirs(samples_folder)
+    log_file = os.path.join(work_folder, "output", "bench_run", "training.log")
+    open(log_file, 'w').close()
+
+    recompressor = None if args.no_recompress else ImageRecompressor(cache_folder=os.path.join(work_folder, "cache"))
+    notifier = TelegramNotifier("123456:BENCH", 42, recompressor, base_url=api.base_url)
+    await notifier.start()
+    queue = asyncio.Queue()
+    router = RootRouter([MonitorRoot(os.path.join(work_folder, "output"))])
+    handler = OutputFolderHandler(asyncio.get_running_loop(), queue, router)
+    worker = asyncio.create_task(process_queue(queue, notifier, args.concurrency,
+                                               log_window=args.log_window, image_window=args.image_window))
+
+    events = load_events(args.events)
+    expected = {}  # tag -> publish time
+    log_tags = []
+    final_log_tags = set()  # Coalescing guarantees delivery only for each burst's last line
+    start = time.monotonic()
+    for burst in range(args.bursts):
+        step = (burst + 1) * 250
+        # Sample files are written up front so only notification cost is measured
+        scheduled = []
+        for index, event in enumerate(events):
+            if event["type"] == "image":
+                path = os.path.join(samples_folder, f"1700000000000__{step:09d}_{event['prompt_index']}.png")
+                write_sample(path, args.image_size)
+                scheduled.append((event["at"], ('image', path), os.path.splitext(os.path.basename(path))[0]))
+            else:
+                tag = f"[event {burst}:{index}]"
+                scheduled.append((event["at"], ('log', f"{event['line']} {tag}"), tag))
+
+        scheduled.sort(key=lambda entry: entry[0])
+        burst_log_tags = [tag for _, event, tag in scheduled if event[0] == 'log']
+        if burst_log_tags:
+            final_log_tags.add(burst_log_tags[-1])
+
+        burst_start = time.monotonic()
+        for at, event, tag in scheduled:
+            delay = burst_start + at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if event[0] == 'log':
+                # The trainer appends the line, then watchdog reports the modification
+                with open(log_file, 'a') as log:
+                    log.write(event[1] + "\n")
+                expected[tag] = time.monotonic()
+                log_tags.append(tag)
+                handler.on_modified(FileModifiedEvent(log_file))
+            else:
+                expected[tag] = time.monotonic()
+                handler.on_closed(FileClosedEvent(event[1]))
+        await asyncio.sleep(args.burst_interval)
+
+    # Wait until every image and the final log line of each burst arrived
+    deadline = time.monotonic() + args.timeout
+    delivered = {}
+    while time.monotonic() < deadline:
+        delivered = match_deliveries(api.requests, expected)
+        images = {tag for tag in expected if tag not in log_tags}
+        if images.union(final_log_tags) <= set(delivered):
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.monotonic() - start
+
+    worker.cancel()
+    try:
+        await worker
+    except asyncio.CancelledError:
+        pass
+    await notifier.close()
+    api.stop()
+    report(args, api.requests, expected, delivered, log_tags, elapsed)
+
+def match_deliveries(requests, expected):
+    # tag -> first successful delivery time
+    delivered = {}
+    for request in list(requests):
+        if request.status != 200:
+            continue
+        haystack = " ".join([str(value) for value in request.fields.values()] +
+                            [filename for _, filename, _ in request.files])
+        for tag in expected:
+            if tag not in delivered and tag in haystack:
+                delivered[tag] = request.received_at
+    return delivered
+
+def report(args, requests, expected, delivered, log_tags, elapsed):
+    methods = {}
+    for request in requests:
+        methods[request.method] = methods.get(request.method, 0) + 1
+    throttled = sum(1 for request in requests if request.status == 429)
+    failed = sum(1 for request in requests if request.status >= 500)
+    uploaded = sum(size for request in requests for _, _, size in request.files)
+
+    image_latencies = [delivered[tag] - expected[tag] for tag in expected if tag in delivered and tag not in log_tags]
+    log_latencies = [delivered[tag] - expected[tag] for tag in log_tags if tag in delivered]
+    events = len(expected)
+    missing = [tag for tag in expected if tag not in log_tags and tag not in delivered]
+
+    print(f"Events replayed: {events} in {args.bursts} bursts; elapsed {elapsed:.2f}s")
+    print(f"API requests: {len(requests)} ({', '.join(f'{m}={n}' for m, n in sorted(methods.items()))}); "
+          f"429s={throttled}, 5xx={failed}, uploaded {uploaded / 1024:.0f} KB")
+    print(f"Throughput: {events / elapsed:.1f} events/s, {len(requests) / elapsed:.1f} requests/s")
+    for name, latencies in (("Image", image_latencies), ("Log line", log_latencies)):
+        if latencies:
+            print(f"{name} latency: p50={median(latencies):.3f}s p95={percentile(latencies, 0.95):.3f}s "
+                  f"max={max(latencies):.3f}s (n={len(latencies)})")
+    print(f"Log lines coalesced away: {len(log_tags) - len(log_latencies)} of {len(log_tags)}")
+    if missing:
+        print(f"Images not delivered before timeout: {len(missing)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Telegram notifier against a local fake Bot API.")
+    parser.add_argument("--events", help="JSON list of {at, type: image|log, prompt_index|line}; defaults to one sampling step")
+    parser.add_argument("--bursts", type=int, default=3)
+    parser.add_argument("--burst-interval", type=float, default=1.0)
+    parser.add_argument("--image-size", type=int, default=1024)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--log-window", type=float, default=1.0)
+    parser.add_argument("--image-window", type=float, default=0.5)
+    parser.add_argument("--no-recompress", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
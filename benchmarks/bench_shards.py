@@ -0,0 +1,102 @@
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from dataset.shards import export_shards, list_images, caption_path_for
+from dataset.shard_reader import ShardReader
+
+# Compares reading a dataset as loose image + caption files against reading
+# the same samples from shards, sequentially and by random key. Only bytes
+# are read (no decoding), so the numbers are pure I/O.
+#
+#   python -m benchmarks.bench_shards --dataset path/to/dataset
+#   python -m benchmarks.bench_shards --samples 20000 --image-kb 200
+#
+# Run it against the network share to see the open() cost; on a local disk
+# a warm page cache hides most of it.
+
+def make_dataset(folder, samples, image_kb):
+    os.makedirs(folder)
+    for i in range(samples):
+        with open(os.path.join(folder, f"sample_{i:06d}.png"), 'wb') as image_file:
+            image_file.write(os.urandom(random.randint(image_kb * 512, image_kb * 1536)))
+        with open(os.path.join(folder, f"sample_{i:06d}.txt"), 'w') as caption_file:
+            caption_file.write(f"a photo of sample {i}")
+
+def read_loose(image_paths):
+    files = 0
+    total = 0
+    for img_path in image_paths:
+        with open(img_path, 'rb') as image_file:
+            total += len(image_file.read())
+        files += 1
+        caption_path = caption_path_for(img_path)
+        if os.path.exists(caption_path):
+            with open(caption_path, 'rb') as caption_file:
+                total += len(caption_file.read())
+            files += 1
+    return files, total
+
+def read_sequential(reader):
+    files = 0
+    total = 0
+    for _, sample in reader.iter_samples():
+        files += len(sample)
+        total += sum(len(data) for data in sample.values())
+    return files, total
+
+def read_random(reader, keys):
+    files = 0
+    total = 0
+    for key in keys:
+        sample = reader.get(key)
+        files += len(sample)
+        total += sum(len(data) for data in sample.values())
+    return files, total
+
+def measure(label, func, *args):
+    start = time.perf_counter()
+    files, total = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<20} {files:>8} files {elapsed:>8.2f} s {files / elapsed:>10.0f} files/s {total / elapsed / 1e6:>8.1f} MB/s")
+    return files / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare loose-file and sharded dataset read throughput.")
+    parser.add_argument("--dataset", help="Captioned image folder; a synthetic one is generated if omitted")
+    parser.add_argument("--shards", help="Shard folder to (re)use; defaults to a temporary folder")
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--image-kb", type=int, default=100)
+    parser.add_argument("--shard-size-mb", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    work_folder = tempfile.mkdtemp(prefix="bench_shards_")
+    try:
+        dataset_folder = args.dataset
+        if not dataset_folder:
+            dataset_folder = os.path.join(work_folder, "dataset")
+            print(f"Generating {args.samples} samples...")
+            make_dataset(dataset_folder, args.samples, args.image_kb)
+        shard_folder = args.shards or os.path.join(work_folder, "shards")
+        image_paths = list_images(dataset_folder)
+
+        summary = export_shards(image_paths, shard_folder, args.shard_size_mb * 1024 * 1024, args.workers)
+        print(f"Export: {summary['samples']} samples, {summary['shards']} shards, "
+              f"{summary['bytes'] / 1e6:.1f} MB in {summary['seconds']:.2f} s ({summary['skipped']} shards reused)")
+
+        reader = ShardReader(shard_folder)
+        keys = reader.keys()
+        random.shuffle(keys)
+        loose = measure("loose files", read_loose, image_paths)
+        sequential = measure("shards, sequential", read_sequential, reader)
+        measure("shards, random key", read_random, reader, keys)
+        reader.close()
+        print(f"Sequential shard reads: {sequential / loose:.1f}x loose-file throughput")
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import json
+import time
+import random
+import argparse
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A local stand-in for the Telegram Bot API, enough for python-telegram-bot's
+# sendMessage / sendPhoto / sendDocument / sendMediaGroup / getMe calls.
+# Point the app at it with "telegram_api_base_url": "http://127.0.0.1:8081/bot"
+
+class FaultProfile:
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit_every=0, retry_after=1, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_every = rate_limit_every  # Every Nth request gets a 429
+        self.retry_after = retry_after
+        self.failure_rate = failure_rate  # Fraction of requests answered with a 500
+        self.random = random.Random(seed)
+
+class RecordedRequest:
+    def __init__(self, method, fields, files, received_at):
+        self.method = method
+        self.fields = fields
+        self.files = files  # [(field name, filename, size)]
+        self.received_at = received_at
+        self.status = 200
+
+def parse_body(content_type, body):
+    # Returns (fields, files) for JSON, urlencoded or multipart bodies
+    fields = {}
+    files = []
+    if not body:
+        return fields, files
+    if content_type.startswith('application/json'):
+        return json.loads(body), files
+    if content_type.startswith('multipart/form-data'):
+        message = BytesParser(policy=HTTP).parsebytes(
+            b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            payload = part.get_payload(decode=True) or b''
+            filename = part.get_filename()
+            if filename:
+                files.append((name, filename, len(payload)))
+            else:
+                fields[name] = payload.decode('utf-8', errors='replace')
+        return fields, files
+    for key, values in parse_qs(body.decode('utf-8')).items():
+        fields[key] = values[-1]
+    return fields, files
+
+def chat_for(fields):
+    chat_id = fields.get('chat_id', 0)
+    try:
+        chat_id = int(chat_id)
+    except (TypeError, ValueError):
+        pass
+    return {"id": chat_id, "type": "private", "first_name": "Fake"}
+
+class FakeBotApi:
+    def __init__(self, host="127.0.0.1", port=0, faults=None):
+        self.faults = faults or FaultProfile()
+        self.requests = []
+        self.lock = threading.Lock()
+        self.message_id = 0
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                api.handle(self)
+
+            do_GET = do_POST
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/bot"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def next_message(self, fields, **content):
+        with self.lock:
+            self.message_id += 1
+            message_id = self.message_id
+        message = {"message_id": message_id, "date": int(time.time()), "chat": chat_for(fields)}
+        message.update(content)
+        return message
+
+    def result_for(self, method, fields, files):
+        if method == 'getMe':
+            return {"id": 1, "is_bot": True, "first_name": "Fake Bot", "username": "fake_bot"}
+        if method == 'sendMessage':
+            return self.next_message(fields, text=fields.get('text', ''))
+        if method == 'sendPhoto':
+            photo = {"file_id": f"photo{self.message_id}", "file_unique_id": f"u{self.message_id}", "width": 1, "height": 1}
+            return self.next_message(fields, photo=[photo], caption=fields.get('caption'))
+        if method == 'sendDocument':
+            document = {"file_id": f"doc{self.message_id}", "file_unique_id": f"u{self.message_id}"}
+            return self.next_message(fields, document=document, caption=fields.get('caption'))
+        if method == 'sendMediaGroup':
+            media = fields.get('media', '[]')
+            count = len(json.loads(media) if isinstance(media, str) else media)
+            return [self.next_message(fields, photo=[{"file_id": f"photo{i}", "file_unique_id": f"u{i}", "width": 1, "height": 1}])
+                    for i in range(count)]
+        return None
+
+    def handle(self, handler):
+        received_at = time.monotonic()
+        method = handler.path.rstrip('/').rsplit('/', 1)[-1]
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length)
+        fields, files = parse_body(handler.headers.get('Content-Type', ''), body)
+        request = RecordedRequest(method, fields, files, received_at)
+        with self.lock:
+            self.requests.append(request)
+            request_number = len(self.requests)
+
+        faults = self.faults
+        delay = faults.latency + faults.random.uniform(0, faults.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if faults.rate_limit_every and request_number % faults.rate_limit_every == 0:
+            request.status = 429
+            payload = {"ok": False, "error_code": 429,
+                       "description": f"Too Many Requests: retry after {faults.retry_after}",
+                       "parameters": {"retry_after": faults.retry_after}}
+        elif faults.failure_rate and faults.random.random() < faults.failure_rate:
+            request.status = 500
+            payload = {"ok": False, "error_code": 500, "description": "Internal Server Error"}
+        else:
+            result = self.result_for(method, fields, files)
+            if result is None:
+                request.status = 404
+                payload = {"ok": False, "error_code": 404, "description": "Not Found: method not implemented"}
+            else:
+                payload = {"ok": True, "result": result}
+
+        data = json.dumps(payload).encode('utf-8')
+        handler.send_response(request.status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local fake Telegram Bot API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    args = parser.parse_args()
+
+    faults = FaultProfile(args.latency, args.jitter, args.rate_limit_every, args.retry_after, args.failure_rate)
+    api = FakeBotApi(args.host, args.port, faults)
+    print(f"Fake Bot API listening on {api.base_url}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.server.server_close()
+
+if __name__ == "__main__":
+    main()
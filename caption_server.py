@@ -0,0 +1,256 @@
+import os
+import json
+import signal
+import asyncio
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import tracing
+from captioner.florence import FlorenceCaptioner, MODELS, DEFAULT_MODEL, DETAIL_LEVELS, PROFILES, DEFAULT_PROFILE, load_image
+from captioner.ipc import DEFAULT_HOST, DEFAULT_PORT, MAX_REQUEST_BYTES
+
+# Shared captioning service: one Florence-2 model serves every Image
+# Captioning tab and script on this machine.
+#
+#   python caption_server.py --model Large --max-batch 8 --max-wait-ms 20
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+logger = logging.getLogger(__name__)
+
+CONFIG_FILE = "ai_toolkit_helper_config.json"
+DEFAULT_MAX_BATCH = 8
+DEFAULT_MAX_WAIT_MS = 20
+DECODE_WORKERS = 4
+MAX_IN_FLIGHT_PER_CLIENT = 16  # Decoded images a client may have waiting; keeps clients fair
+
+def load_config():
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as config_file:
+            return json.load(config_file)
+    return {}
+
+class CaptionBatcher:
+    # Collects images from all clients into model batches. A batch starts with
+    # the oldest waiting image and takes whatever else of the same detail level
+    # and generation profile arrives within max_wait, up to max_batch. Images queue up while the model
+    # runs, so under load batches fill without waiting at all.
+    def __init__(self, captioner, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT_MS / 1000):
+        self.captioner = captioner
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = deque()  # ((detail level, profile), image, future)
+        self.arrived = asyncio.Event()
+        # A single model thread; generate calls never overlap
+        self.model_executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.images = 0
+
+    async def caption(self, image, detail_level, profile=DEFAULT_PROFILE):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(((detail_level, profile), image, future))
+        self.arrived.set()
+        return await future
+
+    def waiting(self):
+        # Drops images whose client went away
+        while self.pending and self.pending[0][2].done():
+            self.pending.popleft()
+        return len(self.pending)
+
+    async def next_batch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self.waiting():
+                self.arrived.clear()
+                await self.arrived.wait()
+
+            deadline = loop.time() + self.max_wait
+            while self.waiting() < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self.arrived.clear()
+                try:
+                    await asyncio.wait_for(self.arrived.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            # Every waiting client may have disconnected during the wait
+            if self.waiting():
+                break
+
+        settings = self.pending[0][0]
+        batch = []
+        others = []
+        while self.pending and len(batch) < self.max_batch:
+            entry = self.pending.popleft()
+            if entry[2].done():
+                continue
+            (batch if entry[0] == settings else others).append(entry)
+        # Other detail levels and profiles keep their place in line for the next batch
+        self.pending.extendleft(reversed(others))
+        return settings, batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            (detail_level, profile), batch = await self.next_batch()
+            if not batch:
+                continue
+            images = [image for _, image, _ in batch]
+            try:
+                with tracing.span("caption_server.batch", images=len(images)):
+                    captions = await loop.run_in_executor(self.model_executor, self.captioner.caption_images, images, detail_level, profile)
+            except Exception as e:
+                logger.error(f"Captioning a batch of {len(images)} failed: {str(e)}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.images += len(images)
+            for (_, _, future), caption in zip(batch, captions):
+                if not future.done():
+                    future.set_result(caption)
+
+    def close(self):
+        self.model_executor.shutdown(wait=False)
+
+class CaptionServer:
+    def __init__(self, batcher, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.batcher = batcher
+        self.host = host
+        self.port = port
+        self.server = None
+        self.decoder = ThreadPoolExecutor(max_workers=DECODE_WORKERS)
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=MAX_REQUEST_BYTES)
+        logger.info(f"Caption server listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        self.decoder.shutdown(wait=False)
+
+    def info(self):
+        return {"ok": True, "model": self.batcher.captioner.model, "max_batch": self.batcher.max_batch,
+                "max_wait_ms": int(self.batcher.max_wait * 1000), "batches": self.batcher.batches,
+                "images": self.batcher.images, "waiting": self.batcher.waiting(), "profiles": list(PROFILES)}
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await self.handle_request(line, writer)
+        except (ConnectionError, ValueError) as e:
+            # ValueError covers lines longer than MAX_REQUEST_BYTES
+            logger.warning(f"Dropped caption client: {str(e)}")
+        finally:
+            writer.close()
+
+    async def respond(self, writer, response):
+        writer.write(json.dumps(response).encode('utf-8') + b"\n")
+        await writer.drain()
+
+    async def handle_request(self, line, writer):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            await self.respond(writer, {"ok": False, "error": "Request is not valid JSON"})
+            return
+        if not isinstance(request, dict):
+            await self.respond(writer, {"ok": False, "error": "Request must be a JSON object"})
+            return
+
+        kind = request.get("type")
+        if kind == "ping":
+            await self.respond(writer, self.info())
+        elif kind == "caption":
+            await self.stream_captions(request, writer)
+        else:
+            await self.respond(writer, {"ok": False, "error": f"Invalid request: {kind}"})
+
+    async def stream_captions(self, request, writer):
+        paths = request.get("paths")
+        detail_level = request.get("detail_level") or "Short"
+        if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+            await self.respond(writer, {"ok": False, "error": "paths must be a list of strings"})
+            return
+        if detail_level not in DETAIL_LEVELS:
+            await self.respond(writer, {"ok": False, "error": f"Unknown detail level: {detail_level}"})
+            return
+        profile = request.get("profile") or DEFAULT_PROFILE
+        if profile not in PROFILES:
+            await self.respond(writer, {"ok": False, "error": f"Unknown generation profile: {profile}"})
+            return
+
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(MAX_IN_FLIGHT_PER_CLIENT)
+
+        async def caption_one(path):
+            async with slots:
+                try:
+                    image = await loop.run_in_executor(self.decoder, load_image, path)
+                except OSError as e:
+                    return {"path": path, "error": str(e)}
+                try:
+                    return {"path": path, "caption": await self.batcher.caption(image, detail_level, profile)}
+                except Exception as e:
+                    return {"path": path, "error": str(e)}
+
+        # Results go out as each image finishes, not in request order
+        tasks = [asyncio.ensure_future(caption_one(path)) for path in paths]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                await self.respond(writer, await next_result)
+        finally:
+            # A client that disconnects gives up its place in the batches
+            for task in tasks:
+                task.cancel()
+        await self.respond(writer, {"ok": True, "done": True, "count": len(paths)})
+
+async def main(args):
+    config = load_config()
+    tracing.configure(config, "caption_server")
+    logger.info(f"Loading Florence-2 {args.model}...")
+    loop = asyncio.get_running_loop()
+    captioner = await loop.run_in_executor(None, FlorenceCaptioner, args.model)
+    batcher = CaptionBatcher(captioner, args.max_batch, args.max_wait_ms / 1000)
+    server = CaptionServer(batcher, args.host, args.port)
+    await server.start()
+
+    main_task = asyncio.current_task()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, main_task.cancel)
+    except (NotImplementedError, RuntimeError):
+        pass  # Not on Windows
+
+    try:
+        await batcher.run()
+    finally:
+        await server.stop()
+        batcher.close()
+        logger.info(f"Caption server stopped after {batcher.images} images in {batcher.batches} batches")
+
+def parse_args():
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Serve Florence-2 captions to every Image Captioning tab on this machine.")
+    parser.add_argument("--model", choices=list(MODELS), default=config.get("caption_server_model", DEFAULT_MODEL))
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=int(config.get("caption_server_port", DEFAULT_PORT)))
+    parser.add_argument("--max-batch", type=int, default=int(config.get("caption_server_max_batch", DEFAULT_MAX_BATCH)),
+                        help="Most images per generate call")
+    parser.add_argument("--max-wait-ms", type=float, default=float(config.get("caption_server_max_wait_ms", DEFAULT_MAX_WAIT_MS)),
+                        help="How long a batch waits for more images before it starts")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main(parse_args()))
+    except (asyncio.CancelledError, KeyboardInterrupt):
+        pass
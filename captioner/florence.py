@@ -0,0 +1,151 @@
+import os
+import time
+import argparse
+import threading
+import torch
+from PIL import Image
+from transformers import AutoProcessor, AutoModelForCausalLM
+import tracing
+from captioner.ipc import CaptionClient, DEFAULT_PORT
+
+# Florence-2 captioning shared by the Image Captioning tab (in-process) and
+# the caption server (caption_server.py). Also captions a folder:
+#
+#   python -m captioner.florence path/to/dataset --detail Detailed --profile Fast
+MODELS = {"Base": "microsoft/Florence-2-base", "Large": "microsoft/Florence-2-large"}
+DEFAULT_MODEL = "Base"
+PROMPTS = {"Short": "<CAPTION>", "Detailed": "<DETAILED_CAPTION>", "More Detailed": "<MORE_DETAILED_CAPTION>"}
+DETAIL_LEVELS = list(PROMPTS)
+
+# Generation profiles trade caption quality for speed. Beam search costs
+# roughly one decoder pass per beam, and token budgets are per detail level
+# since a <CAPTION> never needs the 1024 tokens a long description might.
+# Quality matches the original settings; compare them on your own images with
+# python -m benchmarks.bench_caption_profiles.
+PROFILES = {
+    "Fast": {"num_beams": 1, "max_new_tokens": {"Short": 48, "Detailed": 160, "More Detailed": 320}},
+    "Balanced": {"num_beams": 2, "max_new_tokens": {"Short": 64, "Detailed": 256, "More Detailed": 512}, "early_stopping": True},
+    "Quality": {"num_beams": 3, "max_new_tokens": {"Short": 1024, "Detailed": 1024, "More Detailed": 1024}, "early_stopping": False},
+}
+DEFAULT_PROFILE = "Quality"
+
+def load_image(path):
+    with tracing.span("caption.decode_image"):
+        with Image.open(path) as img:
+            return img.convert("RGB")
+
+def clean_caption(text):
+    return text.replace('</s>', '').replace('<s>', '').replace('<pad>', '').strip()
+
+def generation_options(profile, detail_level):
+    settings = PROFILES.get(profile, PROFILES[DEFAULT_PROFILE])
+    options = {
+        "max_new_tokens": settings["max_new_tokens"].get(detail_level, settings["max_new_tokens"]["Short"]),
+        "num_beams": settings["num_beams"],
+        "do_sample": False,
+    }
+    if settings["num_beams"] > 1:
+        # True stops as soon as num_beams candidates have ended, rather than
+        # searching on while a longer one could still score higher
+        options["early_stopping"] = settings["early_stopping"]
+    return options
+
+class FlorenceCaptioner:
+    # One loaded model. caption_images() captions a batch that shares a detail
+    # level in a single generate call; calls are serialized, so one instance
+    # can be shared by worker threads.
+    def __init__(self, model=DEFAULT_MODEL):
+        self.model = model
+        self.model_name = MODELS.get(model, model)
+        self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+        self.lock = threading.Lock()
+        self.processor = AutoProcessor.from_pretrained(self.model_name, trust_remote_code=True)
+        self.florence_model = AutoModelForCausalLM.from_pretrained(self.model_name, torch_dtype=torch_dtype, trust_remote_code=True).to(self.device)
+
+    def caption_images(self, images, detail_level, profile=DEFAULT_PROFILE):
+        # images are RGB PIL images; returns one caption per image, in order
+        prompt = PROMPTS.get(detail_level, PROMPTS["Short"])
+        options = generation_options(profile, detail_level)
+        with self.lock:
+            with tracing.span("caption.processor", images=len(images)):
+                # The prompt is the same for every image, so no padding is needed
+                inputs = self.processor(text=[prompt] * len(images), images=images, return_tensors="pt", do_rescale=False).to(self.florence_model.device)
+                inputs["pixel_values"] = inputs["pixel_values"].to(self.device, torch.float32)
+
+            with torch.no_grad(), tracing.span("caption.generate", detail=detail_level, profile=profile, images=len(images)):
+                generated_ids = self.florence_model.generate(
+                    input_ids=inputs["input_ids"],
+                    pixel_values=inputs["pixel_values"],
+                    **options
+                )
+            with tracing.span("caption.batch_decode"):
+                generated_texts = self.processor.batch_decode(generated_ids, skip_special_tokens=True)
+
+        return [clean_caption(text) for text in generated_texts]
+
+    def caption_paths(self, paths, detail_level, profile=DEFAULT_PROFILE):
+        return self.caption_images([load_image(path) for path in paths], detail_level, profile)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif')
+
+def write_caption(img_path, caption):
+    with open(os.path.splitext(img_path)[0] + '.txt', 'w') as caption_file:
+        caption_file.write(caption)
+
+def has_caption(img_path):
+    caption_path = os.path.splitext(img_path)[0] + '.txt'
+    return os.path.exists(caption_path) and os.path.getsize(caption_path) > 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Caption a folder of images with Florence-2.")
+    parser.add_argument("folder")
+    parser.add_argument("--detail", choices=DETAIL_LEVELS, default="Short")
+    parser.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--model", choices=list(MODELS), default=DEFAULT_MODEL, help="Used when no caption server is running")
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--overwrite", action="store_true", help="Also caption images that already have a caption")
+    args = parser.parse_args()
+
+    paths = sorted(os.path.join(args.folder, name) for name in os.listdir(args.folder) if name.lower().endswith(IMAGE_EXTENSIONS))
+    if not args.overwrite:
+        paths = [path for path in paths if not has_caption(path)]
+    start = time.monotonic()
+    done = 0
+    # Like the Image Captioning tab, a running caption server is used instead of loading another model
+    client = CaptionClient(port=args.port)
+    if client.is_available():
+        print(f"Captioning {len(paths)} images on the caption server ({args.profile})")
+        for img_path, caption, error in client.caption(paths, args.detail, args.profile):
+            if error is not None:
+                print(f"{os.path.basename(img_path)}: error: {error}")
+                continue
+            write_caption(img_path, caption)
+            done += 1
+    else:
+        print(f"Loading Florence-2 {args.model}...")
+        captioner = FlorenceCaptioner(args.model)
+        start = time.monotonic()
+        print(f"Captioning {len(paths)} images ({args.profile})")
+        for batch_start in range(0, len(paths), args.batch_size):
+            batch = []
+            images = []
+            for img_path in paths[batch_start:batch_start + args.batch_size]:
+                try:
+                    images.append(load_image(img_path))
+                    batch.append(img_path)
+                except OSError as e:
+                    print(f"\n{os.path.basename(img_path)}: error: {e}")
+            if not images:
+                continue
+            for img_path, caption in zip(batch, captioner.caption_images(images, args.detail, args.profile)):
+                write_caption(img_path, caption)
+                done += 1
+            print(f"\rCaptioned {done}/{len(paths)}", end="", flush=True)
+        print()
+    elapsed = time.monotonic() - start
+    print(f"{done} captions in {elapsed:.1f} s ({done / max(elapsed, 1e-9):.2f} images/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import json
+import socket
+
+# The caption server (caption_server.py) listens on localhost and holds one
+# Florence-2 model for every client. Requests are one JSON object per line:
+#
+#   {"type": "ping"}  ->  {"ok": true, "model": "Large", "max_batch": 8, ...}
+#   {"type": "caption", "paths": [...], "detail_level": "Short", "profile": "Fast"}
+#       ->  {"path": ..., "caption": ...} or {"path": ..., "error": ...} per
+#           image as soon as it is done (not in request order), then
+#           {"ok": true, "done": true, "count": n}
+#
+# Paths must be readable by the server process. This module only uses the
+# standard library so the GUI and scripts can import it without torch.
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 47832
+MAX_REQUEST_BYTES = 4 * 1024 * 1024  # Enough for a few thousand paths per request
+CONNECT_TIMEOUT = 1.0
+RESULT_TIMEOUT = 600.0  # Longest wait for the next image on a busy server
+
+class CaptionClient:
+    # Blocking client; raises OSError when the server is not running
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=CONNECT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def info(self):
+        # Server details from a ping, or None when no server is running
+        try:
+            with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+                sock.sendall(json.dumps({"type": "ping"}).encode('utf-8') + b"\n")
+                with sock.makefile('rb') as stream:
+                    response = json.loads(stream.readline())
+        except (OSError, ValueError):
+            return None
+        return response if response.get("ok") else None
+
+    def is_available(self):
+        return self.info() is not None
+
+    def caption(self, paths, detail_level, profile=None):
+        # Yields (path, caption, error) as the server finishes each image.
+        # Without a profile the server uses its default.
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.settimeout(RESULT_TIMEOUT)
+            request = {"type": "caption", "paths": list(paths), "detail_level": detail_level}
+            if profile:
+                request["profile"] = profile
+            sock.sendall(json.dumps(request).encode('utf-8') + b"\n")
+            with sock.makefile('rb') as stream:
+                for line in stream:
+                    result = json.loads(line)
+                    if result.get("done"):
+                        return
+                    if "path" not in result:
+                        raise ConnectionError(result.get("error") or "Caption server rejected the request")
+                    yield result["path"], result.get("caption"), result.get("error")
+        raise ConnectionError("Caption server closed the connection")
@@ -0,0 +1,204 @@
+import io
+import os
+import json
+import math
+import time
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image, ImageOps
+
+# Pre-resizes a dataset once per training resolution so AI Toolkit decodes
+# small copies instead of the originals on every epoch and latent cache build:
+#
+#   <dataset>_prepared/512/<name>.png + <name>.txt
+#   <dataset>_prepared/768/...
+#   <dataset>_prepared/1024/...
+#
+# Each copy keeps the aspect ratio and just covers AI Toolkit's bucket for
+# that resolution, so the trainer only has to crop. Images are never upscaled.
+#
+#   python -m dataset.buckets path/to/dataset --resolutions 512,768,1024
+
+DEFAULT_RESOLUTIONS = [512, 768, 1024]
+BUCKET_DIVISIBILITY = 64
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif')
+CACHE_FILE = "prepare_cache.json"
+CACHE_SAVE_INTERVAL = 100  # Images between cache writes, so an interrupted run loses little
+PNG_COMPRESS_LEVEL = 1  # These are caches; fast writes and reads matter more than size
+
+def prepared_folder(dataset_folder):
+    return os.path.normpath(dataset_folder) + "_prepared"
+
+def resolution_folder(dataset_folder, resolution):
+    return os.path.join(prepared_folder(dataset_folder), str(resolution))
+
+def is_prepared(dataset_folder, resolutions=DEFAULT_RESOLUTIONS):
+    return all(os.path.isdir(resolution_folder(dataset_folder, resolution)) for resolution in resolutions)
+
+def bucket_size(width, height, resolution):
+    # Same area as resolution x resolution, sides rounded down to the bucket grid
+    scale = resolution / math.sqrt(width * height)
+    return (max(BUCKET_DIVISIBILITY, int(width * scale) // BUCKET_DIVISIBILITY * BUCKET_DIVISIBILITY),
+            max(BUCKET_DIVISIBILITY, int(height * scale) // BUCKET_DIVISIBILITY * BUCKET_DIVISIBILITY))
+
+def cover_size(width, height, resolution):
+    # Smallest aspect-preserving size that covers the bucket
+    bucket_width, bucket_height = bucket_size(width, height, resolution)
+    scale = max(bucket_width / width, bucket_height / height)
+    if scale >= 1:
+        return width, height
+    return max(bucket_width, math.ceil(width * scale)), max(bucket_height, math.ceil(height * scale))
+
+def prepare_image(source_path, output_folder, resolutions, known_sha256=None):
+    # Runs in a worker process. Returns (sha256, {resolution: [w, h]}), or
+    # (sha256, None) when the content matches known_sha256 and nothing was written.
+    with open(source_path, 'rb') as source:
+        data = source.read()
+    sha256 = hashlib.sha256(data).hexdigest()
+    if sha256 == known_sha256:
+        return sha256, None
+
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    sizes = {}
+    with Image.open(io.BytesIO(data)) as img:
+        # JPEGs decode at a reduced scale that still covers the largest bucket
+        largest = max(resolutions)
+        img.draft("RGB", (largest, largest))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        for resolution in sorted(resolutions, reverse=True):
+            size = cover_size(img.width, img.height, resolution)
+            resized = img if size == img.size else img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+            output_path = os.path.join(output_folder, str(resolution), stem + ".png")
+            temp_path = f"{output_path}.{os.getpid()}.tmp"
+            resized.save(temp_path, "PNG", compress_level=PNG_COMPRESS_LEVEL)
+            os.replace(temp_path, output_path)
+            sizes[resolution] = list(size)
+    return sha256, sizes
+
+def load_cache(output_folder):
+    try:
+        with open(os.path.join(output_folder, CACHE_FILE), 'r') as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(output_folder, cache):
+    path = os.path.join(output_folder, CACHE_FILE)
+    with open(path + ".tmp", 'w') as cache_file:
+        json.dump(cache, cache_file)
+    os.replace(path + ".tmp", path)
+
+def outputs_exist(output_folder, stem, resolutions):
+    return all(os.path.exists(os.path.join(output_folder, str(resolution), stem + ".png")) for resolution in resolutions)
+
+def copy_captions(dataset_folder, output_folder, stems, resolutions):
+    for stem in stems:
+        caption_path = os.path.join(dataset_folder, stem + ".txt")
+        if not os.path.exists(caption_path):
+            continue
+        mtime = os.path.getmtime(caption_path)
+        for resolution in resolutions:
+            target = os.path.join(output_folder, str(resolution), stem + ".txt")
+            if not os.path.exists(target) or os.path.getmtime(target) != mtime:
+                shutil.copy2(caption_path, target)
+
+def remove_stale_outputs(output_folder, stems, resolutions):
+    # Copies of images that were deleted or renamed in the dataset
+    for resolution in resolutions:
+        with os.scandir(os.path.join(output_folder, str(resolution))) as it:
+            for entry in it:
+                stem, ext = os.path.splitext(entry.name)
+                if ext in (".png", ".txt", ".tmp") and (stem not in stems or ext == ".tmp"):
+                    os.remove(entry.path)
+
+def prepare_dataset(dataset_folder, resolutions=DEFAULT_RESOLUTIONS, max_workers=None, progress=None):
+    # progress(done, total) is called as images finish. Unchanged images are
+    # skipped by size and mtime, or by content hash when only the stat changed.
+    start = time.monotonic()
+    resolutions = sorted(set(resolutions))
+    output_folder = prepared_folder(dataset_folder)
+    for resolution in resolutions:
+        os.makedirs(os.path.join(output_folder, str(resolution)), exist_ok=True)
+    cache = load_cache(output_folder)
+
+    images = {}  # stem -> file name
+    failed = []
+    for name in sorted(os.listdir(dataset_folder)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        stem = os.path.splitext(name)[0]
+        if stem in images:
+            failed.append((name, f"same name as {images[stem]}"))
+            continue
+        images[stem] = name
+
+    to_prepare = []
+    skipped = 0
+    for stem, name in images.items():
+        stat = os.stat(os.path.join(dataset_folder, name))
+        entry = cache.get(name)
+        complete = bool(entry) and set(resolutions) <= set(map(int, entry["sizes"])) and outputs_exist(output_folder, stem, resolutions)
+        if complete and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            skipped += 1
+            continue
+        to_prepare.append((name, stat, entry["sha256"] if complete else None))
+
+    done = 0
+    prepared = 0
+    if progress:
+        progress(done, len(to_prepare))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(prepare_image, os.path.join(dataset_folder, name), output_folder, resolutions, known_sha256): (name, stat)
+                   for name, stat, known_sha256 in to_prepare}
+        for future in as_completed(futures):
+            name, stat = futures[future]
+            try:
+                sha256, sizes = future.result()
+            except Exception as e:
+                failed.append((name, str(e)))
+            else:
+                if sizes is None:
+                    skipped += 1  # Touched, not changed
+                    sizes = cache[name]["sizes"]
+                else:
+                    prepared += 1
+                cache[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256, "sizes": sizes}
+            done += 1
+            if progress:
+                progress(done, len(to_prepare))
+            if done % CACHE_SAVE_INTERVAL == 0:
+                save_cache(output_folder, cache)
+
+    cache = {name: entry for name, entry in cache.items() if name in images.values()}
+    save_cache(output_folder, cache)
+    copy_captions(dataset_folder, output_folder, images, resolutions)
+    remove_stale_outputs(output_folder, images, resolutions)
+    return {
+        "images": len(images),
+        "prepared": prepared,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": time.monotonic() - start,
+        "output_folder": output_folder,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-resize a dataset to AI Toolkit's resolution buckets.")
+    parser.add_argument("dataset_folder")
+    parser.add_argument("--resolutions", default=",".join(map(str, DEFAULT_RESOLUTIONS)))
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    resolutions = [int(value) for value in args.resolutions.split(",") if value.strip()]
+    summary = prepare_dataset(args.dataset_folder, resolutions, args.workers,
+                              lambda done, total: print(f"\rImages: {done}/{total}", end="", flush=True))
+    print()
+    print(f"{summary['images']} images: {summary['prepared']} resized, {summary['skipped']} unchanged, "
+          f"{len(summary['failed'])} failed in {summary['seconds']:.1f} s -> {summary['output_folder']}")
+    for name, error in summary["failed"]:
+        print(f"  {name}: {error}")
+
+if __name__ == "__main__":
+    main()
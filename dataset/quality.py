@@ -0,0 +1,193 @@
+import io
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+
+# Quality scores for dataset triage, from a downscaled grayscale decode:
+#   sharpness   variance of the 4-neighbour Laplacian (low = blurry)
+#   brightness  mean luminance, 0..1
+#   contrast    luminance standard deviation, 0..1
+#   clipped     fraction of pixels crushed to black or blown to white
+#   width/height of the original, for the effective resolution
+# Scores are cached by content hash; a file whose size and mtime are
+# unchanged is not even read again.
+#
+#   python -m dataset.quality path/to/dataset
+
+ANALYSIS_EDGE = 512  # Sharpness is measured at this size, so scores compare across resolutions
+DEFAULT_CACHE_FILE = "quality_cache.sqlite3"
+CHUNK_SIZE = 32  # Images per worker round trip
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif')
+
+DEFAULT_THRESHOLDS = {
+    "min_sharpness": 100.0,
+    "min_brightness": 0.12,
+    "max_brightness": 0.92,
+    "min_contrast": 0.08,
+    "min_side": 512,
+}
+
+def measure(gray):
+    # gray: 2D float32 array of 0..255 luminance
+    laplacian = (gray[1:-1, :-2] + gray[1:-1, 2:] + gray[:-2, 1:-1] + gray[2:, 1:-1]) - 4.0 * gray[1:-1, 1:-1]
+    return {
+        "sharpness": float(laplacian.var()),
+        "brightness": float(gray.mean() / 255.0),
+        "contrast": float(gray.std() / 255.0),
+        "clipped": float(np.count_nonzero((gray <= 3) | (gray >= 252)) / gray.size),
+    }
+
+def score_image(path, known_sha256=None):
+    # Runs in a worker process. Returns (path, sha256, scores or None, error or None);
+    # scores are None without an error when the content matches known_sha256.
+    try:
+        with open(path, 'rb') as image_file:
+            data = image_file.read()
+        sha256 = hashlib.sha256(data).hexdigest()
+        if sha256 == known_sha256:
+            return path, sha256, None, None
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            # JPEGs decode straight at a reduced scale
+            img.draft("L", (ANALYSIS_EDGE, ANALYSIS_EDGE))
+            gray = img.convert("L")
+            gray.thumbnail((ANALYSIS_EDGE, ANALYSIS_EDGE), Image.BILINEAR)
+            scores = measure(np.asarray(gray, dtype=np.float32))
+    except Exception as e:
+        return path, None, None, str(e)
+    scores.update(width=width, height=height)
+    return path, sha256, scores, None
+
+class QualityCache:
+    # SQLite so 100k entries are updated in place instead of rewriting a file.
+    # Use from one thread.
+    def __init__(self, path=DEFAULT_CACHE_FILE):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS scores (sha256 TEXT PRIMARY KEY, scores TEXT)")
+        self.connection.commit()
+
+    def lookup(self, stats):
+        # ({path: scores} for paths whose size and mtime match the cache,
+        #  {path: (sha256, scores)} for known paths whose stat changed)
+        found = {}
+        changed = {}
+        rows = self.connection.execute(
+            "SELECT files.path, files.size, files.mtime_ns, files.sha256, scores.scores FROM files JOIN scores ON files.sha256 = scores.sha256")
+        for path, size, mtime_ns, sha256, scores in rows:
+            if path not in stats:
+                continue
+            if stats[path] == (size, mtime_ns):
+                found[path] = json.loads(scores)
+            else:
+                changed[path] = (sha256, json.loads(scores))
+        return found, changed
+
+    def store(self, entries):
+        # entries: [(path, size, mtime_ns, sha256, scores)]
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                                        [(path, size, mtime_ns, sha256) for path, size, mtime_ns, sha256, _ in entries])
+            self.connection.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?)",
+                                        [(sha256, json.dumps(scores)) for _, _, _, sha256, scores in entries])
+
+    def close(self):
+        self.connection.close()
+
+def score_images(paths, max_workers=None, progress=None, cache_path=DEFAULT_CACHE_FILE):
+    # Returns ({path: scores}, {path: error}). progress(done, total) is called
+    # from this thread as chunks finish.
+    stats = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        stats[os.path.abspath(path)] = (stat.st_size, stat.st_mtime_ns)
+
+    cache = QualityCache(cache_path)
+    try:
+        results, changed = cache.lookup(stats)
+        errors = {}
+        to_score = [path for path in stats if path not in results]
+        known_sha256s = [changed[path][0] if path in changed else None for path in to_score]
+        done = 0
+        pending = []
+        if progress:
+            progress(done, len(to_score))
+        if to_score:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                for path, sha256, scores, error in executor.map(score_image, to_score, known_sha256s, chunksize=CHUNK_SIZE):
+                    done += 1
+                    if error:
+                        errors[path] = error
+                    else:
+                        if scores is None:
+                            scores = changed[path][1]  # Touched, not changed
+                        results[path] = scores
+                        pending.append((path, stats[path][0], stats[path][1], sha256, scores))
+                    if len(pending) >= CHUNK_SIZE * 8:
+                        cache.store(pending)
+                        pending = []
+                    if progress and done % CHUNK_SIZE == 0:
+                        progress(done, len(to_score))
+        cache.store(pending)
+        if progress:
+            progress(done, len(to_score))
+    finally:
+        cache.close()
+    # Callers get results under the paths they passed in
+    by_abspath = {os.path.abspath(path): path for path in paths}
+    return ({by_abspath[path]: scores for path, scores in results.items()},
+            {by_abspath[path]: error for path, error in errors.items()})
+
+def quality_problems(scores, thresholds=DEFAULT_THRESHOLDS):
+    # Reasons the image falls below the thresholds; empty when it passes
+    problems = []
+    if scores["sharpness"] < thresholds["min_sharpness"]:
+        problems.append("blurry")
+    if scores["brightness"] < thresholds["min_brightness"]:
+        problems.append("too dark")
+    elif scores["brightness"] > thresholds["max_brightness"]:
+        problems.append("too bright")
+    if scores["contrast"] < thresholds["min_contrast"]:
+        problems.append("low contrast")
+    if min(scores["width"], scores["height"]) < thresholds["min_side"]:
+        problems.append("too small")
+    return problems
+
+def format_scores(scores):
+    return (f"sharpness {scores['sharpness']:.0f}, brightness {scores['brightness']:.2f}, "
+            f"contrast {scores['contrast']:.2f}, {scores['width']}x{scores['height']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Score dataset images for sharpness, exposure and resolution.")
+    parser.add_argument("dataset_folder")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--below-threshold", action="store_true", help="Only list images below the default thresholds")
+    args = parser.parse_args()
+
+    paths = [os.path.join(args.dataset_folder, name) for name in os.listdir(args.dataset_folder)
+             if name.lower().endswith(IMAGE_EXTENSIONS)]
+    start = time.monotonic()
+    results, errors = score_images(paths, args.workers, lambda done, total: print(f"\rScored {done}/{total}", end="", flush=True))
+    elapsed = time.monotonic() - start
+    print()
+    for path in sorted(results, key=lambda path: results[path]["sharpness"]):
+        problems = quality_problems(results[path])
+        if problems or not args.below_threshold:
+            print(f"{os.path.basename(path)}: {format_scores(results[path])}{' - ' + ', '.join(problems) if problems else ''}")
+    for path, error in errors.items():
+        print(f"{os.path.basename(path)}: error: {error}")
+    print(f"{len(results)} images in {elapsed:.1f} s ({len(results) / max(elapsed, 1e-9):.0f} images/s)")
+
+if __name__ == "__main__":
+    main()
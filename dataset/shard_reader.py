@@ -0,0 +1,118 @@
+import os
+import json
+import mmap
+import struct
+import hashlib
+import threading
+
+# Sharded dataset layout written by dataset.shards.export_shards:
+#
+#   shard-00000.tar ...  WebDataset-style tars; a sample's files are stored
+#                        next to each other as <key>.<ext> (e.g. .png, .txt)
+#   shard-00000.json     per-shard checksum and member offsets (for resume)
+#   index.bin            fixed-size records sorted by key hash, for lookups
+#                        through a memory map without parsing anything
+#   keys.txt             sample keys in shard order
+#   index.json           shard names, sizes and SHA-256; written last, so an
+#                        export without it is incomplete
+#
+# This module only uses the standard library so training-side loaders can
+# import it on their own.
+INDEX_FILE = "index.json"
+INDEX_RECORDS_FILE = "index.bin"
+KEYS_FILE = "keys.txt"
+SHARD_PATTERN = "shard-{:05d}.tar"
+INDEX_RECORD = struct.Struct("<QIHxxQQ")  # key hash, shard, extension id, data offset, size
+KEY_HASH = struct.Struct("<Q")
+
+def key_hash(key):
+    return KEY_HASH.unpack(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest())[0]
+
+def split_member_name(name):
+    key, _, ext = name.rpartition('.')
+    return key, ext
+
+class ShardReader:
+    # get(key) reads one sample by key through the memory-mapped index and
+    # shards; iter_samples() reads the shards front to back, the fast path
+    # for a loader that reads everything. Safe to share between threads.
+    def __init__(self, folder):
+        self.folder = folder
+        with open(os.path.join(folder, INDEX_FILE), 'r') as index_file:
+            self.index = json.load(index_file)
+        self.extensions = self.index["extensions"]
+        self.shard_names = [shard["name"] for shard in self.index["shards"]]
+        self.records_file = open(os.path.join(folder, INDEX_RECORDS_FILE), 'rb')
+        size = os.fstat(self.records_file.fileno()).st_size
+        # mmap cannot map an empty file
+        self.records = mmap.mmap(self.records_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.record_count = size // INDEX_RECORD.size
+        self.shards = {}  # shard id -> (file, mmap), opened on first use
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.index["samples"]
+
+    def __contains__(self, key):
+        return bool(self.find(key))
+
+    def keys(self):
+        with open(os.path.join(self.folder, KEYS_FILE), 'r', encoding='utf-8') as keys_file:
+            return [line.rstrip('\n') for line in keys_file]
+
+    def find(self, key):
+        # [(ext, shard id, data offset, size)] for the key's files
+        target = key_hash(key)
+        low, high = 0, self.record_count
+        while low < high:
+            middle = (low + high) // 2
+            if KEY_HASH.unpack_from(self.records, middle * INDEX_RECORD.size)[0] < target:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        for position in range(low, self.record_count):
+            hashed, shard_id, ext_id, offset, size = INDEX_RECORD.unpack_from(self.records, position * INDEX_RECORD.size)
+            if hashed != target:
+                break
+            found.append((self.extensions[ext_id], shard_id, offset, size))
+        return found
+
+    def shard(self, shard_id):
+        with self.lock:
+            if shard_id not in self.shards:
+                shard_file = open(os.path.join(self.folder, self.shard_names[shard_id]), 'rb')
+                self.shards[shard_id] = (shard_file, mmap.mmap(shard_file.fileno(), 0, access=mmap.ACCESS_READ))
+            return self.shards[shard_id][1]
+
+    def get(self, key):
+        # {ext: bytes}; raises KeyError for unknown keys
+        found = self.find(key)
+        if not found:
+            raise KeyError(key)
+        return {ext: self.shard(shard_id)[offset:offset + size] for ext, shard_id, offset, size in found}
+
+    def iter_samples(self):
+        # Yields (key, {ext: bytes}) in shard order. Records are visited by
+        # offset, so each shard is read front to back with no header parsing.
+        records = sorted(INDEX_RECORD.iter_unpack(self.records), key=lambda record: (record[1], record[3]))
+        keys = iter(self.keys())
+        current_hash, key, sample = None, None, {}
+        for hashed, shard_id, ext_id, offset, size in records:
+            if hashed != current_hash:
+                if sample:
+                    yield key, sample
+                current_hash, key, sample = hashed, next(keys), {}
+            sample[self.extensions[ext_id]] = self.shard(shard_id)[offset:offset + size]
+        if sample:
+            yield key, sample
+
+    def close(self):
+        with self.lock:
+            for shard_file, shard_map in self.shards.values():
+                shard_map.close()
+                shard_file.close()
+            self.shards = {}
+        if self.record_count:
+            self.records.close()
+        self.records_file.close()
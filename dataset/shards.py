@@ -0,0 +1,283 @@
+import io
+import os
+import json
+import time
+import tarfile
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataset.shard_reader import (INDEX_FILE, INDEX_RECORDS_FILE, KEYS_FILE, SHARD_PATTERN, INDEX_RECORD,
+                                  key_hash, split_member_name)
+
+# Packs a captioned image folder into a few large tar shards so loaders do
+# sequential reads instead of two opens per sample; see shard_reader.py for
+# the layout. Shards are written in parallel, each to a temp file first, and
+# a shard whose source files are unchanged is skipped on the next run.
+#
+#   python -m dataset.shards export path/to/dataset path/to/dataset_shards
+#   python -m dataset.shards verify path/to/dataset_shards
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif')
+DEFAULT_SHARD_SIZE = 256 * 1024 * 1024
+DEFAULT_WORKERS = 4
+HASH_CHUNK = 1024 * 1024
+FORMAT_VERSION = 1
+
+class HashingWriter:
+    # File wrapper that hashes everything tarfile writes, so a shard's
+    # checksum costs no second read
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.raw.write(data)
+
+    def tell(self):
+        return self.raw.tell()
+
+def write_json_atomic(path, data):
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as json_file:
+        json.dump(data, json_file)
+    os.replace(temp_path, path)
+
+def caption_path_for(img_path):
+    return img_path.rsplit('.', 1)[0] + '.txt'
+
+def collect_samples(image_paths):
+    # [(key, [(ext, path, size, mtime_ns)])] sorted by key; the key is the
+    # file name without its extension, shared by the image and its caption
+    samples = {}
+    for img_path in image_paths:
+        key, ext = split_member_name(os.path.basename(img_path))
+        if key in samples:
+            raise ValueError(f"Two images are named {key}; shard keys must be unique")
+        files = [(ext.lower(), img_path)]
+        caption_path = caption_path_for(img_path)
+        if os.path.exists(caption_path):
+            files.append(("txt", caption_path))
+        samples[key] = files
+
+    collected = []
+    for key in sorted(samples):
+        files = []
+        for ext, path in samples[key]:
+            stat = os.stat(path)
+            files.append((ext, path, stat.st_size, stat.st_mtime_ns))
+        collected.append((key, files))
+    return collected
+
+def plan_shards(samples, shard_size=DEFAULT_SHARD_SIZE):
+    # [(samples, fingerprint)]; consecutive samples fill each shard up to
+    # shard_size. The fingerprint changes when any of the shard's files do.
+    plan = []
+    current, current_size = [], 0
+    for key, files in samples:
+        sample_size = sum(size for _, _, size, _ in files)
+        if current and current_size + sample_size > shard_size:
+            plan.append(current)
+            current, current_size = [], 0
+        current.append((key, files))
+        current_size += sample_size
+    if current:
+        plan.append(current)
+
+    shards = []
+    for shard_samples in plan:
+        description = [(key, [(ext, size, mtime_ns) for ext, _, size, mtime_ns in files]) for key, files in shard_samples]
+        shards.append((shard_samples, hashlib.sha256(json.dumps(description).encode('utf-8')).hexdigest()))
+    return shards
+
+def shard_record_path(output_folder, shard_id):
+    return os.path.join(output_folder, SHARD_PATTERN.format(shard_id).replace(".tar", ".json"))
+
+def completed_shard(output_folder, shard_id, fingerprint):
+    # The shard's record if an earlier run finished it from the same files
+    try:
+        with open(shard_record_path(output_folder, shard_id), 'r', encoding='utf-8') as record_file:
+            record = json.load(record_file)
+        if record["fingerprint"] == fingerprint and os.path.getsize(os.path.join(output_folder, record["name"])) == record["size"]:
+            return record
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+def write_shard(output_folder, shard_id, shard_samples, fingerprint):
+    name = SHARD_PATTERN.format(shard_id)
+    tar_path = os.path.join(output_folder, name)
+    temp_path = tar_path + ".tmp"
+    members = []  # [key, ext, data offset, size]
+    with open(temp_path, 'wb') as raw:
+        hashing = HashingWriter(raw)
+        with tarfile.open(fileobj=hashing, mode='w', format=tarfile.PAX_FORMAT) as tar:
+            for key, files in shard_samples:
+                for ext, path, _, mtime_ns in files:
+                    with open(path, 'rb') as source:
+                        data = source.read()
+                    info = tarfile.TarInfo(f"{key}.{ext}")
+                    info.size = len(data)
+                    info.mtime = mtime_ns // 1_000_000_000
+                    tar.addfile(info, io.BytesIO(data))
+                    # tarfile pads the data to whole blocks and stops after it
+                    padded_size = -(-len(data) // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                    members.append([key, ext, tar.offset - padded_size, len(data)])
+        size = raw.tell()
+    os.replace(temp_path, tar_path)
+    record = {"name": name, "size": size, "sha256": hashing.sha256.hexdigest(), "fingerprint": fingerprint,
+              "samples": len(shard_samples), "members": members}
+    # Written after the tar is in place; its presence marks the shard done
+    write_json_atomic(shard_record_path(output_folder, shard_id), record)
+    return record
+
+def remove_stale_shards(output_folder, shard_count):
+    # Left over from an earlier export of a bigger dataset
+    for entry in os.scandir(output_folder):
+        key, ext = split_member_name(entry.name)
+        if ext in ("tar", "json", "tmp") and key.startswith("shard-"):
+            try:
+                shard_id = int(key.split('-', 1)[1].split('.', 1)[0])
+            except ValueError:
+                continue
+            if shard_id >= shard_count or ext == "tmp":
+                os.remove(entry.path)
+
+def write_index(output_folder, records, source_folder):
+    extensions = sorted({member[1] for record in records for member in record["members"]})
+    ext_ids = {ext: ext_id for ext_id, ext in enumerate(extensions)}
+    entries = []
+    keys = []
+    for shard_id, record in enumerate(records):
+        for key, ext, offset, size in record["members"]:
+            entries.append((key_hash(key), shard_id, ext_ids[ext], offset, size))
+            if not keys or keys[-1] != key:
+                keys.append(key)
+    entries.sort(key=lambda entry: (entry[0], entry[2]))
+
+    buffer = bytearray(INDEX_RECORD.size * len(entries))
+    for position, entry in enumerate(entries):
+        INDEX_RECORD.pack_into(buffer, position * INDEX_RECORD.size, *entry)
+    records_path = os.path.join(output_folder, INDEX_RECORDS_FILE)
+    with open(records_path + ".tmp", 'wb') as records_file:
+        records_file.write(buffer)
+    os.replace(records_path + ".tmp", records_path)
+    keys_path = os.path.join(output_folder, KEYS_FILE)
+    with open(keys_path + ".tmp", 'w', encoding='utf-8') as keys_file:
+        keys_file.write("".join(f"{key}\n" for key in keys))
+    os.replace(keys_path + ".tmp", keys_path)
+
+    write_json_atomic(os.path.join(output_folder, INDEX_FILE), {
+        "version": FORMAT_VERSION,
+        "source": os.path.abspath(source_folder) if source_folder else None,
+        "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "samples": len(keys),
+        "extensions": extensions,
+        "shards": [{"name": record["name"], "size": record["size"], "sha256": record["sha256"], "samples": record["samples"]}
+                   for record in records],
+    })
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as shard_file:
+        for chunk in iter(lambda: shard_file.read(HASH_CHUNK), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def verify_shards(output_folder, workers=DEFAULT_WORKERS):
+    # Shard names whose contents no longer match the recorded SHA-256
+    with open(os.path.join(output_folder, INDEX_FILE), 'r') as index_file:
+        shards = json.load(index_file)["shards"]
+
+    def check(shard):
+        try:
+            return file_sha256(os.path.join(output_folder, shard["name"])) == shard["sha256"]
+        except OSError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(check, shards))
+    return [shard["name"] for shard, ok in zip(shards, results) if not ok]
+
+def export_shards(image_paths, output_folder, shard_size=DEFAULT_SHARD_SIZE, workers=DEFAULT_WORKERS,
+                  verify=True, progress=None):
+    # progress(shards done, shard count) is called as each shard finishes.
+    # Returns a summary dict; re-running resumes where an earlier run stopped.
+    start = time.monotonic()
+    samples = collect_samples(image_paths)
+    plan = plan_shards(samples, shard_size)
+    os.makedirs(output_folder, exist_ok=True)
+    # index.json goes first, so an interrupted export never looks complete
+    index_path = os.path.join(output_folder, INDEX_FILE)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+    records = [completed_shard(output_folder, shard_id, fingerprint) for shard_id, (_, fingerprint) in enumerate(plan)]
+    skipped = sum(1 for record in records if record)
+    done = skipped
+    if progress:
+        progress(done, len(plan))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(write_shard, output_folder, shard_id, shard_samples, fingerprint): shard_id
+                   for shard_id, (shard_samples, fingerprint) in enumerate(plan) if records[shard_id] is None}
+        for future in as_completed(futures):
+            records[futures[future]] = future.result()
+            done += 1
+            if progress:
+                progress(done, len(plan))
+
+    remove_stale_shards(output_folder, len(plan))
+    source_folder = os.path.dirname(image_paths[0]) if image_paths else None
+    write_index(output_folder, records, source_folder)
+    corrupt = verify_shards(output_folder, workers) if verify else []
+    if corrupt:
+        # Resume only compares sizes; damaged shards are rebuilt from the sources once
+        for shard_id, (shard_samples, fingerprint) in enumerate(plan):
+            if records[shard_id]["name"] in corrupt:
+                records[shard_id] = write_shard(output_folder, shard_id, shard_samples, fingerprint)
+        write_index(output_folder, records, source_folder)
+        corrupt = verify_shards(output_folder, workers)
+    return {
+        "samples": len(samples),
+        "shards": len(plan),
+        "written": len(plan) - skipped,
+        "skipped": skipped,
+        "bytes": sum(record["size"] for record in records),
+        "seconds": time.monotonic() - start,
+        "corrupt": corrupt,
+    }
+
+def list_images(folder):
+    return [os.path.join(folder, name) for name in os.listdir(folder) if name.lower().endswith(IMAGE_EXTENSIONS)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack a captioned image folder into tar shards with an index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("dataset_folder")
+    export_parser.add_argument("output_folder")
+    export_parser.add_argument("--shard-size-mb", type=int, default=DEFAULT_SHARD_SIZE // (1024 * 1024))
+    export_parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    export_parser.add_argument("--no-verify", action="store_true")
+    verify_parser = commands.add_parser("verify")
+    verify_parser.add_argument("output_folder")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        corrupt = verify_shards(args.output_folder)
+        print("All shards match their checksums." if not corrupt else f"Checksum mismatch: {', '.join(corrupt)}")
+        raise SystemExit(1 if corrupt else 0)
+
+    summary = export_shards(list_images(args.dataset_folder), args.output_folder, args.shard_size_mb * 1024 * 1024,
+                            args.workers, not args.no_verify,
+                            lambda done, total: print(f"\rShards: {done}/{total}", end="", flush=True))
+    print()
+    print(f"{summary['samples']} samples in {summary['shards']} shards ({summary['skipped']} reused), "
+          f"{summary['bytes'] / 1e6:.1f} MB in {summary['seconds']:.1f} s")
+    if summary["corrupt"]:
+        print(f"Checksum mismatch: {', '.join(summary['corrupt'])}")
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -2,27 +2,81 @@ import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 from PIL import Image, ImageTk
 import os
+import json
 import shutil
-import torch
-from transformers import AutoProcessor, AutoModelForCausalLM
 from functools import partial
 import threading
-import queue
+import tracing
+from gui.ui_bus import UIBus, LATEST, BATCH
+from captioner.florence import FlorenceCaptioner, load_image, PROFILES, DEFAULT_PROFILE
+from captioner.ipc import CaptionClient, DEFAULT_PORT as CAPTION_SERVER_PORT
+from dataset.shards import export_shards, DEFAULT_SHARD_SIZE
+from dataset.quality import score_images, quality_problems, format_scores, DEFAULT_THRESHOLDS
+
+CONFIG_FILE = "ai_toolkit_helper_config.json"
+IN_PROCESS_BATCH_SIZE = 4
+QUALITY_REJECT_FOLDER = "low_quality"
+
+# Gallery sort orders; unscored images always go last
+QUALITY_SORT_KEYS = {
+    "Name": None,
+    "Sharpness": lambda scores: scores["sharpness"],
+    "Brightness": lambda scores: scores["brightness"],
+    "Contrast": lambda scores: scores["contrast"],
+    "Resolution": lambda scores: scores["width"] * scores["height"],
+}
+
+QUALITY_THRESHOLD_FIELDS = [
+    ("min_sharpness", "Min Sharpness:"),
+    ("min_brightness", "Min Brightness:"),
+    ("max_brightness", "Max Brightness:"),
+    ("min_contrast", "Min Contrast:"),
+    ("min_side", "Min Side (px):"),
+]
+
+def load_config():
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as config_file:
+            return json.load(config_file)
+    return {}
 
 class ImageCaptioningTab:
     def __init__(self, tab):
         self.tab = tab
         self.images = []
         self.captions = {}
-        self.image_queue = queue.Queue()
+        self.quality_scores = {}
         self.setup_ui()
+        self.setup_ui_bus()
         self.setup_florence()
-
-    def setup_florence(self, model_name="microsoft/Florence-2-base"):
-        device = "cuda:0" if torch.cuda.is_available() else "cpu"
-        torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
-        self.florence_processor = AutoProcessor.from_pretrained(model_name, trust_remote_code=True)
-        self.florence_model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch_dtype, trust_remote_code=True).to(device)
+        config = load_config()
+        self.caption_client = CaptionClient(port=int(config.get("caption_server_port", CAPTION_SERVER_PORT)))
+        self.batch_size = int(config.get("caption_batch_size", IN_PROCESS_BATCH_SIZE))
+        self.shard_size = int(config.get("dataset_shard_size_mb", DEFAULT_SHARD_SIZE // (1024 * 1024))) * 1024 * 1024
+
+    def setup_ui_bus(self):
+        # Worker threads never touch widgets; they post here and the Tk thread
+        # applies the latest status and all new captions once per frame
+        self.ui_bus = UIBus(self.tab)
+        self.ui_bus.subscribe("status", lambda text: self.feedback_label.config(text=text), LATEST)
+        self.ui_bus.subscribe("captions", self.update_captions_in_ui, BATCH)
+        self.ui_bus.subscribe("images_loaded", self.add_loaded_images)
+        self.ui_bus.subscribe("quality_scores", self.apply_quality_scores)
+
+    def setup_florence(self, model="Base"):
+        # The in-process model is loaded on first use, and only when no caption
+        # server is running, so tabs sharing a server never hold a copy
+        self.florence_model_choice = model
+        self.captioner = None
+        self.captioner_lock = threading.Lock()
+
+    def get_captioner(self):
+        with self.captioner_lock:
+            if self.captioner is None or self.captioner.model != self.florence_model_choice:
+                self.ui_bus.post("status", f"Loading Florence-2 {self.florence_model_choice}...")
+                self.captioner = None  # Release the old model before loading another
+                self.captioner = FlorenceCaptioner(self.florence_model_choice)
+            return self.captioner
 
     def setup_ui(self):
         self.main_frame = ttk.Frame(self.tab)
@@ -30,6 +84,7 @@ class ImageCaptioningTab:
 
         self.create_image_loading_section()
         self.create_auto_captioning_section()
+        self.create_quality_section()
         self.create_caption_modification_section()
         self.create_gallery_section()
 
@@ -46,6 +101,7 @@ class ImageCaptioningTab:
 
         ttk.Button(load_frame, text="Add Missing Caption Files", command=self.add_missing_captions).pack(side=tk.LEFT, padx=5, pady=5)
         ttk.Button(load_frame, text="Convert to PNG & Backup", command=self.convert_to_png_and_backup).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Button(load_frame, text="Export Shards", command=self.export_shards).pack(side=tk.LEFT, padx=5, pady=5)
 
     def create_auto_captioning_section(self):
         auto_caption_frame = ttk.LabelFrame(self.main_frame, text="Auto Captioning")
@@ -62,13 +118,53 @@ class ImageCaptioningTab:
         self.detail_selector.set("Short")
         self.detail_selector.pack(side=tk.LEFT, padx=5, pady=5)
 
+        # Fast is greedy with short token budgets; Quality is the full beam search
+        ttk.Label(auto_caption_frame, text="Speed Profile:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.profile_selector = ttk.Combobox(auto_caption_frame, values=list(PROFILES), state="readonly", width=10)
+        self.profile_selector.set(load_config().get("caption_profile", DEFAULT_PROFILE))
+        self.profile_selector.pack(side=tk.LEFT, padx=5, pady=5)
+
         ttk.Button(auto_caption_frame, text="Generate All Captions", command=self.auto_caption_images).pack(side=tk.LEFT, padx=5, pady=5)
 
     def switch_model(self, event):
         selected_model = self.model_selector.get()
-        model_name = "microsoft/Florence-2-base" if selected_model == "base" else "microsoft/Florence-2-large"
-        self.setup_florence(model_name)
-        messagebox.showinfo("Model Switched", f"Switched to {selected_model} model.")
+        self.florence_model_choice = selected_model
+        message = f"Switched to {selected_model} model."
+        server = self.caption_client.info()
+        if server and server.get("model") != selected_model:
+            message += f"\n\nThe running caption server uses the {server.get('model')} model and will keep captioning with it."
+        messagebox.showinfo("Model Switched", message)
+
+    def create_quality_section(self):
+        quality_frame = ttk.LabelFrame(self.main_frame, text="Image Quality")
+        quality_frame.pack(fill=tk.X, pady=(0, 10))
+
+        view_frame = ttk.Frame(quality_frame)
+        view_frame.pack(fill=tk.X)
+        ttk.Button(view_frame, text="Score Quality", command=self.score_quality).pack(side=tk.LEFT, padx=5, pady=5)
+        ttk.Label(view_frame, text="Sort By:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.quality_sort_selector = ttk.Combobox(view_frame, values=list(QUALITY_SORT_KEYS), state="readonly", width=12)
+        self.quality_sort_selector.set("Name")
+        self.quality_sort_selector.pack(side=tk.LEFT, padx=5, pady=5)
+        self.quality_sort_selector.bind("<<ComboboxSelected>>", lambda event: self.display_gallery())
+        ttk.Label(view_frame, text="Show:").pack(side=tk.LEFT, padx=5, pady=5)
+        self.quality_filter_selector = ttk.Combobox(view_frame, values=["All", "Below Threshold", "Passing"], state="readonly", width=16)
+        self.quality_filter_selector.set("All")
+        self.quality_filter_selector.pack(side=tk.LEFT, padx=5, pady=5)
+        self.quality_filter_selector.bind("<<ComboboxSelected>>", lambda event: self.display_gallery())
+        ttk.Button(view_frame, text="Move Below Threshold Aside", command=self.move_below_threshold_aside).pack(side=tk.LEFT, padx=5, pady=5)
+
+        threshold_frame = ttk.Frame(quality_frame)
+        threshold_frame.pack(fill=tk.X)
+        thresholds = dict(DEFAULT_THRESHOLDS, **load_config().get("quality_thresholds", {}))
+        self.threshold_entries = {}
+        for key, label in QUALITY_THRESHOLD_FIELDS:
+            ttk.Label(threshold_frame, text=label).pack(side=tk.LEFT, padx=5, pady=5)
+            entry = ttk.Entry(threshold_frame, width=7)
+            entry.insert(0, str(thresholds[key]))
+            entry.pack(side=tk.LEFT, padx=(0, 5), pady=5)
+            entry.bind("<Return>", lambda event: self.display_gallery())
+            self.threshold_entries[key] = entry
 
     def create_caption_modification_section(self):
         modify_frame = ttk.LabelFrame(self.main_frame, text="Caption Modification")
@@ -105,26 +201,21 @@ class ImageCaptioningTab:
         self.canvas.bind_all("<MouseWheel>", lambda event: self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units"))
 
     def load_images_thread(self):
-        threading.Thread(target=self.load_images, daemon=True).start()
-
-    def load_images(self):
+        # The dialog stays on the Tk thread; listing and caption reads do not
         folder_path = filedialog.askdirectory()
         if folder_path:
-            images = [os.path.join(folder_path, f) for f in os.listdir(folder_path) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp', '.gif'))]
-            for img in images:
-                self.image_queue.put(img)
-            self.tab.after(0, self.process_image_queue)
+            threading.Thread(target=self.load_images, args=(folder_path,), daemon=True).start()
 
-    def process_image_queue(self):
-        try:
-            while not self.image_queue.empty():
-                img_path = self.image_queue.get_nowait()
-                self.images.append(img_path)
-                self.captions[img_path] = self.load_caption(img_path)
-            self.display_gallery()
-        except queue.Empty:
-            pass
+    def load_images(self, folder_path):
+        images = [os.path.join(folder_path, f) for f in os.listdir(folder_path) 
+                  if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp', '.gif'))]
+        self.ui_bus.post("images_loaded", [(img, self.load_caption(img)) for img in images])
+
+    def add_loaded_images(self, loaded):
+        for img_path, caption in loaded:
+            self.images.append(img_path)
+            self.captions[img_path] = caption
+        self.display_gallery()
 
     def load_caption(self, img_path):
         caption_path = img_path.rsplit('.', 1)[0] + '.txt'
@@ -151,53 +242,86 @@ class ImageCaptioningTab:
         self.display_gallery()
 
     def auto_caption_images(self):
-        threading.Thread(target=self._auto_caption_images_thread, daemon=True).start()
-
-    def _auto_caption_images_thread(self):
-        for img_path in self.images:
-            self.auto_caption_single_image(img_path)
-        self.tab.after(0, lambda: messagebox.showinfo("Auto Captioning", "All images have been captioned."))
-        self.tab.after(0, self.display_gallery)
+        self.start_captioning(list(self.images), announce=True)
 
     def auto_caption_single_image(self, img_path):
-        self.feedback_label.config(text=f"Generating caption for {os.path.basename(img_path)}...")
-        self.tab.update_idletasks()
+        self.start_captioning([img_path])
 
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    def start_captioning(self, img_paths, announce=False):
+        # Widget state is read here, on the Tk thread, before the worker starts
         detail_level = self.detail_selector.get()
-        prompt = "<CAPTION>" if detail_level == "Short" else "<DETAILED_CAPTION>" if detail_level == "Detailed" else "<MORE_DETAILED_CAPTION>"
-        
-        image = Image.open(img_path).convert("RGB")
-        inputs = self.florence_processor(text=prompt, images=image, return_tensors="pt", do_rescale=False).to(self.florence_model.device)
-        inputs["pixel_values"] = inputs["pixel_values"].to(device, torch.float32)
-        
-        with torch.no_grad():
-            generated_ids = self.florence_model.generate(
-                input_ids=inputs["input_ids"],
-                pixel_values=inputs["pixel_values"],
-                max_new_tokens=1024,
-                num_beams=3,
-                do_sample=False
-            )
-            generated_text = self.florence_processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-
-        caption = generated_text.replace('</s>', '').replace('<s>', '').replace('<pad>', '').strip()
-        self.captions[img_path] = caption
+        profile = self.profile_selector.get()
+        threading.Thread(target=self._auto_caption_images_thread, args=(img_paths, detail_level, profile, announce), daemon=True).start()
+
+    def _auto_caption_images_thread(self, img_paths, detail_level, profile, announce):
+        remaining = list(img_paths)
+        failed = []
+        if self.caption_client.is_available():
+            remaining, failed = self.caption_with_server(remaining, detail_level, profile)
+        if remaining:
+            failed += self.caption_in_process(remaining, detail_level, profile)
+        if failed:
+            self.ui_bus.call(messagebox.showerror, "Auto Captioning", f"Could not caption {len(failed)} image{'s' if len(failed) > 1 else ''}:\n" + "\n".join(failed[:10]))
+        elif announce:
+            self.ui_bus.call(messagebox.showinfo, "Auto Captioning", "All images have been captioned.")
+
+    def caption_with_server(self, img_paths, detail_level, profile):
+        # Returns (images still to caption, failed images); if the server goes
+        # away mid-run, the rest falls back to the in-process model
+        remaining = set(img_paths)
+        failed = []
+        self.ui_bus.post("status", f"Captioning {len(img_paths)} images on the caption server...")
+        try:
+            for img_path, caption, error in self.caption_client.caption(img_paths, detail_level, profile):
+                remaining.discard(img_path)
+                if error is not None:
+                    print(f"Error captioning {img_path}: {error}")
+                    failed.append(os.path.basename(img_path))
+                    continue
+                self.apply_generated_caption(img_path, caption)
+                self.ui_bus.post("status", f"Caption generated for {os.path.basename(img_path)} ({len(img_paths) - len(remaining)}/{len(img_paths)}, server)")
+        except (OSError, ValueError) as e:
+            print(f"Caption server unavailable, captioning in-process: {str(e)}")
+        return [img_path for img_path in img_paths if img_path in remaining], failed
+
+    def caption_in_process(self, img_paths, detail_level, profile):
+        # Returns the failed images
+        captioner = self.get_captioner()
+        failed = []
+        for start in range(0, len(img_paths), self.batch_size):
+            images = []
+            loaded_paths = []
+            for img_path in img_paths[start:start + self.batch_size]:
+                try:
+                    images.append(load_image(img_path))
+                    loaded_paths.append(img_path)
+                except OSError as e:
+                    print(f"Error loading image {img_path}: {e}")
+                    failed.append(os.path.basename(img_path))
+            if not images:
+                continue
+            self.ui_bus.post("status", f"Generating captions for {', '.join(os.path.basename(path) for path in loaded_paths)}...")
+            for img_path, caption in zip(loaded_paths, captioner.caption_images(images, detail_level, profile)):
+                self.apply_generated_caption(img_path, caption)
+            self.ui_bus.post("status", f"Caption generated for {os.path.basename(loaded_paths[-1])}")
+        return failed
+
+    def apply_generated_caption(self, img_path, caption):
         self.save_caption(img_path, caption)
+        self.ui_bus.post("captions", caption, key=img_path)
 
-        self.feedback_label.config(text=f"Caption generated for {os.path.basename(img_path)}")
-        self.tab.update_idletasks()
-
-        # Update the displayed caption in the UI
-        self.update_caption_in_ui(img_path, caption)
-
-    def update_caption_in_ui(self, img_path, new_caption):
+    def update_captions_in_ui(self, updates):
+        # One pass over the gallery for a whole frame's worth of captions
+        self.captions.update(updates)
+        pending = dict(updates)
         for widget in self.gallery_frame.winfo_children():
-            if hasattr(widget, 'img_path') and widget.img_path == img_path:
+            new_caption = pending.pop(getattr(widget, 'img_path', None), None)
+            if new_caption is not None:
                 caption_text = widget.caption_text
                 caption_text.delete("1.0", tk.END)
                 caption_text.insert(tk.END, new_caption)
-                break
+                if not pending:
+                    break
 
     def inject_trigger(self):
         trigger_word = self.trigger_entry.get()
@@ -217,28 +341,55 @@ class ImageCaptioningTab:
 
     def save_caption(self, img_path, caption):
         caption_path = img_path.rsplit('.', 1)[0] + '.txt'
-        with open(caption_path, 'w') as f:
+        with tracing.span("caption.write"), open(caption_path, 'w') as f:
             f.write(caption)
 
+    def read_thresholds(self):
+        # None (after telling the user) if an entry is not a number
+        try:
+            return {key: float(entry.get()) for key, entry in self.threshold_entries.items()}
+        except ValueError:
+            messagebox.showerror("Image Quality", "Quality thresholds must be numbers.")
+            return None
+
+    def gallery_images(self, thresholds):
+        # self.images in the selected sort order, limited by the quality filter
+        images = list(self.images)
+        sort_key = QUALITY_SORT_KEYS[self.quality_sort_selector.get()]
+        if sort_key is None:
+            images.sort(key=lambda img_path: os.path.basename(img_path).lower())
+        else:
+            images.sort(key=lambda img_path: (img_path not in self.quality_scores,
+                                              sort_key(self.quality_scores[img_path]) if img_path in self.quality_scores else 0))
+        shown = self.quality_filter_selector.get()
+        if shown != "All":
+            below = shown == "Below Threshold"
+            images = [img_path for img_path in images if img_path in self.quality_scores
+                      and bool(quality_problems(self.quality_scores[img_path], thresholds)) == below]
+        return images
+
     def display_gallery(self):
-        for widget in self.gallery_frame.winfo_children():
-            widget.destroy()
+        with tracing.span("gallery.rebuild", images=len(self.images)):
+            for widget in self.gallery_frame.winfo_children():
+                widget.destroy()
 
-        for img_path in self.images:
-            self.display_image_with_caption(img_path)
+            thresholds = (self.read_thresholds() if self.quality_scores else None) or DEFAULT_THRESHOLDS
+            for img_path in self.gallery_images(thresholds):
+                self.display_image_with_caption(img_path, thresholds)
 
-        self.gallery_frame.update_idletasks()
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+            self.gallery_frame.update_idletasks()
+            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
 
-    def display_image_with_caption(self, img_path):
+    def display_image_with_caption(self, img_path, thresholds=DEFAULT_THRESHOLDS):
         frame = ttk.Frame(self.gallery_frame)
         frame.pack(side="top", fill="x", padx=5, pady=5)
         frame.img_path = img_path  # Store img_path as an attribute of the frame
 
         try:
-            img = Image.open(img_path)
-            img.thumbnail((200, 200))
-            photo = ImageTk.PhotoImage(img)
+            with tracing.span("gallery.thumbnail"):
+                img = Image.open(img_path)
+                img.thumbnail((200, 200))
+                photo = ImageTk.PhotoImage(img)
             img_label = ttk.Label(frame, image=photo)
             img_label.image = photo
             img_label.pack(side="left", padx=5, pady=5)
@@ -249,6 +400,12 @@ class ImageCaptioningTab:
         caption_frame = ttk.Frame(frame)
         caption_frame.pack(side="left", fill="both", expand=True, padx=5, pady=5)
 
+        scores = self.quality_scores.get(img_path)
+        if scores:
+            problems = quality_problems(scores, thresholds)
+            score_text = format_scores(scores) + (f" - {', '.join(problems)}" if problems else "")
+            ttk.Label(caption_frame, text=score_text, foreground="red" if problems else "").pack(side="top", anchor="w")
+
         caption_text = tk.Text(caption_frame, height=5, wrap="word")
         caption_text.insert("1.0", self.captions.get(img_path, ""))
         caption_text.pack(side="top", fill="both", expand=True)
@@ -291,11 +448,14 @@ class ImageCaptioningTab:
 
             # Convert to PNG if not already PNG
             if not img_path.lower().endswith(".png"):
-                img = Image.open(backup_path)
                 new_path = os.path.join(folder_path, os.path.splitext(os.path.basename(img_path))[0] + '.png')
-                img.save(new_path, "PNG")
+                with tracing.span("png.convert"):
+                    img = Image.open(backup_path)
+                    img.save(new_path, "PNG")
                 new_images.append(new_path)
                 self.captions[new_path] = self.captions.pop(img_path)
+                if img_path in self.quality_scores:
+                    self.quality_scores[new_path] = self.quality_scores.pop(img_path)
             else:
                 new_images.append(backup_path)
 
@@ -303,5 +463,107 @@ class ImageCaptioningTab:
         messagebox.showinfo("Conversion Complete", "All images have been backed up and converted to PNG where applicable.")
         self.display_gallery()
 
+    def export_shards(self):
+        if not self.images:
+            messagebox.showinfo("Export Shards", "Load a dataset first.")
+            return
+        # Shards go next to the dataset; exporting again resumes or updates them
+        source_folder = os.path.dirname(self.images[0])
+        output_folder = source_folder + "_shards"
+        threading.Thread(target=self._export_shards_thread, args=(list(self.images), output_folder), daemon=True).start()
+
+    def _export_shards_thread(self, img_paths, output_folder):
+        try:
+            summary = export_shards(img_paths, output_folder, self.shard_size,
+                                    progress=lambda done, total: self.ui_bus.post("status", f"Exporting shards: {done}/{total}"))
+        except (OSError, ValueError) as e:
+            self.ui_bus.post("status", "Shard export failed")
+            self.ui_bus.call(messagebox.showerror, "Export Shards", f"Export failed: {str(e)}")
+            return
+        self.ui_bus.post("status", f"Exported {summary['samples']} samples to {output_folder}")
+        if summary["corrupt"]:
+            self.ui_bus.call(messagebox.showerror, "Export Shards", f"Checksum mismatch after export: {', '.join(summary['corrupt'])}")
+            return
+        self.ui_bus.call(messagebox.showinfo, "Export Shards",
+                         f"{summary['samples']} samples in {summary['shards']} shards ({summary['bytes'] / 1e6:.1f} MB), "
+                         f"{summary['written']} written and {summary['skipped']} unchanged, checksums verified.\n\n{output_folder}")
+
+    def score_quality(self):
+        if not self.images:
+            messagebox.showinfo("Image Quality", "Load a dataset first.")
+            return
+        threading.Thread(target=self._score_quality_thread, args=(list(self.images),), daemon=True).start()
+
+    def _score_quality_thread(self, img_paths):
+        try:
+            scores, errors = score_images(img_paths, progress=lambda done, total: self.ui_bus.post("status", f"Scoring image quality: {done}/{total}"))
+        except OSError as e:
+            self.ui_bus.post("status", "Quality scoring failed")
+            self.ui_bus.call(messagebox.showerror, "Image Quality", f"Quality scoring failed: {str(e)}")
+            return
+        self.ui_bus.post("quality_scores", scores)
+        self.ui_bus.post("status", f"Scored {len(scores)} images")
+        if errors:
+            self.ui_bus.call(messagebox.showerror, "Image Quality", f"Could not score {len(errors)} image{'s' if len(errors) > 1 else ''}:\n" +
+                             "\n".join(f"{os.path.basename(path)}: {error}" for path, error in list(errors.items())[:10]))
+
+    def apply_quality_scores(self, scores):
+        self.quality_scores.update(scores)
+        self.display_gallery()
+
+    def move_below_threshold_aside(self):
+        thresholds = self.read_thresholds()
+        if thresholds is None:
+            return
+        rejected = [img_path for img_path in self.images
+                    if img_path in self.quality_scores and quality_problems(self.quality_scores[img_path], thresholds)]
+        if not rejected:
+            messagebox.showinfo("Image Quality", "No scored image is below the thresholds.")
+            return
+        if not messagebox.askyesno("Image Quality", f"Move {len(rejected)} image{'s' if len(rejected) > 1 else ''} and their captions "
+                                   f"into a \"{QUALITY_REJECT_FOLDER}\" subfolder?"):
+            return
+        moved = set()
+        failed = []
+        try:
+            for img_path in rejected:
+                reject_folder = os.path.join(os.path.dirname(img_path), QUALITY_REJECT_FOLDER)
+                caption_path = img_path.rsplit('.', 1)[0] + '.txt'
+                try:
+                    os.makedirs(reject_folder, exist_ok=True)
+                    # Never overwrite an earlier reject; the image and its caption keep matching names
+                    stem = unused_stem(reject_folder, os.path.splitext(os.path.basename(img_path))[0],
+                                       [os.path.splitext(img_path)[1], '.txt'])
+                    shutil.move(img_path, os.path.join(reject_folder, stem + os.path.splitext(img_path)[1]))
+                except OSError as e:
+                    failed.append(f"{os.path.basename(img_path)}: {e}")
+                    continue
+                moved.add(img_path)
+                self.captions.pop(img_path, None)
+                self.quality_scores.pop(img_path, None)
+                if os.path.exists(caption_path):
+                    try:
+                        shutil.move(caption_path, os.path.join(reject_folder, stem + '.txt'))
+                    except OSError as e:
+                        failed.append(f"{os.path.basename(caption_path)}: {e}")
+        finally:
+            # The gallery only drops what actually left the folder
+            self.images = [img_path for img_path in self.images if img_path not in moved]
+            self.display_gallery()
+        message = f"Moved {len(moved)} image{'s' if len(moved) != 1 else ''} to \"{QUALITY_REJECT_FOLDER}\"."
+        if failed:
+            messagebox.showerror("Image Quality", message + f"\n\nCould not move {len(failed)} file{'s' if len(failed) > 1 else ''}:\n" + "\n".join(failed[:20]))
+        else:
+            messagebox.showinfo("Image Quality", message)
+
+def unused_stem(folder, stem, extensions):
+    # stem, or stem_1, stem_2, ... so that no stem + extension exists in folder
+    candidate = stem
+    counter = 1
+    while any(os.path.exists(os.path.join(folder, candidate + extension)) for extension in extensions):
+        candidate = f"{stem}_{counter}"
+        counter += 1
+    return candidate
+
 def create_captioning_tab(tab):
-    return ImageCaptioningTab(tab)
\ No newline at end of file
+    return ImageCaptioningTab(tab)
@@ -5,10 +5,26 @@ import yaml
 import os
 import json
 import random
+import hashlib
+import itertools
+import re
+import threading
 from pathlib import Path
+from gui.cost_estimator import get_estimator, extract_cost_features
+from gui.ui_bus import UIBus, LATEST
+from dataset.buckets import prepare_dataset, resolution_folder, is_prepared, DEFAULT_RESOLUTIONS
+
+# The libyaml emitter is much faster for bulk sweeps
+try:
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeDumper as YamlDumper
 
 CONFIG_FILE = "ai_toolkit_helper_config.json"
 
+SWEEP_FIELDS = ("rank", "lr", "steps", "batch_size", "seed")
+PLAIN_YAML_NAME = re.compile(r'^[A-Za-z][A-Za-z0-9_.\-]*$')
+
 def load_config():
     if os.path.exists(CONFIG_FILE):
         with open(CONFIG_FILE, 'r') as config_file:
@@ -45,7 +61,199 @@ def add_tooltip(widget, text):
 def convert_windows_path(path):
     return str(Path(path).as_posix())
 
-def create_config_generator_tab(tab, ai_toolkit_folder):
+def resolve_seed(seed_input):
+    # Process seed
+    if str(seed_input).lower() == 'random':
+        return random.randint(1, 1000000)
+    return int(seed_input)
+
+def format_lr(lr):
+    # 0.0001 -> "1e-4", 0.00025 -> "2.5e-4"
+    mantissa, exponent = f"{float(lr):.3e}".split('e')
+    mantissa = mantissa.rstrip('0').rstrip('.')
+    return f"{mantissa}e{int(exponent)}"
+
+def default_lora_name(model_name, rank, lr):
+    # Rename the LoRA with settings appended
+    return f"{model_name}_flux_r{rank}_{str(lr).replace('e-', '-e')}"
+
+def build_yaml_content(lora_name, values):
+    # Replace placeholders in prompts
+    replaced_prompts = []
+    for prompt in values["prompts"]:
+        replaced_prompt = prompt.replace("[trigger]", values["trigger_word"])
+        if values["training_subject"] == "person":
+            replaced_prompt = replaced_prompt.replace("[kind_of_person]", values["kind_of_person"])
+        replaced_prompts.append(replaced_prompt)
+
+    dataset = {
+        "folder_path": convert_windows_path(values["folder_path"]),
+        "caption_ext": "txt",
+        "caption_dropout_rate": 0.05,
+        "shuffle_tokens": values["shuffle_tokens"],
+        "cache_latents_to_disk": True,
+        "resolution": list(DEFAULT_RESOLUTIONS),
+    }
+    if values.get("use_prepared"):
+        # One dataset per resolution, each reading its pre-resized copies
+        datasets = [dict(dataset, folder_path=convert_windows_path(resolution_folder(values["folder_path"], resolution)),
+                         resolution=[resolution]) for resolution in DEFAULT_RESOLUTIONS]
+    else:
+        datasets = [dataset]
+
+    # Define the base YAML structure
+    return {
+        "job": "extension",
+        "config": {
+            "name": lora_name,
+            "process": [
+                {
+                    "type": "sd_trainer",
+                    "training_folder": f"output/{lora_name}",
+                    "device": "cuda:0",
+                    "trigger_word": values["trigger_word"],
+                    "network": {
+                        "type": "lora",
+                        "linear": values["rank"],
+                        "linear_alpha": values["rank"],
+                    },
+                    "save": {
+                        "dtype": "float16",
+                        "save_every": values["save_every"],
+                        "max_step_saves_to_keep": values["max_step_saves"],
+                    },
+                    "datasets": datasets,
+                    "train": {
+                        "batch_size": values["batch_size"],
+                        "steps": values["steps"],
+                        "gradient_accumulation_steps": 1,
+                        "train_unet": True,
+                        "train_text_encoder": False,
+                        "gradient_checkpointing": True,
+                        "noise_scheduler": "flowmatch",
+                        "optimizer": "adamw8bit",
+                        "lr": values["lr"],
+                        "ema_config": {
+                            "use_ema": True,
+                            "ema_decay": 0.99,
+                        },
+                        "dtype": "bf16",
+                    },
+                    "model": {
+                        "name_or_path": "black-forest-labs/FLUX.1-dev",
+                        "is_flux": True,
+                        "quantize": True,
+                    },
+                    "sample": {
+                        "sampler": "flowmatch",
+                        "sample_every": values["sample_every"],
+                        "width": 1024,
+                        "height": 1024,
+                        "prompts": replaced_prompts,
+                        "neg": "",
+                        "seed": values["seed"],
+                        "walk_seed": True,
+                        "guidance_scale": 4,
+                        "sample_steps": 20,
+                    }
+                }
+            ],
+        },
+        "meta": {
+            "name": lora_name,
+            "version": "1.0",
+        },
+    }
+
+def write_yaml_config(output_path, yaml_content):
+    with open(output_path, 'w') as file:
+        yaml.dump(yaml_content, file, Dumper=YamlDumper, default_flow_style=False, sort_keys=False)
+
+def parse_sweep_values(text, cast):
+    # "16,32,64" or "1000:3000:500" (inclusive) or a mix of both
+    values = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if ':' in part:
+            pieces = [cast(piece) for piece in part.split(':')]
+            if len(pieces) not in (2, 3):
+                raise ValueError(f"range '{part}' must be start:stop or start:stop:step")
+            start, stop = pieces[0], pieces[1]
+            step = pieces[2] if len(pieces) == 3 else cast(1)
+            if step <= 0 or stop < start:
+                raise ValueError(f"range '{part}' must be increasing with a positive step")
+            count = int(round((stop - start) / step)) + 1
+            for i in range(count):
+                value = start + i * step
+                # Snap float ranges to 4 significant digits to avoid 1.0000000000000002e-05
+                values.append(float(format_lr(value)) if cast is float else value)
+        else:
+            values.append(cast(part))
+    return list(dict.fromkeys(values))
+
+def build_sweep_configs(values, sweep_values, samples=None):
+    # Returns [(lora_name, resolved_values)], one per unique resolved config
+    fields = list(sweep_values)
+    combinations = list(itertools.product(*(sweep_values[field] for field in fields)))
+    if samples is not None and samples < len(combinations):
+        combinations = random.sample(combinations, samples)
+
+    configs = []
+    seen_hashes = set()
+    used_names = set()
+    for combination in combinations:
+        resolved = dict(values, **dict(zip(fields, combination)))
+        resolved["lr"] = float(resolved["lr"])
+
+        # Hash the content with a placeholder name so identical configs collapse
+        content = build_yaml_content("", resolved)
+        digest = hashlib.sha1(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+        if digest in seen_hashes:
+            continue
+        seen_hashes.add(digest)
+
+        # The name carries a short hash; lengthen it in the unlikely case two configs share one
+        prefix = (f"{default_lora_name(resolved['model_name'], resolved['rank'], format_lr(resolved['lr']))}"
+                  f"_s{resolved['steps']}_b{resolved['batch_size']}_seed{resolved['seed']}_")
+        length = 8
+        while prefix + digest[:length] in used_names:
+            length += 4
+        lora_name = prefix + digest[:length]
+        used_names.add(lora_name)
+        configs.append((lora_name, resolved))
+    return configs
+
+def write_sweep_configs(config_folder, values, configs):
+    # Emitting YAML dominates bulk generation, so emit the document once with
+    # placeholder tokens and substitute each config's values into the text
+    placeholders = {field: f"__sweep_{field}__" for field in SWEEP_FIELDS}
+    template = yaml.dump(build_yaml_content("__sweep_name__", dict(values, **placeholders)),
+                         Dumper=YamlDumper, default_flow_style=False, sort_keys=False)
+    scalar_cache = {}
+
+    def yaml_scalar(value):
+        if value not in scalar_cache:
+            scalar_cache[value] = yaml.dump(value, Dumper=YamlDumper).splitlines()[0]
+        return scalar_cache[value]
+
+    filenames = []
+    for lora_name, resolved in configs:
+        output_path = os.path.join(config_folder, f"{lora_name}.yaml")
+        if not PLAIN_YAML_NAME.match(lora_name):
+            # Names that YAML would quote can't be spliced into the template
+            write_yaml_config(output_path, build_yaml_content(lora_name, resolved))
+        else:
+            text = template.replace("__sweep_name__", lora_name)
+            for field, placeholder in placeholders.items():
+                text = text.replace(placeholder, yaml_scalar(resolved[field]))
+            with open(output_path, 'w') as file:
+                file.write(text)
+        filenames.append(f"{lora_name}.yaml")
+    return filenames
+
+def create_config_generator_tab(tab, ai_toolkit_folder, enqueue_configs=None):
     frame = ttk.Frame(tab)
     frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
@@ -87,6 +295,22 @@ def create_config_generator_tab(tab, ai_toolkit_folder):
     folder_path_browse_button = ttk.Button(frame, text="Browse", command=lambda: browse_folder(folder_path_entry))
     folder_path_browse_button.grid(row=4, column=2, padx=5, pady=5)
 
+    # Pre-resized copies per resolution bucket, made once instead of every epoch
+    prepare_frame = ttk.Frame(frame)
+    prepare_frame.grid(row=4, column=3, sticky="w", padx=5, pady=5)
+    prepare_button = ttk.Button(prepare_frame, text="Prepare Buckets", command=lambda: start_prepare())
+    prepare_button.pack(side=tk.LEFT)
+    add_tooltip(prepare_button, f"Resize the dataset once to each training resolution ({', '.join(map(str, DEFAULT_RESOLUTIONS))}) in a '_prepared' folder next to it. Unchanged images are skipped.")
+    use_prepared_var = tk.BooleanVar(value=False)
+    use_prepared_checkbox = ttk.Checkbutton(prepare_frame, text="Train on prepared copies", variable=use_prepared_var)
+    use_prepared_checkbox.pack(side=tk.LEFT, padx=5)
+    add_tooltip(use_prepared_checkbox, "Point the generated YAML at the prepared copies instead of the original images.")
+    prepare_status_var = tk.StringVar(value="")
+    ttk.Label(prepare_frame, textvariable=prepare_status_var).pack(side=tk.LEFT, padx=5)
+    ui_bus = UIBus(tab)
+    ui_bus.subscribe("prepare_status", prepare_status_var.set, LATEST)
+    ui_bus.subscribe("prepare_done", lambda running: prepare_button.config(state="normal"))
+
     # Rank input
     label_rank = ttk.Label(frame, text="Rank:")
     label_rank.grid(row=5, column=0, sticky="w", padx=5, pady=5)
@@ -211,137 +435,198 @@ def create_config_generator_tab(tab, ai_toolkit_folder):
     # Initial update of prompt templates
     update_prompt_templates()
 
-    def generate_yaml_config():
+    def read_form_values():
         # Get values from entries
         training_subject = subject_selector.get().lower()
-        kind_of_person = kind_of_person_entry.get() if training_subject == "person" else ""
         model_name = model_name_entry.get() or "my_first_flux_lora"
-        trigger_word = trigger_word_entry.get() or model_name
-        folder_path = folder_path_entry.get() or "/path/to/images/folder"
-        rank = int(rank_entry.get() or "64")
-        lr = lr_entry.get() or "1e-4"
-        steps = int(steps_entry.get() or "2000")
-        batch_size = int(batch_size_entry.get() or "1")
-        save_every = int(save_every_entry.get() or "250")
-        max_step_saves = int(max_saves_entry.get() or "10")
-        sample_every = int(sample_every_entry.get() or "250")
-        shuffle_tokens = shuffle_tokens_var.get()
-        prompts = [entry.get() for entry in prompt_entries if entry.get()]
-        seed_input = seed_entry.get()
-
-        # Process seed
-        if seed_input.lower() == 'random':
-            seed = random.randint(1, 1000000)
-        else:
-            seed = int(seed_input)
-
-        # Rename the LoRA with settings appended
-        lora_name = f"{model_name}_flux_r{rank}_{lr.replace('e-', '-e')}"
-
-        # Replace placeholders in prompts
-        replaced_prompts = []
-        for prompt in prompts:
-            replaced_prompt = prompt.replace("[trigger]", trigger_word)
-            if training_subject == "person":
-                replaced_prompt = replaced_prompt.replace("[kind_of_person]", kind_of_person)
-            replaced_prompts.append(replaced_prompt)
-
-        # Define the base YAML structure
-        yaml_content = {
-            "job": "extension",
-            "config": {
-                "name": lora_name,
-                "process": [
-                    {
-                        "type": "sd_trainer",
-                        "training_folder": f"output/{lora_name}",
-                        "device": "cuda:0",
-                        "trigger_word": trigger_word,
-                        "network": {
-                            "type": "lora",
-                            "linear": rank,
-                            "linear_alpha": rank,
-                        },
-                        "save": {
-                            "dtype": "float16",
-                            "save_every": save_every,
-                            "max_step_saves_to_keep": max_step_saves,
-                        },
-                        "datasets": [
-                            {
-                                "folder_path": convert_windows_path(folder_path),
-                                "caption_ext": "txt",
-                                "caption_dropout_rate": 0.05,
-                                "shuffle_tokens": shuffle_tokens,
-                                "cache_latents_to_disk": True,
-                                "resolution": [512, 768, 1024],
-                            }
-                        ],
-                        "train": {
-                            "batch_size": batch_size,
-                            "steps": steps,
-                            "gradient_accumulation_steps": 1,
-                            "train_unet": True,
-                            "train_text_encoder": False,
-                            "gradient_checkpointing": True,
-                            "noise_scheduler": "flowmatch",
-                            "optimizer": "adamw8bit",
-                            "lr": float(lr),
-                            "ema_config": {
-                                "use_ema": True,
-                                "ema_decay": 0.99,
-                            },
-                            "dtype": "bf16",
-                        },
-                        "model": {
-                            "name_or_path": "black-forest-labs/FLUX.1-dev",
-                            "is_flux": True,
-                            "quantize": True,
-                        },
-                        "sample": {
-                            "sampler": "flowmatch",
-                            "sample_every": sample_every,
-                            "width": 1024,
-                            "height": 1024,
-                            "prompts": replaced_prompts,
-                            "neg": "",
-                            "seed": seed,
-                            "walk_seed": True,
-                            "guidance_scale": 4,
-                            "sample_steps": 20,
-                        }
-                    }
-                ],
-            },
-            "meta": {
-                "name": lora_name,
-                "version": "1.0",
-            },
+        return {
+            "training_subject": training_subject,
+            "kind_of_person": kind_of_person_entry.get() if training_subject == "person" else "",
+            "model_name": model_name,
+            "trigger_word": trigger_word_entry.get() or model_name,
+            "folder_path": folder_path_entry.get() or "/path/to/images/folder",
+            "rank": int(rank_entry.get() or "64"),
+            "lr": lr_entry.get() or "1e-4",
+            "steps": int(steps_entry.get() or "2000"),
+            "batch_size": int(batch_size_entry.get() or "1"),
+            "save_every": int(save_every_entry.get() or "250"),
+            "max_step_saves": int(max_saves_entry.get() or "10"),
+            "sample_every": int(sample_every_entry.get() or "250"),
+            "shuffle_tokens": shuffle_tokens_var.get(),
+            "prompts": [entry.get() for entry in prompt_entries if entry.get()],
+            "seed": seed_entry.get(),
+            "use_prepared": use_prepared_var.get(),
         }
 
+    def get_config_folder():
         # Get AI Toolkit folder from global setting
         ai_toolkit_folder_value = ai_toolkit_folder.get()
         if not ai_toolkit_folder_value:
             messagebox.showerror("Error", "AI Toolkit installation folder is not set. Please set it in the Settings tab.")
-            return
+            return None
 
         # Create the config folder in the AI Toolkit installation path
         config_folder = os.path.join(ai_toolkit_folder_value, 'config')
         os.makedirs(config_folder, exist_ok=True)
+        return config_folder
+
+    def start_prepare():
+        dataset_folder = folder_path_entry.get()
+        if not dataset_folder or not os.path.isdir(dataset_folder):
+            messagebox.showerror("Error", "Select an existing dataset folder first.")
+            return
+        prepare_button.config(state="disabled")
+        threading.Thread(target=prepare_thread, args=(dataset_folder,), daemon=True).start()
+
+    def prepare_thread(dataset_folder):
+        try:
+            summary = prepare_dataset(dataset_folder, DEFAULT_RESOLUTIONS,
+                                      progress=lambda done, total: ui_bus.post("prepare_status", f"Resizing {done}/{total}"))
+        except OSError as e:
+            ui_bus.post("prepare_status", "")
+            ui_bus.call(messagebox.showerror, "Prepare Buckets", f"Preparing the dataset failed: {str(e)}")
+            return
+        finally:
+            ui_bus.post("prepare_done")
+        ui_bus.post("prepare_status", f"{summary['images'] - len(summary['failed'])} images ready")
+        message = (f"{summary['prepared']} images resized and {summary['skipped']} unchanged in {summary['seconds']:.1f} s.\n\n"
+                   f"Copies are in {summary['output_folder']}.")
+        if summary["failed"]:
+            message += f"\n\n{len(summary['failed'])} failed:\n" + "\n".join(f"{name}: {error}" for name, error in summary["failed"][:10])
+        ui_bus.call(messagebox.showinfo, "Prepare Buckets", message)
+
+    def check_prepared(values):
+        if values["use_prepared"] and not is_prepared(values["folder_path"]):
+            messagebox.showerror("Error", "The dataset has no prepared copies yet. Click 'Prepare Buckets' first, or uncheck 'Train on prepared copies'.")
+            return False
+        return True
+
+    def generate_yaml_config():
+        if sweep_enabled_var.get():
+            generate_sweep_configs()
+            return
+
+        values = read_form_values()
+        if not check_prepared(values):
+            return
+        values["seed"] = resolve_seed(values["seed"])
+        lora_name = default_lora_name(values["model_name"], values["rank"], values["lr"])
+        yaml_content = build_yaml_content(lora_name, dict(values, lr=float(values["lr"])))
+
+        config_folder = get_config_folder()
+        if not config_folder:
+            return
 
         # Write the modified content to a new file in the config folder
         output_filename = f"{lora_name}.yaml"
-        output_path = os.path.join(config_folder, output_filename)
-        with open(output_path, 'w') as file:
-            yaml.dump(yaml_content, file, default_flow_style=False, sort_keys=False)
+        write_yaml_config(os.path.join(config_folder, output_filename), yaml_content)
 
         # Notify the user that the YAML file has been generated
         messagebox.showinfo("YAML Generation Complete",
-                            f"New YAML file '{output_filename}' has been generated in the 'config' folder at '{ai_toolkit_folder_value}'.")
+                            f"New YAML file '{output_filename}' has been generated in the 'config' folder at '{os.path.dirname(config_folder)}'.")
+
+    def generate_sweep_configs():
+        values = read_form_values()
+        if not check_prepared(values):
+            return
+        try:
+            sweep_values = {
+                "rank": parse_sweep_values(sweep_entries["rank"].get(), int) or [values["rank"]],
+                "lr": parse_sweep_values(sweep_entries["lr"].get(), float) or [float(values["lr"])],
+                "steps": parse_sweep_values(sweep_entries["steps"].get(), int) or [values["steps"]],
+                "batch_size": parse_sweep_values(sweep_entries["batch_size"].get(), int) or [values["batch_size"]],
+                "seed": parse_sweep_values(sweep_entries["seed"].get(), int) or [resolve_seed(values["seed"])],
+            }
+            samples = None
+            if sweep_mode_selector.get() == "Random":
+                samples = int(sweep_samples_entry.get() or "0")
+                if samples < 1:
+                    raise ValueError("random samples must be at least 1")
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid sweep values: {str(e)}")
+            return
+
+        config_folder = get_config_folder()
+        if not config_folder:
+            return
+
+        configs = build_sweep_configs(values, sweep_values, samples)
+        filenames = write_sweep_configs(config_folder, values, configs)
+        if enqueue_configs and sweep_enqueue_var.get():
+            enqueue_configs(filenames)
+
+        messagebox.showinfo("Sweep Generation Complete",
+                            f"{len(filenames)} YAML files have been generated in the 'config' folder at '{os.path.dirname(config_folder)}'.")
+
+    # Sweep settings: comma-separated values and/or start:stop:step ranges per field
+    sweep_frame = ttk.LabelFrame(frame, text="Hyperparameter Sweep")
+    sweep_frame.grid(row=19, column=0, columnspan=3, sticky="ew", padx=5, pady=5)
+    sweep_enabled_var = tk.BooleanVar(value=False)
+    ttk.Checkbutton(sweep_frame, text="Sweep mode", variable=sweep_enabled_var).grid(row=0, column=0, sticky="w", padx=5, pady=2)
+    sweep_mode_selector = ttk.Combobox(sweep_frame, values=["Grid", "Random"], state="readonly", width=8)
+    sweep_mode_selector.grid(row=0, column=1, sticky="w", padx=5, pady=2)
+    sweep_mode_selector.set("Grid")
+    ttk.Label(sweep_frame, text="Random samples:").grid(row=0, column=2, sticky="w", padx=5, pady=2)
+    sweep_samples_entry = ttk.Entry(sweep_frame, width=8)
+    sweep_samples_entry.grid(row=0, column=3, sticky="w", padx=5, pady=2)
+    sweep_samples_entry.insert(0, "20")
+
+    sweep_entries = {}
+    for i, (key, text) in enumerate([("rank", "Ranks:"), ("lr", "Learning Rates:"), ("steps", "Steps:"),
+                                     ("batch_size", "Batch Sizes:"), ("seed", "Seeds:")]):
+        label = ttk.Label(sweep_frame, text=text)
+        label.grid(row=1 + i // 2, column=(i % 2) * 2, sticky="w", padx=5, pady=2)
+        add_tooltip(label, "Comma-separated values and/or start:stop:step ranges, e.g. '16,32,64' or '1000:3000:500'. Leave empty to use the form value.")
+        entry = ttk.Entry(sweep_frame, width=20)
+        entry.grid(row=1 + i // 2, column=(i % 2) * 2 + 1, sticky="w", padx=5, pady=2)
+        sweep_entries[key] = entry
+
+    sweep_enqueue_var = tk.BooleanVar(value=False)
+    if enqueue_configs:
+        ttk.Checkbutton(sweep_frame, text="Add to training queue", variable=sweep_enqueue_var).grid(row=3, column=2, columnspan=2, sticky="w", padx=5, pady=2)
 
     # Generate YAML button
     generate_button = ttk.Button(frame, text="Generate YAML", command=generate_yaml_config)
-    generate_button.grid(row=19, column=0, columnspan=3, pady=10)
+    generate_button.grid(row=20, column=0, columnspan=3, pady=10)
+
+    # Cost estimate for the current form values
+    estimate_var = tk.StringVar(value="")
+    estimate_label = ttk.Label(frame, textvariable=estimate_var, wraplength=600, justify="center")
+    estimate_label.grid(row=21, column=0, columnspan=3, pady=(0, 10))
+    estimate_state = {"pending": None, "version": None}
+
+    def update_estimate():
+        estimate_state["pending"] = None
+        estimator = get_estimator(ai_toolkit_folder.get())
+        if not estimator:
+            estimate_var.set("")
+            return
+        estimate_state["version"] = estimator.version
+        try:
+            values = read_form_values()
+            yaml_content = build_yaml_content("", dict(values, lr=float(values["lr"]), seed=0))
+        except ValueError:
+            estimate_var.set("Estimated cost: unavailable (invalid values)")
+            return
+        estimate_var.set("Estimated cost: " + estimator.describe(estimator.estimate(extract_cost_features(yaml_content))))
+
+    def schedule_estimate(*args):
+        if estimate_state["pending"]:
+            tab.after_cancel(estimate_state["pending"])
+        estimate_state["pending"] = tab.after(300, update_estimate)
+
+    def poll_calibration():
+        # Re-render once background calibration from past runs finishes
+        estimator = get_estimator(ai_toolkit_folder.get())
+        if estimator and estimator.version != estimate_state["version"]:
+            update_estimate()
+        tab.after(1000, poll_calibration)
+
+    for entry in (rank_entry, lr_entry, steps_entry, batch_size_entry, folder_path_entry, sample_every_entry):
+        entry.bind("<KeyRelease>", schedule_estimate)
+        entry.bind("<FocusOut>", schedule_estimate)
+    ai_toolkit_folder.trace_add("write", schedule_estimate)
+    tab.after(1000, poll_calibration)
 
 def browse_folder(entry):
     folder_selected = filedialog.askdirectory()
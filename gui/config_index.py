@@ -0,0 +1,158 @@
+import os
+import threading
+import yaml
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+# Use the libyaml C loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+CONFIG_COLUMNS = [
+    ("filename", "File"),
+    ("name", "Name"),
+    ("rank", "Rank"),
+    ("lr", "LR"),
+    ("steps", "Steps"),
+    ("batch_size", "Batch"),
+    ("folder_path", "Dataset"),
+    ("model", "Model"),
+]
+
+def load_yaml(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.load(f, Loader=YamlLoader)
+
+def mapping(value):
+    return value if isinstance(value, dict) else {}
+
+def first_mapping(value):
+    # First entry of a list of mappings, or {} for any other shape
+    return mapping(value[0]) if isinstance(value, list) and value else {}
+
+def parse_config_metadata(path):
+    # Any YAML shape is accepted; missing or mistyped sections read as empty
+    config = mapping(mapping(load_yaml(path)).get("config"))
+    process = first_mapping(config.get("process"))
+    network = mapping(process.get("network"))
+    train = mapping(process.get("train"))
+    model = mapping(process.get("model"))
+    return {
+        "name": config.get("name") or "",
+        "rank": network.get("linear"),
+        "lr": train.get("lr"),
+        "steps": train.get("steps"),
+        "batch_size": train.get("batch_size"),
+        "folder_path": first_mapping(process.get("datasets")).get("folder_path") or "",
+        "model": model.get("name_or_path") or "",
+    }
+
+class ConfigFolderHandler(FileSystemEventHandler):
+    def __init__(self, changed_event):
+        self.changed_event = changed_event
+
+    def on_any_event(self, event):
+        paths = [event.src_path, getattr(event, 'dest_path', '')]
+        if any(path.endswith('.yaml') for path in paths):
+            self.changed_event.set()
+
+class ConfigIndex:
+    def __init__(self, config_folder):
+        self.config_folder = config_folder
+        self.entries = {}  # filename -> (mtime_ns, metadata)
+        self.skipped = {}  # filename -> mtime_ns of files that failed to parse
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.changed.set()  # First update does the initial scan
+        self.observer = None
+
+    def start_watching(self):
+        if self.observer or not os.path.isdir(self.config_folder):
+            return
+        self.observer = Observer()
+        self.observer.schedule(ConfigFolderHandler(self.changed), self.config_folder, recursive=False)
+        self.observer.daemon = True
+        self.observer.start()
+
+    def stop_watching(self):
+        if self.observer:
+            self.observer.stop()
+            self.observer = None
+
+    def update(self):
+        # Re-parse only files whose mtime changed; returns True if anything did
+        self.changed.clear()
+        if not os.path.isdir(self.config_folder):
+            with self.lock:
+                had_entries = bool(self.entries)
+                self.entries.clear()
+            return had_entries
+
+        seen = set()
+        updates = {}
+        with os.scandir(self.config_folder) as it:
+            for entry in it:
+                if not entry.name.endswith('.yaml') or not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                try:
+                    mtime = entry.stat().st_mtime_ns
+                except OSError:
+                    continue
+                cached = self.entries.get(entry.name)
+                if (cached and cached[0] == mtime) or self.skipped.get(entry.name) == mtime:
+                    continue
+                try:
+                    metadata = parse_config_metadata(entry.path)
+                except Exception as e:
+                    # One broken file must not stop the index; it is retried once it changes
+                    print(f"Skipping config {entry.name}: {e.__class__.__name__}: {e}")
+                    self.skipped[entry.name] = mtime
+                    continue
+                self.skipped.pop(entry.name, None)
+                updates[entry.name] = (mtime, metadata)
+
+        self.skipped = {name: mtime for name, mtime in self.skipped.items() if name in seen}
+        with self.lock:
+            removed = [name for name in self.entries if name not in seen or name in self.skipped]
+            for name in removed:
+                del self.entries[name]
+            self.entries.update(updates)
+        return bool(updates or removed)
+
+    def get(self, filename):
+        with self.lock:
+            cached = self.entries.get(filename)
+        return dict(cached[1], filename=filename) if cached else None
+
+    def query(self, filter_text="", sort_key="filename", reverse=False):
+        with self.lock:
+            rows = [dict(metadata, filename=name) for name, (_, metadata) in self.entries.items()]
+
+        terms = filter_text.lower().split()
+        if terms:
+            def matches(row):
+                haystack = " ".join(str(value) for value in row.values() if value is not None).lower()
+                for term in terms:
+                    # "field=value" restricts the match to one column
+                    if '=' in term:
+                        field, value = term.split('=', 1)
+                        if value not in str(row.get(field, "")).lower():
+                            return False
+                    elif term not in haystack:
+                        return False
+                return True
+            rows = [row for row in rows if matches(row)]
+
+        def sort_value(row):
+            value = row.get(sort_key)
+            if value is None or value == "":
+                return (1, 0, "")
+            if isinstance(value, (int, float)):
+                return (0, value, "")
+            return (0, 0, str(value).lower())
+
+        rows.sort(key=sort_value, reverse=reverse)
+        return rows
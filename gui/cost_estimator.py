@@ -0,0 +1,206 @@
+import os
+import re
+import threading
+from statistics import median
+from gui.config_index import load_yaml
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+# Baseline for FLUX LoRA on a 24 GB card: batch 1 at 1024x1024, rank 16,
+# quantized, gradient checkpointing. Calibration rescales these.
+BASE_SECONDS_PER_STEP = 1.6
+BASE_MODEL_MEMORY_GB = {True: 14.0, False: 26.0}  # keyed by quantize
+ACTIVATION_MEMORY_GB = 3.5  # per image at 1024x1024 with gradient checkpointing
+NO_CHECKPOINTING_TIME_FACTOR = 0.75
+NO_CHECKPOINTING_MEMORY_FACTOR = 3.0
+LATENT_CACHE_SECONDS_PER_IMAGE = 0.4
+SAMPLE_SECONDS_PER_DENOISE_STEP = 0.5
+LOG_TAIL_BYTES = 256 * 1024
+
+RATE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(s/it|it/s)')
+MEMORY_PATTERN = re.compile(r'(?:vram|memory)[^0-9\n]{0,20}(\d+(?:\.\d+)?)\s*(GB|GiB|MB|MiB)', re.IGNORECASE)
+
+def count_images(folder_path):
+    if not folder_path or not os.path.isdir(folder_path):
+        return 0
+    with os.scandir(folder_path) as it:
+        return sum(1 for entry in it if entry.name.lower().endswith(IMAGE_EXTENSIONS))
+
+def extract_cost_features(yaml_data):
+    config = yaml_data.get("config", {}) if isinstance(yaml_data, dict) else {}
+    process = (config.get("process") or [{}])[0]
+    network = process.get("network", {})
+    train = process.get("train", {})
+    model = process.get("model", {})
+    sample = process.get("sample", {})
+    datasets = process.get("datasets") or [{}]
+    # Prepared datasets list one resolution per dataset entry
+    dataset_resolutions = []
+    for dataset in datasets:
+        resolution = dataset.get("resolution") or [1024]
+        dataset_resolutions.append(resolution if isinstance(resolution, list) else [resolution])
+    resolutions = sorted({res for resolution in dataset_resolutions for res in resolution})
+    return {
+        "rank": network.get("linear") or 16,
+        "batch_size": train.get("batch_size") or 1,
+        "steps": train.get("steps") or 0,
+        "gradient_checkpointing": bool(train.get("gradient_checkpointing", True)),
+        "quantize": bool(model.get("quantize", False)),
+        "resolutions": resolutions,
+        "folder_paths": [dataset.get("folder_path", "") for dataset in datasets],
+        "resolution_counts": [len(resolution) for resolution in dataset_resolutions],
+        "sample_every": sample.get("sample_every") or 0,
+        "sample_prompts": len(sample.get("prompts") or []),
+        "sample_steps": sample.get("sample_steps") or 20,
+    }
+
+def relative_step_cost(features):
+    # Buckets are sampled evenly, so use the mean pixel count relative to 1024x1024
+    pixels = sum(res * res for res in features["resolutions"]) / len(features["resolutions"])
+    cost = features["batch_size"] * pixels / (1024 * 1024)
+    cost *= 1 + (features["rank"] - 16) / 512  # LoRA rank adds little compute
+    if not features["gradient_checkpointing"]:
+        cost *= NO_CHECKPOINTING_TIME_FACTOR
+    return cost
+
+def relative_memory(features):
+    largest = max(features["resolutions"])
+    activations = ACTIVATION_MEMORY_GB * features["batch_size"] * largest * largest / (1024 * 1024)
+    if not features["gradient_checkpointing"]:
+        activations *= NO_CHECKPOINTING_MEMORY_FACTOR
+    lora_params = features["rank"] * 0.0125  # ~ rank 16 => 0.2 GB incl. optimizer state
+    return BASE_MODEL_MEMORY_GB[features["quantize"]] + activations + lora_params
+
+def read_log_tail(path):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        f.seek(max(0, size - LOG_TAIL_BYTES))
+        return f.read().decode('utf-8', errors='replace')
+
+def parse_training_log(path):
+    # tqdm writes "\r"-separated progress updates like "1.32s/it" or "2.50it/s"
+    text = read_log_tail(path)
+    rates = []
+    for value, unit in RATE_PATTERN.findall(text):
+        value = float(value)
+        if value > 0:
+            rates.append(value if unit == 's/it' else 1 / value)
+    memory = []
+    for value, unit in MEMORY_PATTERN.findall(text):
+        memory.append(float(value) / (1024 if unit.upper().startswith('M') else 1))
+    return {
+        "seconds_per_step": median(rates[len(rates) // 4:]) if rates else None,  # skip warm-up
+        "peak_memory_gb": max(memory) if memory else None,
+    }
+
+def find_run_config(run_path, config_folder):
+    with os.scandir(run_path) as it:
+        for entry in it:
+            if entry.name.endswith('.yaml') and entry.is_file():
+                return entry.path
+    candidate = os.path.join(config_folder, os.path.basename(run_path) + '.yaml')
+    return candidate if os.path.exists(candidate) else None
+
+def format_duration(seconds):
+    minutes = int(seconds // 60)
+    if minutes < 60:
+        return f"{minutes}m"
+    return f"{minutes // 60}h {minutes % 60:02d}m"
+
+class CostEstimator:
+    def __init__(self, ai_toolkit_path):
+        self.output_folder = os.path.join(ai_toolkit_path, 'output')
+        self.config_folder = os.path.join(ai_toolkit_path, 'config')
+        self.time_scale = 1.0
+        self.memory_scale = 1.0
+        self.calibration_runs = 0
+        self.version = 0  # Bumped when calibration finishes so views can re-render
+        self.dataset_sizes = {}  # folder -> (mtime_ns, count)
+        self.lock = threading.Lock()
+        self.calibrating = False
+
+    def calibrate(self):
+        time_ratios = []
+        memory_ratios = []
+        if os.path.isdir(self.output_folder):
+            with os.scandir(self.output_folder) as it:
+                for run in it:
+                    log_path = os.path.join(run.path, 'training.log')
+                    if not run.is_dir() or not os.path.exists(log_path):
+                        continue
+                    try:
+                        config_path = find_run_config(run.path, self.config_folder)
+                        if not config_path:
+                            continue
+                        features = extract_cost_features(load_yaml(config_path))
+                        observed = parse_training_log(log_path)
+                    except Exception as e:
+                        print(f"Skipping run {run.name} for calibration: {e}")
+                        continue
+                    if observed["seconds_per_step"]:
+                        time_ratios.append(observed["seconds_per_step"] / (BASE_SECONDS_PER_STEP * relative_step_cost(features)))
+                    if observed["peak_memory_gb"]:
+                        memory_ratios.append(observed["peak_memory_gb"] / relative_memory(features))
+
+        with self.lock:
+            self.time_scale = median(time_ratios) if time_ratios else 1.0
+            self.memory_scale = median(memory_ratios) if memory_ratios else 1.0
+            self.calibration_runs = len(time_ratios)
+            self.version += 1
+            self.calibrating = False
+
+    def calibrate_in_background(self):
+        with self.lock:
+            if self.calibrating:
+                return
+            self.calibrating = True
+        threading.Thread(target=self.calibrate, daemon=True).start()
+
+    def dataset_size(self, folder_path):
+        try:
+            mtime = os.stat(folder_path).st_mtime_ns
+        except OSError:
+            return 0
+        cached = self.dataset_sizes.get(folder_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        count = count_images(folder_path)
+        self.dataset_sizes[folder_path] = (mtime, count)
+        return count
+
+    def estimate(self, features):
+        with self.lock:
+            time_scale, memory_scale = self.time_scale, self.memory_scale
+        step_seconds = BASE_SECONDS_PER_STEP * relative_step_cost(features) * time_scale
+        sizes = [self.dataset_size(folder) for folder in features["folder_paths"]]
+        images = sum(sizes)
+        cache_seconds = sum(size * count for size, count in zip(sizes, features["resolution_counts"])) * LATENT_CACHE_SECONDS_PER_IMAGE
+        samples = features["steps"] // features["sample_every"] + 1 if features["sample_every"] else 0
+        sample_seconds = samples * features["sample_prompts"] * features["sample_steps"] * SAMPLE_SECONDS_PER_DENOISE_STEP * time_scale
+        return {
+            "step_seconds": step_seconds,
+            "peak_memory_gb": relative_memory(features) * memory_scale,
+            "dataset_images": images,
+            "total_seconds": cache_seconds + features["steps"] * step_seconds + sample_seconds,
+        }
+
+    def estimate_file(self, config_path):
+        return self.estimate(extract_cost_features(load_yaml(config_path)))
+
+    def describe(self, estimate):
+        calibrated = f"calibrated on {self.calibration_runs} run{'s' if self.calibration_runs > 1 else ''}" if self.calibration_runs else "uncalibrated"
+        return (f"~{estimate['step_seconds']:.2f} s/step, ~{estimate['peak_memory_gb']:.1f} GB peak, "
+                f"ETA {format_duration(estimate['total_seconds'])} ({calibrated})")
+
+_current = {"path": None, "estimator": None}
+
+def get_estimator(ai_toolkit_path):
+    # Estimator for the current install, calibrated once in the background.
+    # None until the path is an existing folder, so half-typed paths cost nothing.
+    if not ai_toolkit_path or not os.path.isdir(ai_toolkit_path):
+        return None
+    if _current["path"] != ai_toolkit_path:
+        _current["path"] = ai_toolkit_path
+        _current["estimator"] = CostEstimator(ai_toolkit_path)
+        _current["estimator"].calibrate_in_background()
+    return _current["estimator"]
@@ -0,0 +1,104 @@
+import os
+import json
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+from PIL import Image, ImageTk
+from monitor.metrics import METRICS_FILE
+from monitor.charts import render_run_chart
+from monitor.ipc import NotifierClient, DEFAULT_PORT, SECRET_KEY
+
+CONFIG_FILE = "ai_toolkit_helper_config.json"
+RESULT_POLL_MS = 100
+
+def load_config():
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as config_file:
+            return json.load(config_file)
+    return {}
+
+def find_runs(output_folder):
+    # Run folders with recorded metrics or a log to parse, newest first
+    runs = []
+    if not os.path.isdir(output_folder):
+        return runs
+    with os.scandir(output_folder) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+            for name in (METRICS_FILE, 'training.log'):
+                path = os.path.join(entry.path, name)
+                if os.path.exists(path):
+                    runs.append((os.path.getmtime(path), entry.name))
+                    break
+    return [name for _, name in sorted(runs, reverse=True)]
+
+def open_loss_chart_window(parent, ai_toolkit_path):
+    output_folder = os.path.join(ai_toolkit_path, 'output')
+    runs = find_runs(output_folder)
+    if not runs:
+        messagebox.showinfo("Loss Chart", "No training runs with metrics found in the output folder.")
+        return
+
+    window = tk.Toplevel(parent)
+    window.title("Loss Chart")
+    controls = ttk.Frame(window)
+    controls.pack(fill=tk.X, padx=10, pady=5)
+    run_var = tk.StringVar(value=runs[0])
+    ttk.Label(controls, text="Run:").pack(side=tk.LEFT)
+    ttk.Combobox(controls, textvariable=run_var, values=runs, state="readonly", width=40).pack(side=tk.LEFT, padx=5)
+    status_var = tk.StringVar()
+    chart_label = ttk.Label(window)
+    chart_label.pack(padx=10, pady=5)
+    ttk.Label(window, textvariable=status_var).pack(padx=10, pady=5)
+
+    results = queue.Queue()
+
+    def render():
+        # matplotlib runs on a worker thread; the image is shown from the Tk thread
+        run_folder = os.path.join(output_folder, run_var.get())
+        status_var.set(f"Rendering chart for {run_var.get()}...")
+
+        def work():
+            try:
+                results.put((run_folder, render_run_chart(run_folder), None))
+            except Exception as e:
+                results.put((run_folder, None, str(e)))
+
+        threading.Thread(target=work, daemon=True).start()
+        window.after(RESULT_POLL_MS, show_result)
+
+    def show_result():
+        try:
+            run_folder, chart_path, error = results.get_nowait()
+        except queue.Empty:
+            window.after(RESULT_POLL_MS, show_result)
+            return
+        if not window.winfo_exists():
+            return
+        if error:
+            status_var.set(f"Chart failed: {error}")
+        elif chart_path is None:
+            status_var.set(f"No loss values found yet for {os.path.basename(run_folder)}.")
+        else:
+            with Image.open(chart_path) as img:
+                photo = ImageTk.PhotoImage(img)
+            chart_label.configure(image=photo)
+            chart_label.image = photo  # Keep a reference
+            status_var.set(chart_path)
+
+    def send_to_telegram():
+        run_folder = os.path.join(output_folder, run_var.get())
+        config = load_config()
+        client = NotifierClient(config.get(SECRET_KEY, ""), port=int(config.get("notifier_port", DEFAULT_PORT)))
+        try:
+            client.send_chart(run_folder)
+            status_var.set("Chart sent to the notifier service.")
+        except (OSError, ValueError):
+            messagebox.showerror("Error", "The Telegram monitor is not running. Enable Telegram notifications in Settings.")
+
+    ttk.Button(controls, text="Refresh", command=render).pack(side=tk.LEFT, padx=5)
+    ttk.Button(controls, text="Send to Telegram", command=send_to_telegram).pack(side=tk.LEFT, padx=5)
+    run_var.trace_add("write", lambda *args: render())
+    render()
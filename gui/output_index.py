@@ -0,0 +1,357 @@
+import os
+import re
+import json
+import time
+import struct
+import threading
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+from monitor.coalescer import parse_sample_name
+
+OUTPUT_INDEX_CACHE_FILE = "output_index_cache.json"
+CACHE_VERSION = 1
+SAMPLES_FOLDER = "samples"
+CHECKPOINT_STEP_PATTERN = re.compile(r'_(\d+)\.safetensors$')
+MAX_HEADER_BYTES = 100 * 1024 * 1024  # The safetensors format's own limit
+MAX_METADATA_VALUE = 200  # Metadata can hold whole configs; keep the index small
+SAVE_INTERVAL = 5.0  # Seconds between cache writes while runs keep changing
+VOLATILE_FIELDS = ("modified", "disk_bytes")  # Change with every log write; recomputed on load anyway
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def read_safetensors_header(path):
+    # (tensor count, metadata) from the JSON header; tensor data is never read
+    with open(path, 'rb') as f:
+        prefix = f.read(8)
+        if len(prefix) < 8:
+            raise ValueError("file too short")
+        (length,) = struct.unpack('<Q', prefix)
+        if length > MAX_HEADER_BYTES:
+            raise ValueError("header too large")
+        header = json.loads(f.read(length))
+    metadata = header.pop("__metadata__", None) or {}
+    return len(header), metadata
+
+def checkpoint_step(name, metadata):
+    # AI Toolkit stores the step in its training_info metadata; older files
+    # only have it in the name ("<run>_000000250.safetensors")
+    try:
+        return int(json.loads(metadata["training_info"])["step"])
+    except (KeyError, ValueError, TypeError):
+        pass
+    match = CHECKPOINT_STEP_PATTERN.search(name)
+    return int(match.group(1)) if match else None
+
+def read_checkpoint(path, stat):
+    record = {"file": os.path.basename(path), "size": stat.st_size, "mtime": stat.st_mtime_ns, "step": None,
+              "tensors": None, "metadata": {}, "error": None}
+    try:
+        tensors, metadata = read_safetensors_header(path)
+    except (OSError, ValueError) as e:
+        # Usually a checkpoint that is still being written
+        record["error"] = str(e)
+        record["step"] = checkpoint_step(record["file"], {})
+        return record
+    record["step"] = checkpoint_step(record["file"], metadata)
+    record["tensors"] = tensors
+    record["metadata"] = {key: str(value)[:MAX_METADATA_VALUE] for key, value in metadata.items()}
+    return record
+
+def folder_bytes(path):
+    total = 0
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                total += folder_bytes(entry.path)
+            else:
+                total += entry.stat().st_size
+    return total
+
+def scan_samples(path):
+    # [[step, prompt index, file name, size]] sorted by step and prompt
+    samples = []
+    other_bytes = 0
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                other_bytes += folder_bytes(entry.path)
+                continue
+            size = entry.stat().st_size
+            sample = parse_sample_name(entry.name)
+            if sample:
+                samples.append([sample[0], sample[1], entry.name, size])
+            else:
+                other_bytes += size
+    samples.sort()
+    return samples, other_bytes
+
+def scan_run(run_path, previous=None, force=()):
+    # Checkpoint headers are re-read only when a file's size or mtime changed,
+    # and subfolders are re-listed only when their mtime changed or they are
+    # named in force (writes to existing files leave a folder's mtime alone)
+    previous = previous or {"checkpoints": [], "folders": {}}
+    known_checkpoints = {checkpoint["file"]: checkpoint for checkpoint in previous["checkpoints"]}
+    checkpoints = []
+    folders = {}
+    files_bytes = 0
+    modified = 0
+    with os.scandir(run_path) as it:
+        for entry in it:
+            stat = entry.stat(follow_symlinks=False)
+            modified = max(modified, stat.st_mtime_ns)
+            if entry.is_dir(follow_symlinks=False):
+                cached = previous["folders"].get(entry.name)
+                if cached and cached["mtime"] == stat.st_mtime_ns and entry.name not in force:
+                    folders[entry.name] = cached
+                elif entry.name == SAMPLES_FOLDER:
+                    samples, other_bytes = scan_samples(entry.path)
+                    folders[entry.name] = {"mtime": stat.st_mtime_ns, "samples": samples,
+                                           "bytes": other_bytes + sum(sample[3] for sample in samples)}
+                else:
+                    folders[entry.name] = {"mtime": stat.st_mtime_ns, "bytes": folder_bytes(entry.path)}
+                continue
+            files_bytes += stat.st_size
+            if entry.name.endswith('.safetensors'):
+                cached = known_checkpoints.get(entry.name)
+                if cached and cached["size"] == stat.st_size and cached["mtime"] == stat.st_mtime_ns and not cached["error"]:
+                    checkpoints.append(cached)
+                else:
+                    checkpoints.append(read_checkpoint(entry.path, stat))
+
+    checkpoints.sort(key=lambda checkpoint: (checkpoint["step"] is None, checkpoint["step"] or 0, checkpoint["mtime"]))
+    return {
+        "modified": max([modified] + [folder["mtime"] for folder in folders.values()]),
+        "checkpoints": checkpoints,
+        "folders": folders,
+        "disk_bytes": files_bytes + sum(folder["bytes"] for folder in folders.values()),
+    }
+
+def stable_fields(record):
+    return {key: value for key, value in record.items() if key not in VOLATILE_FIELDS}
+
+def latest_checkpoint(record):
+    # The final "<run>.safetensors" has no step and is written last
+    if not record["checkpoints"]:
+        return None
+    return max(record["checkpoints"], key=lambda checkpoint: (checkpoint["step"] is None, checkpoint["step"] or 0, checkpoint["mtime"]))
+
+def run_samples(record):
+    return record["folders"].get(SAMPLES_FOLDER, {}).get("samples", [])
+
+def pruned_step_bytes(record):
+    # Samples of steps older than the oldest kept step checkpoint and without
+    # a checkpoint of their own; what max_step_saves_to_keep left behind
+    steps = [checkpoint["step"] for checkpoint in record["checkpoints"] if checkpoint["step"] is not None]
+    if not steps:
+        return 0
+    oldest_kept = min(steps)
+    kept = set(steps)
+    return sum(size for step, _, _, size in run_samples(record) if step < oldest_kept and step not in kept)
+
+class OutputFolderEvents(FileSystemEventHandler):
+    def __init__(self, index):
+        self.index = index
+
+    def on_any_event(self, event):
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if path:
+                self.index.mark_dirty(path)
+
+class OutputIndex:
+    # Per-run records of output/: checkpoints with their header metadata,
+    # sample images by step and prompt, and disk usage. Watch events mark runs
+    # dirty so updates rescan only those; a full update reuses everything
+    # whose mtime is unchanged. Records persist between sessions.
+    def __init__(self, output_folder, cache_path=OUTPUT_INDEX_CACHE_FILE):
+        self.output_folder = output_folder
+        self.cache_path = cache_path
+        self.runs = {}  # run name -> record
+        self.dirty = {}  # run name -> names of its subfolders with events
+        self.full_scan = True  # The first update checks every run
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.changed.set()
+        self.updating = False
+        self.version = 0  # Bumped on every change so views can re-render
+        self.unsaved = False
+        self.last_save = 0.0
+        self.observer = None
+        self.load_cache()
+
+    def load_cache(self):
+        try:
+            with open(self.cache_path, 'r') as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        if cache.get("version") == CACHE_VERSION and cache.get("output_folder") == os.path.abspath(self.output_folder):
+            self.runs = cache.get("runs", {})
+
+    def save_cache(self):
+        # Writes the records if anything worth keeping changed since the last save
+        with self.lock:
+            if not self.unsaved:
+                return
+            self.unsaved = False
+            self.last_save = time.monotonic()
+            cache = {"version": CACHE_VERSION, "output_folder": os.path.abspath(self.output_folder), "runs": dict(self.runs)}
+        temp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(temp_path, 'w') as cache_file:
+                json.dump(cache, cache_file)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not save the output index: {e}")
+
+    def save_due(self):
+        # A busy run changes constantly; its records are written at most every SAVE_INTERVAL
+        with self.lock:
+            return self.unsaved and time.monotonic() - self.last_save >= SAVE_INTERVAL
+
+    def start_watching(self):
+        if self.observer or not os.path.isdir(self.output_folder):
+            return
+        self.observer = Observer()
+        self.observer.schedule(OutputFolderEvents(self), self.output_folder, recursive=True)
+        self.observer.daemon = True
+        self.observer.start()
+
+    def stop_watching(self):
+        if self.observer:
+            self.observer.stop()
+            self.observer = None
+        self.save_cache()
+
+    def mark_dirty(self, path):
+        relative = os.path.relpath(path, self.output_folder)
+        parts = relative.split(os.sep)
+        run = parts[0]
+        if run in (".", "..") or relative.startswith(".."):
+            return
+        with self.lock:
+            folders = self.dirty.setdefault(run, set())
+            # Events inside a subfolder force that subfolder to be re-listed
+            if len(parts) > 2:
+                folders.add(parts[1])
+        self.changed.set()
+
+    def refresh(self):
+        # Next update checks every run, not just the ones with events
+        with self.lock:
+            self.full_scan = True
+        self.changed.set()
+
+    def update(self):
+        # Returns True if any run was added, removed or changed
+        self.changed.clear()
+        with self.lock:
+            dirty, self.dirty = self.dirty, {}
+            full_scan, self.full_scan = self.full_scan, False
+            runs = dict(self.runs)
+
+        if not os.path.isdir(self.output_folder):
+            changed = bool(runs)
+            significant = changed
+            runs = {}
+        else:
+            changed = False
+            significant = False
+            if full_scan:
+                with os.scandir(self.output_folder) as it:
+                    names = {entry.name for entry in it if entry.is_dir()}
+                for name in set(runs) - names:
+                    del runs[name]
+                    changed = significant = True
+            else:
+                names = set(dirty)
+            for name in names:
+                run_path = os.path.join(self.output_folder, name)
+                if not os.path.isdir(run_path):
+                    if runs.pop(name, None) is not None:
+                        changed = significant = True
+                    continue
+                try:
+                    record = scan_run(run_path, runs.get(name), force=dirty.get(name, ()))
+                except OSError as e:
+                    print(f"Skipping run {name} in the output index: {e}")
+                    continue
+                previous = runs.get(name)
+                if record != previous:
+                    runs[name] = record
+                    changed = True
+                    significant |= previous is None or stable_fields(record) != stable_fields(previous)
+
+        if changed:
+            with self.lock:
+                self.runs = runs
+                self.version += 1
+                self.unsaved |= significant
+        if self.save_due():
+            self.save_cache()
+        return changed
+
+    def update_in_background(self):
+        # Starts an update on a worker thread unless one is running
+        with self.lock:
+            if self.updating:
+                return
+            self.updating = True
+
+        def work():
+            try:
+                self.update()
+            finally:
+                with self.lock:
+                    self.updating = False
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def records(self):
+        with self.lock:
+            return dict(self.runs)
+
+    def run_rows(self):
+        rows = []
+        for name, record in self.records().items():
+            latest = latest_checkpoint(record)
+            samples = run_samples(record)
+            rows.append({
+                "run": name,
+                "checkpoints": len(record["checkpoints"]),
+                "latest_checkpoint": latest["file"] if latest else "",
+                "latest_step": latest["step"] if latest else None,
+                "sample_steps": len({sample[0] for sample in samples}),
+                "disk_bytes": record["disk_bytes"],
+                "pruned_bytes": pruned_step_bytes(record),
+                "modified": record["modified"],
+            })
+        return rows
+
+    def latest_checkpoints(self):
+        # {run: checkpoint record} for runs with at least one checkpoint
+        latest = {}
+        for name, record in self.records().items():
+            checkpoint = latest_checkpoint(record)
+            if checkpoint:
+                latest[name] = dict(checkpoint, path=os.path.join(self.output_folder, name, checkpoint["file"]))
+        return latest
+
+    def samples(self, run, step=None, prompt_index=None):
+        # [(step, prompt index, path)] of a run, optionally for one step or prompt
+        record = self.records().get(run)
+        if not record:
+            return []
+        samples_folder = os.path.join(self.output_folder, run, SAMPLES_FOLDER)
+        return [(sample_step, sample_prompt, os.path.join(samples_folder, name))
+                for sample_step, sample_prompt, name, _ in run_samples(record)
+                if (step is None or sample_step == step) and (prompt_index is None or sample_prompt == prompt_index)]
+
+    def disk_usage(self):
+        # (total bytes, bytes in samples of pruned steps) over all runs
+        records = self.records().values()
+        return sum(record["disk_bytes"] for record in records), sum(pruned_step_bytes(record) for record in records)
@@ -0,0 +1,164 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from gui.config_index import load_yaml
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+PREFLIGHT_CACHE_FILE = "preflight_cache.json"
+MAX_REPORTED_PROBLEMS = 20
+TAIL_BYTES = 64 * 1024  # Editors and cameras may append metadata after a JPEG's end-of-image marker
+
+def read_dataset_specs(config_path):
+    data = load_yaml(config_path)
+    config = data.get("config", {}) if isinstance(data, dict) else {}
+    specs = []
+    for process in config.get("process") or []:
+        for dataset in process.get("datasets") or []:
+            specs.append({
+                "folder_path": dataset.get("folder_path") or "",
+                "caption_ext": dataset.get("caption_ext") or "txt",
+            })
+    return specs
+
+def check_image_header(path):
+    # Cheap signature and truncation checks before paying for a full decode.
+    # Returns (problem, warning); a warning still needs the decode to confirm it.
+    size = os.path.getsize(path)
+    if size == 0:
+        return "empty file", None
+    with open(path, 'rb') as f:
+        head = f.read(16)
+        f.seek(max(0, size - TAIL_BYTES))
+        tail = f.read()
+
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        if b'IEND' not in tail[-32:]:
+            return "truncated PNG (no IEND chunk)", None
+    elif head.startswith(b'\xff\xd8'):
+        if b'\xff\xd9' not in tail:
+            return None, "JPEG has no end-of-image marker near the end of the file"
+    elif head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        if int.from_bytes(head[4:8], 'little') + 8 > size:
+            return "truncated WebP", None
+    else:
+        return "unrecognized image signature", None
+    return None, None
+
+def check_image(path):
+    # (problem, warning) for one image
+    try:
+        problem, warning = check_image_header(path)
+        if problem:
+            return problem, None
+        with Image.open(path) as img:
+            img.load()
+    except Exception as e:
+        return f"cannot decode: {e}", None
+    return None, warning
+
+def check_caption(image_path, caption_ext):
+    caption_path = os.path.splitext(image_path)[0] + '.' + caption_ext.lstrip('.')
+    if not os.path.exists(caption_path):
+        return f"missing caption file {os.path.basename(caption_path)}"
+    with open(caption_path, 'r', encoding='utf-8', errors='replace') as f:
+        if not f.read().strip():
+            return f"empty caption file {os.path.basename(caption_path)}"
+    return None
+
+def load_preflight_cache():
+    if os.path.exists(PREFLIGHT_CACHE_FILE):
+        try:
+            with open(PREFLIGHT_CACHE_FILE, 'r') as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def save_preflight_cache(cache):
+    with open(PREFLIGHT_CACHE_FILE, 'w') as cache_file:
+        json.dump(cache, cache_file)
+
+def verify_dataset(folder_path, caption_ext="txt", executor=None, cache=None):
+    # Returns (problems, warnings)
+    problems = []
+    warnings = []
+    if not folder_path:
+        return ["dataset folder_path is empty"], warnings
+    if not os.path.isdir(folder_path):
+        return [f"dataset folder not found: {folder_path}"], warnings
+
+    images = []
+    with os.scandir(folder_path) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                stat = entry.stat()
+                images.append((entry.path, [stat.st_mtime_ns, stat.st_size]))
+    if not images:
+        return [f"no images found in {folder_path}"], warnings
+    images.sort()
+
+    # Decode only images that changed since the last run; entries are [mtime_ns, size, problem, warning]
+    cache = cache if cache is not None else {}
+    to_check = [(path, key) for path, key in images
+                if len(cache.get(path, [])) != 4 or cache[path][:2] != key]
+    if to_check:
+        paths = [path for path, _ in to_check]
+        if executor is not None:
+            results = executor.map(check_image, paths, chunksize=16)
+        else:
+            results = map(check_image, paths)
+        for (path, key), result in zip(to_check, results):
+            cache[path] = key + list(result)
+
+    for path, _ in images:
+        name = os.path.basename(path)
+        image_problem, image_warning = cache[path][2:]
+        if image_problem:
+            problems.append(f"{name}: {image_problem}")
+        if image_warning:
+            warnings.append(f"{name}: {image_warning}")
+        caption_problem = check_caption(path, caption_ext)
+        if caption_problem:
+            problems.append(f"{name}: {caption_problem}")
+    return problems, warnings
+
+def run_preflight(config_paths, max_workers=None):
+    # Returns ({config filename: [problem, ...]}, {config filename: [warning, ...]})
+    # for every config checked; only problems should hold up training
+    cache = load_preflight_cache()
+    report = {}
+    warning_report = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for config_path in config_paths:
+            config_name = os.path.basename(config_path)
+            try:
+                specs = read_dataset_specs(config_path)
+            except Exception as e:
+                report[config_name] = [f"cannot read config: {e}"]
+                continue
+            if not specs:
+                report[config_name] = ["config has no datasets"]
+                continue
+            problems = []
+            warnings = []
+            for spec in specs:
+                dataset_problems, dataset_warnings = verify_dataset(spec["folder_path"], spec["caption_ext"], executor, cache)
+                problems.extend(dataset_problems)
+                warnings.extend(dataset_warnings)
+            report[config_name] = problems
+            warning_report[config_name] = warnings
+    save_preflight_cache(cache)
+    return report, warning_report
+
+def format_preflight_report(report, noun="problem"):
+    lines = []
+    for config_name, problems in report.items():
+        if not problems:
+            continue
+        lines.append(f"{config_name}: {len(problems)} {noun}{'s' if len(problems) > 1 else ''}")
+        for problem in problems[:MAX_REPORTED_PROBLEMS]:
+            lines.append(f"  - {problem}")
+        if len(problems) > MAX_REPORTED_PROBLEMS:
+            lines.append(f"  ... and {len(problems) - MAX_REPORTED_PROBLEMS} more")
+    return "\n".join(lines)
@@ -0,0 +1,112 @@
+import time
+import tkinter as tk
+from tkinter import ttk
+from gui.output_index import format_bytes
+
+INDEX_POLL_MS = 500
+
+RUN_COLUMNS = [
+    ("run", "Run"),
+    ("checkpoints", "Checkpoints"),
+    ("latest_checkpoint", "Latest Checkpoint"),
+    ("latest_step", "Step"),
+    ("sample_steps", "Sampled Steps"),
+    ("disk_bytes", "Disk"),
+    ("pruned_bytes", "Pruned-Step Samples"),
+    ("modified", "Modified"),
+]
+
+def format_cell(key, value):
+    if value is None:
+        return ""
+    if key in ("disk_bytes", "pruned_bytes"):
+        return format_bytes(value)
+    if key == "modified":
+        return time.strftime('%Y-%m-%d %H:%M', time.localtime(value / 1e9))
+    return value
+
+def open_runs_window(parent, output_index):
+    # Browses the output index; the Training tab keeps the index up to date
+    window = tk.Toplevel(parent)
+    window.title("Runs & Checkpoints")
+    window.geometry("1000x600")
+
+    controls = ttk.Frame(window)
+    controls.pack(fill=tk.X, padx=10, pady=5)
+    summary_var = tk.StringVar()
+    ttk.Label(controls, textvariable=summary_var).pack(side=tk.LEFT)
+    ttk.Button(controls, text="Rescan", command=lambda: (output_index.refresh(), output_index.update_in_background())).pack(side=tk.RIGHT)
+
+    runs_tree = ttk.Treeview(window, columns=[key for key, _ in RUN_COLUMNS], show="headings", height=12, selectmode="browse")
+    for key, _ in RUN_COLUMNS:
+        wide = key in ("run", "latest_checkpoint")
+        runs_tree.column(key, width=200 if wide else 90, stretch=wide)
+    runs_tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+    details = ttk.Frame(window)
+    details.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+    checkpoint_tree = ttk.Treeview(details, columns=("file", "step", "size", "tensors", "info"), show="headings", height=8)
+    for key, heading, width in (("file", "Checkpoint", 220), ("step", "Step", 70), ("size", "Size", 80),
+                                ("tensors", "Tensors", 70), ("info", "Metadata", 300)):
+        checkpoint_tree.heading(key, text=heading)
+        checkpoint_tree.column(key, width=width, stretch=key == "info")
+    checkpoint_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    samples_list = tk.Listbox(details, width=40)
+    samples_list.pack(side=tk.LEFT, fill=tk.BOTH, padx=(10, 0))
+
+    state = {"version": None, "sort_key": "modified", "reverse": True}
+
+    def render_runs():
+        state["version"] = output_index.version
+        rows = output_index.run_rows()
+        rows.sort(key=lambda row: (row[state["sort_key"]] is None, row[state["sort_key"]] if row[state["sort_key"]] is not None else 0),
+                  reverse=state["reverse"])
+        selection = runs_tree.selection()
+        runs_tree.delete(*runs_tree.get_children())
+        for row in rows:
+            runs_tree.insert("", tk.END, iid=row["run"], values=[format_cell(key, row[key]) for key, _ in RUN_COLUMNS])
+        if selection and runs_tree.exists(selection[0]):
+            runs_tree.selection_set(selection[0])
+        total, pruned = output_index.disk_usage()
+        summary_var.set(f"{len(rows)} runs, {format_bytes(total)} on disk, {format_bytes(pruned)} in samples of pruned steps")
+        render_details()
+
+    def render_details(*args):
+        checkpoint_tree.delete(*checkpoint_tree.get_children())
+        samples_list.delete(0, tk.END)
+        selection = runs_tree.selection()
+        if not selection:
+            return
+        record = output_index.records().get(selection[0])
+        if not record:
+            return
+        for checkpoint in reversed(record["checkpoints"]):
+            info = checkpoint["error"] or ", ".join(f"{key}={value}" for key, value in checkpoint["metadata"].items() if key != "training_info")
+            checkpoint_tree.insert("", tk.END, values=(checkpoint["file"], "" if checkpoint["step"] is None else checkpoint["step"],
+                                                       format_bytes(checkpoint["size"]), checkpoint["tensors"] or "", info))
+        steps = {}
+        for step, prompt_index, _ in output_index.samples(selection[0]):
+            steps.setdefault(step, []).append(prompt_index)
+        for step in sorted(steps, reverse=True):
+            samples_list.insert(tk.END, f"step {step}: prompts {', '.join(map(str, sorted(steps[step])))}")
+
+    def sort_by(key):
+        if state["sort_key"] == key:
+            state["reverse"] = not state["reverse"]
+        else:
+            state["sort_key"], state["reverse"] = key, key != "run"
+        render_runs()
+
+    for key, heading in RUN_COLUMNS:
+        runs_tree.heading(key, text=heading, command=lambda k=key: sort_by(k))
+    runs_tree.bind("<<TreeviewSelect>>", render_details)
+
+    def poll():
+        if not window.winfo_exists():
+            return
+        if output_index.version != state["version"]:
+            render_runs()
+        window.after(INDEX_POLL_MS, poll)
+
+    render_runs()
+    window.after(INDEX_POLL_MS, poll)
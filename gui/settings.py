@@ -2,9 +2,12 @@ import os
 import json
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
+import queue
 import asyncio
-from telegram import Bot
-from telegram.error import TelegramError
+import threading
+import tracing
+from monitor.ipc import NotifierClient, DEFAULT_PORT, SECRET_KEY, ensure_secret
+from monitor.notifier import send_test_message
 
 CONFIG_FILE = "ai_toolkit_helper_config.json"
 
@@ -18,21 +21,22 @@ def save_config(config):
     with open(CONFIG_FILE, 'w') as config_file:
         json.dump(config, config_file)
 
-class TelegramNotifier:
-    def __init__(self, token, chat_id):
-        self.token = token
-        self.chat_id = chat_id
-        self.bot = Bot(token=self.token)
+TEST_MESSAGE = "Test message from AI Toolkit Helper!"
 
-    async def send_message(self, message):
-        try:
-            await self.bot.send_message(chat_id=self.chat_id, text=message)
-            print(f"Telegram message sent: {message}")
-        except TelegramError as e:
-            print(f"Failed to send Telegram message: {e}")
+def run_connection_test(bot_token, chat_id, config):
+    # Returns (ok, error). Goes through the running notifier service when
+    # there is one, so the test reuses its connection; call from a worker thread
+    client = NotifierClient(config.get(SECRET_KEY, ""), port=int(config.get("notifier_port", DEFAULT_PORT)))
+    try:
+        response = client.send_test(bot_token, chat_id, TEST_MESSAGE)
+        return response.get("ok", False), response.get("error")
+    except (OSError, ValueError):
+        pass
+    return asyncio.run(send_test_message(bot_token, chat_id, TEST_MESSAGE, config.get("telegram_api_base_url")))
 
 def create_settings_tab(settings_tab, ai_toolkit_folder):
-    # Load existing configuration
+    # Load existing configuration; the notifier secret exists before the monitor can be started
+    ensure_secret(CONFIG_FILE)
     config = load_config()
 
     # Set up text variables
@@ -40,6 +44,13 @@ def create_settings_tab(settings_tab, ai_toolkit_folder):
     telegram_bot_token = tk.StringVar(value=config.get("telegram_bot_token", ""))
     telegram_chat_id = tk.StringVar(value=config.get("telegram_chat_id", ""))
     telegram_enabled = tk.BooleanVar(value=config.get("telegram_enabled", False))
+    telegram_image_max_edge = tk.StringVar(value=str(config.get("telegram_image_max_edge", 1024)))
+    telegram_image_format = tk.StringVar(value=config.get("telegram_image_format", "jpeg"))
+    telegram_image_quality = tk.StringVar(value=str(config.get("telegram_image_quality", 85)))
+    telegram_send_originals = tk.BooleanVar(value=config.get("telegram_send_originals", False))
+    telegram_contact_sheets = tk.BooleanVar(value=config.get("telegram_contact_sheets", True))
+    telegram_contact_sheet_history = tk.StringVar(value=str(config.get("telegram_contact_sheet_history", 0)))
+    tracing_enabled = tk.BooleanVar(value=config.get("tracing_enabled", False))
 
     # Create a main frame for all settings
     main_frame = ttk.Frame(settings_tab)
@@ -74,6 +85,41 @@ def create_settings_tab(settings_tab, ai_toolkit_folder):
     ttk.Label(main_frame, text="Telegram Chat ID:").grid(row=6, column=0, sticky="w", padx=5, pady=5)
     ttk.Entry(main_frame, textvariable=telegram_chat_id, width=50).grid(row=6, column=1, columnspan=2, padx=5, pady=5)
 
+    # Sample images are re-encoded before upload unless originals are requested
+    ttk.Label(main_frame, text="Sample Upload Max Edge (px):").grid(row=7, column=0, sticky="w", padx=5, pady=5)
+    ttk.Entry(main_frame, textvariable=telegram_image_max_edge, width=10).grid(row=7, column=1, sticky="w", padx=5, pady=5)
+
+    ttk.Label(main_frame, text="Sample Upload Format / Quality:").grid(row=8, column=0, sticky="w", padx=5, pady=5)
+    upload_format_frame = ttk.Frame(main_frame)
+    upload_format_frame.grid(row=8, column=1, sticky="w", padx=5, pady=5)
+    ttk.Combobox(upload_format_frame, textvariable=telegram_image_format, values=["jpeg", "webp"], state="readonly", width=8).pack(side=tk.LEFT)
+    ttk.Entry(upload_format_frame, textvariable=telegram_image_quality, width=5).pack(side=tk.LEFT, padx=5)
+
+    ttk.Checkbutton(main_frame, text="Send original sample files as documents", variable=telegram_send_originals).grid(row=9, column=0, columnspan=3, sticky="w", padx=5, pady=5)
+
+    # One labeled grid per sample step instead of one upload per prompt
+    contact_sheet_frame = ttk.Frame(main_frame)
+    contact_sheet_frame.grid(row=10, column=0, columnspan=3, sticky="w", padx=5, pady=5)
+    ttk.Checkbutton(contact_sheet_frame, text="Send each sample step as one contact sheet", variable=telegram_contact_sheets).pack(side=tk.LEFT)
+    ttk.Label(contact_sheet_frame, text="Previous steps to include:").pack(side=tk.LEFT, padx=(15, 5))
+    ttk.Entry(contact_sheet_frame, textvariable=telegram_contact_sheet_history, width=5).pack(side=tk.LEFT)
+
+    # Spans from the GUI and the monitor, written to traces/ on exit
+    def save_trace():
+        if not tracing.tracer.enabled:
+            messagebox.showinfo("Tracing", f"Tracing is off. Enable it below or set {tracing.TRACE_ENV_VAR}=1, then restart.")
+            return
+        path = tracing.save()
+        if path:
+            messagebox.showinfo("Trace Saved", f"Trace written to {path}\n\n{tracing.tracer.format_summary()}")
+        else:
+            messagebox.showinfo("Tracing", "No spans recorded yet.")
+
+    tracing_frame = ttk.Frame(main_frame)
+    tracing_frame.grid(row=11, column=0, columnspan=3, sticky="w", padx=5, pady=5)
+    ttk.Checkbutton(tracing_frame, text="Enable performance tracing (applies after restart)", variable=tracing_enabled).pack(side=tk.LEFT)
+    ttk.Button(tracing_frame, text="Save Trace Now", command=save_trace).pack(side=tk.LEFT, padx=10)
+
     # Instructions for Telegram setup
     instructions = (
         "To set up Telegram notifications:\n"
@@ -86,7 +132,7 @@ def create_settings_tab(settings_tab, ai_toolkit_folder):
         "5. Find your Chat ID in the JSON response and paste it above\n"
         "6. Click 'Test Connection' to verify your settings"
     )
-    ttk.Label(main_frame, text=instructions, justify=tk.LEFT, wraplength=400).grid(row=7, column=0, columnspan=3, padx=5, pady=10)
+    ttk.Label(main_frame, text=instructions, justify=tk.LEFT, wraplength=400).grid(row=12, column=0, columnspan=3, padx=5, pady=10)
 
     def test_telegram_connection():
         bot_token = telegram_bot_token.get()
@@ -96,18 +142,27 @@ def create_settings_tab(settings_tab, ai_toolkit_folder):
             messagebox.showerror("Error", "Please enter both Bot Token and Chat ID.")
             return
 
-        async def send_test_message():
+        # The send runs on a worker thread; the result is picked up on the Tk thread
+        results = queue.Queue()
+        threading.Thread(target=lambda: results.put(run_connection_test(bot_token, chat_id, config)), daemon=True).start()
+        test_button.config(state=tk.DISABLED)
+
+        def poll_result():
             try:
-                notifier = TelegramNotifier(bot_token, chat_id)
-                await notifier.send_message("Test message from AI Toolkit Helper!")
+                ok, error = results.get_nowait()
+            except queue.Empty:
+                main_frame.after(100, poll_result)
+                return
+            test_button.config(state=tk.NORMAL)
+            if ok:
                 messagebox.showinfo("Success", "Test message sent successfully!")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to send test message: {str(e)}")
+            else:
+                messagebox.showerror("Error", f"Failed to send test message: {error}")
 
-        asyncio.run(send_test_message())
+        main_frame.after(100, poll_result)
 
     test_button = ttk.Button(main_frame, text="Test Connection", command=test_telegram_connection)
-    test_button.grid(row=8, column=0, columnspan=3, pady=10)
+    test_button.grid(row=13, column=0, columnspan=3, pady=10)
 
     # Save Button
     def save_settings():
@@ -115,10 +170,21 @@ def create_settings_tab(settings_tab, ai_toolkit_folder):
         config["telegram_bot_token"] = telegram_bot_token.get()
         config["telegram_chat_id"] = telegram_chat_id.get()
         config["telegram_enabled"] = telegram_enabled.get()
+        try:
+            config["telegram_image_max_edge"] = int(telegram_image_max_edge.get())
+            config["telegram_image_quality"] = int(telegram_image_quality.get())
+            config["telegram_contact_sheet_history"] = int(telegram_contact_sheet_history.get())
+        except ValueError:
+            messagebox.showerror("Error", "Sample upload max edge, quality and contact sheet steps must be whole numbers.")
+            return
+        config["telegram_image_format"] = telegram_image_format.get()
+        config["telegram_send_originals"] = telegram_send_originals.get()
+        config["telegram_contact_sheets"] = telegram_contact_sheets.get()
+        config["tracing_enabled"] = tracing_enabled.get()
         save_config(config)
         messagebox.showinfo("Settings Saved", "Settings have been saved successfully.")
 
     save_button = ttk.Button(main_frame, text="Save All Settings", command=save_settings)
-    save_button.grid(row=9, column=0, columnspan=3, pady=10)
+    save_button.grid(row=14, column=0, columnspan=3, pady=10)
 
     return telegram_enabled  # Return this so we can use it in the main app to control the background script
\ No newline at end of file
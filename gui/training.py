@@ -3,7 +3,26 @@ from tkinter import ttk, messagebox
 import os
 import subprocess
 import sys
+import json
 import threading
+from gui.config_index import ConfigIndex, CONFIG_COLUMNS
+from gui.preflight import run_preflight, format_preflight_report
+from gui.cost_estimator import get_estimator, format_duration
+from monitor.ipc import notify, DEFAULT_PORT, SECRET_KEY
+from gui.loss_chart import open_loss_chart_window
+from gui.output_index import OutputIndex, format_bytes
+from gui.runs_browser import open_runs_window
+from gui.ui_bus import UIBus, LATEST
+import tracing
+
+CONFIG_FILE = "ai_toolkit_helper_config.json"
+INDEX_POLL_MS = 500
+
+def load_config():
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r') as config_file:
+            return json.load(config_file)
+    return {}
 
 def create_training_tab(tab, ai_toolkit_folder):
     frame = ttk.Frame(tab)
@@ -14,14 +33,24 @@ def create_training_tab(tab, ai_toolkit_folder):
                            wraplength=400, justify="center", style="Info.TLabel")
     info_label.grid(row=0, column=0, columnspan=5, pady=10)
 
-    # Available configs
+    # Available configs, backed by a watched index of parsed YAML metadata
     available_label = ttk.Label(frame, text="Available Configs:")
     available_label.grid(row=1, column=0, sticky="w", padx=5, pady=5)
-    available_listbox = tk.Listbox(frame, width=40, height=10)
-    available_listbox.grid(row=2, column=0, padx=5, pady=5, sticky="nsew")
-    available_scrollbar = ttk.Scrollbar(frame, orient="vertical", command=available_listbox.yview)
+    available_tree = ttk.Treeview(frame, columns=[key for key, _ in CONFIG_COLUMNS], show="headings", height=10, selectmode="browse")
+    for key, heading in CONFIG_COLUMNS:
+        wide = key in ("filename", "name", "folder_path", "model")
+        available_tree.column(key, width=140 if wide else 50, stretch=wide)
+    available_tree.grid(row=2, column=0, padx=5, pady=5, sticky="nsew")
+    available_scrollbar = ttk.Scrollbar(frame, orient="vertical", command=available_tree.yview)
     available_scrollbar.grid(row=2, column=1, sticky="ns")
-    available_listbox.configure(yscrollcommand=available_scrollbar.set)
+    available_tree.configure(yscrollcommand=available_scrollbar.set)
+
+    # Filter entry, e.g. "r64" or "rank=64 lr=0.0001"
+    filter_frame = ttk.Frame(frame)
+    filter_frame.grid(row=3, column=0, sticky="ew", padx=5, pady=5)
+    ttk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT)
+    filter_var = tk.StringVar()
+    ttk.Entry(filter_frame, textvariable=filter_var).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
 
     # Selected configs
     selected_label = ttk.Label(frame, text="Selected Configs (In Order):")
@@ -32,14 +61,84 @@ def create_training_tab(tab, ai_toolkit_folder):
     selected_scrollbar.grid(row=2, column=4, sticky="ns")
     selected_listbox.configure(yscrollcommand=selected_scrollbar.set)
 
+    state = {"index": None, "output_index": None, "sort_key": "filename", "reverse": False, "estimate_version": None}
+
+    def save_output_index(event):
+        # Output index changes are saved lazily; keep the last ones on exit
+        if event.widget is frame and state["output_index"] is not None:
+            state["output_index"].save_cache()
+    frame.bind("<Destroy>", save_output_index)
+
+    @tracing.traced("configs.render")
+    def render_available():
+        index = state["index"]
+        available_tree.delete(*available_tree.get_children())
+        if index is None:
+            return
+        selected = set(selected_listbox.get(0, tk.END))
+        for row in index.query(filter_var.get(), state["sort_key"], state["reverse"]):
+            if row["filename"] in selected:
+                continue
+            values = ["" if row.get(key) is None else row.get(key) for key, _ in CONFIG_COLUMNS]
+            available_tree.insert("", tk.END, iid=row["filename"], values=values)
+
+    def sort_by(key):
+        if state["sort_key"] == key:
+            state["reverse"] = not state["reverse"]
+        else:
+            state["sort_key"], state["reverse"] = key, False
+        render_available()
+
+    for key, heading in CONFIG_COLUMNS:
+        available_tree.heading(key, text=heading, command=lambda k=key: sort_by(k))
+
+    def refresh():
+        refresh_configs(ai_toolkit_folder, state, info_label)
+        render_available()
+
+    def poll_index():
+        # Watchdog only flags changes; parsing happens here, on the Tk thread
+        index = state["index"]
+        if index is not None and index.changed.is_set() and index.update():
+            render_available()
+            update_queue_estimate()
+        estimator = get_estimator(ai_toolkit_folder.get())
+        if estimator and estimator.version != state["estimate_version"]:
+            update_queue_estimate()
+        # The output index scans on a worker thread; output/ can hold hundreds of runs
+        output_index = state["output_index"]
+        if output_index is not None and (output_index.changed.is_set() or output_index.save_due()):
+            output_index.update_in_background()
+        tab.after(INDEX_POLL_MS, poll_index)
+
+    def add_config():
+        selection = available_tree.selection()
+        if selection:
+            selected_listbox.insert(tk.END, selection[0])
+            render_available()
+            update_queue_estimate()
+
+    def remove_config():
+        selection = selected_listbox.curselection()
+        if selection:
+            selected_listbox.delete(selection[0])
+            render_available()
+            update_queue_estimate()
+
+    filter_var.trace_add("write", lambda *args: render_available())
+
     # Buttons for moving configs
-    add_button = ttk.Button(frame, text="Add >", command=lambda: move_item(available_listbox, selected_listbox))
+    add_button = ttk.Button(frame, text="Add >", command=add_config)
     add_button.grid(row=2, column=2, pady=5)
-    remove_button = ttk.Button(frame, text="< Remove", command=lambda: move_item(selected_listbox, available_listbox))
+    remove_button = ttk.Button(frame, text="< Remove", command=remove_config)
     remove_button.grid(row=3, column=2, pady=5)
-    move_up_button = ttk.Button(frame, text="Move Up", command=lambda: move_item_in_list(selected_listbox, -1))
+    def move_config(direction):
+        move_item_in_list(selected_listbox, direction)
+        update_queue_estimate()
+
+    move_up_button = ttk.Button(frame, text="Move Up", command=lambda: move_config(-1))
     move_up_button.grid(row=4, column=3, pady=5)
-    move_down_button = ttk.Button(frame, text="Move Down", command=lambda: move_item_in_list(selected_listbox, 1))
+    move_down_button = ttk.Button(frame, text="Move Down", command=lambda: move_config(1))
     move_down_button.grid(row=5, column=3, pady=5)
 
     # Add a progress bar
@@ -50,14 +149,81 @@ def create_training_tab(tab, ai_toolkit_folder):
     # Add a status label
     status_var = tk.StringVar(value="Ready")
     status_label = ttk.Label(frame, textvariable=status_var, wraplength=400, justify="center")
+
+    # The training worker reports through the bus; only the Tk thread touches the vars
+    ui_bus = UIBus(tab)
+    ui_bus.subscribe("status", status_var.set, LATEST)
+    ui_bus.subscribe("progress", progress_var.set, LATEST)
     status_label.grid(row=8, column=0, columnspan=5, pady=5)
 
+    # Per-job and total cost estimates for the queue
+    queue_estimate_var = tk.StringVar(value="")
+    queue_estimate_label = ttk.Label(frame, textvariable=queue_estimate_var, justify="left")
+    queue_estimate_label.grid(row=9, column=0, columnspan=5, sticky="w", padx=5, pady=5)
+
+    @tracing.traced("training.queue_estimate")
+    def update_queue_estimate():
+        ai_toolkit_path = ai_toolkit_folder.get()
+        configs = selected_listbox.get(0, tk.END)
+        estimator = get_estimator(ai_toolkit_path)
+        if not estimator or not configs:
+            queue_estimate_var.set("")
+            return
+        state["estimate_version"] = estimator.version
+        lines = []
+        total_seconds = 0
+        for i, config in enumerate(configs, 1):
+            try:
+                estimate = estimator.estimate_file(os.path.join(ai_toolkit_path, 'config', config))
+            except Exception as e:
+                lines.append(f"{i}. {config}: estimate unavailable ({e.__class__.__name__})")
+                continue
+            total_seconds += estimate["total_seconds"]
+            lines.append(f"{i}. {config}: {estimator.describe(estimate)}")
+        lines.append(f"Total ETA for {len(configs)} configs: {format_duration(total_seconds)}")
+        queue_estimate_var.set("\n".join(lines))
+
     # Start training button
-    start_button = ttk.Button(frame, text="Start Training", command=lambda: start_training_thread(selected_listbox, ai_toolkit_folder, progress_var, status_var))
+    start_button = ttk.Button(frame, text="Start Training", command=lambda: start_training_thread(selected_listbox, ai_toolkit_folder, ui_bus))
     start_button.grid(row=6, column=0, columnspan=5, pady=10)
 
+    # Loss/lr curves of past and running trainings
+    def show_loss_chart():
+        if not ai_toolkit_folder.get():
+            messagebox.showerror("Error", "Please set the AI Toolkit folder in the Settings tab.")
+            return
+        open_loss_chart_window(tab, ai_toolkit_folder.get())
+
+    # Runs, checkpoints and samples in output/, from the incremental index
+    def show_runs():
+        output_index = state["output_index"]
+        if output_index is None:
+            messagebox.showerror("Error", "Please set the AI Toolkit folder in the Settings tab.")
+            return
+        open_runs_window(tab, output_index)
+
+    def show_latest_checkpoints():
+        output_index = state["output_index"]
+        if output_index is None:
+            messagebox.showerror("Error", "Please set the AI Toolkit folder in the Settings tab.")
+            return
+        latest = output_index.latest_checkpoints()
+        if not latest:
+            messagebox.showinfo("Latest Checkpoints", "No checkpoints found in the output folder yet.")
+            return
+        lines = [f"{run}: {checkpoint['file']} (step {checkpoint['step'] if checkpoint['step'] is not None else 'final'}, {format_bytes(checkpoint['size'])})"
+                 for run, checkpoint in sorted(latest.items())]
+        messagebox.showinfo("Latest Checkpoints", "\n".join(lines))
+
+    output_buttons = ttk.Frame(frame)
+    output_buttons.grid(row=10, column=0, columnspan=5, pady=5)
+    loss_chart_button = ttk.Button(output_buttons, text="Loss Charts", command=show_loss_chart)
+    loss_chart_button.pack(side=tk.LEFT, padx=5)
+    ttk.Button(output_buttons, text="Runs & Checkpoints", command=show_runs).pack(side=tk.LEFT, padx=5)
+    ttk.Button(output_buttons, text="Latest Checkpoints", command=show_latest_checkpoints).pack(side=tk.LEFT, padx=5)
+
     # Refresh button
-    refresh_button = ttk.Button(frame, text="Refresh Configs", command=lambda: refresh_configs(ai_toolkit_folder, available_listbox, info_label))
+    refresh_button = ttk.Button(frame, text="Refresh Configs", command=refresh)
     refresh_button.grid(row=1, column=1, padx=5, pady=5)
 
     # Configure grid weights
@@ -65,33 +231,57 @@ def create_training_tab(tab, ai_toolkit_folder):
     frame.columnconfigure(3, weight=1)
     frame.rowconfigure(2, weight=1)
 
-    # Initial population of configs
-    refresh_configs(ai_toolkit_folder, available_listbox, info_label)
+    # Initial population of configs; follow the folder setting and watch for changes
+    refresh()
+    ai_toolkit_folder.trace_add("write", lambda *args: refresh())
+    tab.after(INDEX_POLL_MS, poll_index)
+
+    def enqueue_configs(filenames):
+        # Used by the Config Generator to queue freshly generated configs
+        queued = set(selected_listbox.get(0, tk.END))
+        for filename in filenames:
+            if filename not in queued:
+                selected_listbox.insert(tk.END, filename)
+                queued.add(filename)
+        index = state["index"]
+        if index is not None:
+            index.update()
+        render_available()
+        update_queue_estimate()
 
-def refresh_configs(ai_toolkit_folder, available_listbox, info_label):
-    available_listbox.delete(0, tk.END)
+    return enqueue_configs
+
+def refresh_configs(ai_toolkit_folder, state, info_label):
     ai_toolkit_path = ai_toolkit_folder.get()
-    
+    config_folder = os.path.join(ai_toolkit_path, 'config') if ai_toolkit_path else None
+
+    index = state["index"]
+    if index is None or index.config_folder != config_folder:
+        if index is not None:
+            index.stop_watching()
+        state["index"] = index = ConfigIndex(config_folder) if config_folder else None
+
+    output_folder = os.path.join(ai_toolkit_path, 'output') if ai_toolkit_path else None
+    output_index = state["output_index"]
+    if output_index is None or output_index.output_folder != output_folder:
+        if output_index is not None:
+            output_index.stop_watching()
+        state["output_index"] = output_index = OutputIndex(output_folder) if output_folder else None
+    if output_index is not None:
+        output_index.refresh()
+        output_index.start_watching()
+
     if not ai_toolkit_path:
         info_label.config(text="Please set the AI Toolkit folder path in the Settings tab to view config files.")
         return
 
-    config_folder = os.path.join(ai_toolkit_path, 'config')
     if not os.path.exists(config_folder):
         info_label.config(text=f"The selected AI Toolkit folder '{ai_toolkit_path}' does not contain a 'config' folder.")
         return
 
     info_label.config(text="")
-    config_files = [f for f in os.listdir(config_folder) if f.endswith('.yaml')]
-    for config in sorted(config_files):
-        available_listbox.insert(tk.END, config)
-
-def move_item(from_listbox, to_listbox):
-    selection = from_listbox.curselection()
-    if selection:
-        item = from_listbox.get(selection[0])
-        from_listbox.delete(selection[0])
-        to_listbox.insert(tk.END, item)
+    index.update()
+    index.start_watching()
 
 def move_item_in_list(listbox, direction):
     selection = listbox.curselection()
@@ -103,36 +293,56 @@ def move_item_in_list(listbox, direction):
             listbox.insert(index + direction, item)
             listbox.selection_set(index + direction)
 
-def start_training_thread(selected_listbox, ai_toolkit_folder, progress_var, status_var):
+def start_training_thread(selected_listbox, ai_toolkit_folder, ui_bus):
     configs = list(selected_listbox.get(0, tk.END))
     if not configs:
         messagebox.showerror("Error", "No config files selected.")
         return
 
     # Start the training in a separate thread to keep the UI responsive
-    threading.Thread(target=run_training, args=(configs, ai_toolkit_folder, progress_var, status_var), daemon=True).start()
+    threading.Thread(target=run_training, args=(configs, ai_toolkit_folder.get(), ui_bus), daemon=True).start()
 
-def update_status(status_var, message):
-    status_var.set(message)
+def update_status(ui_bus, message):
+    ui_bus.post("status", message)
     print(message)  # Also print to console for logging
 
-def update_progress(progress_var, value):
-    progress_var.set(value)
+def update_progress(ui_bus, value):
+    ui_bus.post("progress", value)
 
-def run_training(configs, ai_toolkit_folder, progress_var, status_var):
-    ai_toolkit_path = ai_toolkit_folder.get()
+def run_training(configs, ai_toolkit_path, ui_bus):
     venv_path = os.path.join(ai_toolkit_path, 'venv')
     run_script_path = os.path.join(ai_toolkit_path, 'run.py')
 
     if not os.path.exists(venv_path):
-        update_status(status_var, "Error: Virtual environment not found.")
+        update_status(ui_bus, "Error: Virtual environment not found.")
         return
 
     if not os.path.exists(run_script_path):
-        update_status(status_var, "Error: run.py script not found.")
+        update_status(ui_bus, "Error: run.py script not found.")
         return
 
     total_configs = len(configs)
+
+    # Verify every queued dataset before any model gets loaded
+    update_status(ui_bus, f"Running dataset preflight for {total_configs} configs...")
+    config_paths = [os.path.join(ai_toolkit_path, 'config', config) for config in configs]
+    try:
+        with tracing.span("training.preflight", configs=total_configs):
+            report, warning_report = run_preflight(config_paths)
+    except Exception as e:
+        report = warning_report = {}
+        update_status(ui_bus, f"Preflight could not run: {str(e)}")
+    # Warnings are logged but do not hold up the queue
+    warning_summary = format_preflight_report(warning_report, "warning")
+    if warning_summary:
+        print(warning_summary)
+    problem_summary = format_preflight_report(report)
+    if problem_summary:
+        update_status(ui_bus, "Preflight found dataset problems.")
+        print(problem_summary)
+        if not ui_bus.ask(messagebox.askyesno, "Preflight Problems", f"{problem_summary}\n\nStart training anyway?"):
+            update_status(ui_bus, "Training cancelled after preflight.")
+            return
     
     # Prepare the command to open a new CMD window and run all configs sequentially
     if sys.platform == "win32":
@@ -163,15 +373,22 @@ def run_training(configs, ai_toolkit_folder, progress_var, status_var):
 
     try:
         # Run the command to open a new window and start all trainings
-        subprocess.Popen(full_cmd, shell=True, cwd=ai_toolkit_path)
+        with tracing.span("training.launch"):
+            subprocess.Popen(full_cmd, shell=True, cwd=ai_toolkit_path)
         
-        update_status(status_var, f"Batch training for {total_configs} configs started in a new window.")
-        update_progress(progress_var, 100)
+        update_status(ui_bus, f"Batch training for {total_configs} configs started in a new window.")
+        update_progress(ui_bus, 100)
+
+        # Handed to the notifier service if it is running
+        config = load_config()
+        if config.get("telegram_enabled"):
+            notify(f"Batch training started: {total_configs} configs ({', '.join(configs)})",
+                   config.get(SECRET_KEY, ""), int(config.get("notifier_port", DEFAULT_PORT)))
         
-        messagebox.showinfo("Training Started", f"Batch training for {total_configs} configs has been started in a new window. The trainings will run automatically in sequence. Please monitor the new window for progress.")
+        ui_bus.call(messagebox.showinfo, "Training Started", f"Batch training for {total_configs} configs has been started in a new window. The trainings will run automatically in sequence. Please monitor the new window for progress.")
 
     except Exception as e:
-        update_status(status_var, f"An unexpected error occurred: {str(e)}")
-        messagebox.showerror("Error", f"An error occurred while starting the training: {str(e)}")
+        update_status(ui_bus, f"An unexpected error occurred: {str(e)}")
+        ui_bus.call(messagebox.showerror, "Error", f"An error occurred while starting the training: {str(e)}")
 
-    update_status(status_var, "Batch training process initiated. Please check the new window for progress.")
\ No newline at end of file
+    update_status(ui_bus, "Batch training process initiated. Please check the new window for progress.")
\ No newline at end of file
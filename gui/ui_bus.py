@@ -0,0 +1,98 @@
+import queue
+import traceback
+import tracing
+
+DRAIN_INTERVAL_MS = 33  # ~30 Hz
+MAX_EVENTS_PER_DRAIN = 10000
+
+# How a kind's events are delivered within one drain:
+LATEST = "latest"  # handler(value) once, with the newest value
+BATCH = "batch"    # handler([(key, value)]) once, newest value per key, first-seen order
+EACH = "each"      # handler(value) for every event, in order
+
+class UIBus:
+    # Worker threads post events; the Tk thread drains them on a fixed
+    # cadence, so workers never touch widgets and a burst of updates costs
+    # one redraw per frame. post(), call() and ask() are safe from any thread;
+    # everything else belongs to the Tk thread.
+    def __init__(self, widget, interval_ms=DRAIN_INTERVAL_MS):
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.events = queue.SimpleQueue()
+        self.handlers = {"call": (EACH, self.run_call)}
+        self.widget.after(self.interval_ms, self.drain)
+
+    def subscribe(self, kind, handler, mode=EACH):
+        self.handlers[kind] = (mode, handler)
+
+    def post(self, kind, value=None, key=None):
+        self.events.put((kind, key, value))
+
+    def call(self, func, *args):
+        # Runs func(*args) on the Tk thread, e.g. messagebox.showinfo
+        self.post("call", (func, args, None))
+
+    def ask(self, func, *args):
+        # Like call(), but blocks the worker until func returns and hands back
+        # its result, e.g. for messagebox.askyesno. Never call from the Tk thread.
+        reply = queue.Queue(maxsize=1)
+        self.post("call", (func, args, reply))
+        return reply.get()
+
+    def run_call(self, value):
+        func, args, reply = value
+        result = None
+        try:
+            result = func(*args)
+        finally:
+            # A failing call still releases the waiting worker
+            if reply is not None:
+                reply.put(result)
+
+    def drain(self):
+        try:
+            events = []
+            while len(events) < MAX_EVENTS_PER_DRAIN:
+                try:
+                    events.append(self.events.get_nowait())
+                except queue.Empty:
+                    break
+            if events:
+                self.dispatch(events)
+        finally:
+            try:
+                self.widget.after(self.interval_ms, self.drain)
+            except Exception:
+                pass  # Widget destroyed; the app is closing
+
+    def dispatch(self, events):
+        latest = {}
+        batches = {}
+        ordered = []
+        for kind, key, value in events:
+            mode, _ = self.handlers.get(kind, (EACH, None))
+            if mode == LATEST:
+                latest[kind] = value
+            elif mode == BATCH:
+                batches.setdefault(kind, {})[key] = value
+            else:
+                ordered.append((kind, value))
+
+        # Coalesced state first, so a dialog in this frame shows up-to-date widgets
+        for kind, batch in batches.items():
+            self.deliver(kind, list(batch.items()))
+        for kind, value in latest.items():
+            self.deliver(kind, value)
+        for kind, value in ordered:
+            self.deliver(kind, value)
+
+    def deliver(self, kind, value):
+        handler = self.handlers.get(kind, (EACH, None))[1]
+        if handler is None:
+            print(f"No UI handler for event: {kind}")
+            return
+        try:
+            with tracing.span(f"ui.{kind}"):
+                handler(value)
+        except Exception:
+            traceback.print_exc()
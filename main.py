@@ -4,6 +4,7 @@ import subprocess
 import atexit
 import os
 import sys
+import tracing
 from gui.captioning import create_captioning_tab
 from gui.training import create_training_tab
 from gui.config_generator import create_config_generator_tab
@@ -21,6 +22,7 @@ class App(tk.Tk):
 
         # Load existing configuration
         self.config = load_config()
+        tracing.configure(self.config, "gui")
         self.ai_toolkit_folder.set(self.config.get("ai_toolkit_folder", ""))
 
         # Create tabs
@@ -42,8 +44,8 @@ class App(tk.Tk):
 
         # Call functions to build the tabs
         create_captioning_tab(captioning_tab)
-        create_config_generator_tab(config_generator_tab, self.ai_toolkit_folder)
-        create_training_tab(training_tab, self.ai_toolkit_folder)
+        enqueue_training_configs = create_training_tab(training_tab, self.ai_toolkit_folder)
+        create_config_generator_tab(config_generator_tab, self.ai_toolkit_folder, enqueue_training_configs)
         self.telegram_enabled = create_settings_tab(settings_tab, self.ai_toolkit_folder)
 
         # Start Telegram monitoring if enabled
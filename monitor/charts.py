@@ -0,0 +1,78 @@
+import os
+import threading
+import numpy as np
+from matplotlib.figure import Figure
+import tracing
+from monitor.metrics import load_run_metrics
+
+# Figure objects are used directly (no pyplot), so rendering is safe on
+# worker threads and needs no GUI backend
+CHART_FILE = "loss_chart.png"
+CHART_POINTS = 1000
+SMOOTHING = 0.9
+
+def downsample(steps, values, max_points=CHART_POINTS):
+    # Bucket means; NaNs (missing values) are ignored within a bucket
+    steps = np.asarray(steps, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    if len(steps) <= max_points:
+        return steps, values
+    bucket = int(np.ceil(len(steps) / max_points))
+    starts = np.arange(0, len(steps), bucket)
+    valid = ~np.isnan(values)
+    counts = np.add.reduceat(valid.astype(np.float64), starts)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    ends = np.minimum(starts + bucket, len(steps)) - 1
+    return steps[ends], means
+
+def smooth(values, factor=SMOOTHING):
+    # Exponential moving average, the same curve TensorBoard shows
+    smoothed = np.empty_like(values)
+    last = np.nan
+    for i, value in enumerate(values):
+        if not np.isnan(value):
+            last = value if np.isnan(last) else factor * last + (1 - factor) * value
+        smoothed[i] = last
+    return smoothed
+
+def render_chart(columns, path, title):
+    steps, loss = downsample(columns["step"], columns["loss"])
+    _, lr = downsample(columns["step"], columns["lr"])
+    _, rate = downsample(columns["step"], columns["rate"])
+
+    figure = Figure(figsize=(8, 5), dpi=100)
+    loss_axes, lr_axes = figure.subplots(2, 1, sharex=True, gridspec_kw={"height_ratios": [3, 1]})
+    loss_axes.plot(steps, loss, color="tab:blue", alpha=0.3, linewidth=0.8, label="loss")
+    loss_axes.plot(steps, smooth(loss), color="tab:blue", linewidth=1.5, label="smoothed")
+    loss_axes.set_ylabel("loss")
+    loss_axes.legend(loc="upper right")
+    loss_axes.grid(alpha=0.3)
+    lr_axes.plot(steps, lr, color="tab:orange", linewidth=1)
+    lr_axes.set_ylabel("lr")
+    lr_axes.set_xlabel("step")
+    lr_axes.grid(alpha=0.3)
+
+    recent_rate = rate[~np.isnan(rate)][-10:]
+    subtitle = f"step {int(steps[-1])}"
+    if len(recent_rate):
+        subtitle += f", {np.mean(recent_rate):.2f} it/s"
+    figure.suptitle(f"{title} ({subtitle})")
+    figure.tight_layout()
+
+    # Written atomically; the monitor and the GUI may render the same run
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    figure.savefig(temp_path, format="png")
+    os.replace(temp_path, path)
+    return path
+
+@tracing.traced("chart.render")
+def render_run_chart(run_folder, recorder=None):
+    # Returns the chart path, or None when the run has no metrics yet.
+    # Slow (matplotlib); call from a worker thread.
+    series = recorder.series_for(run_folder) if recorder else load_run_metrics(run_folder)
+    columns = series.snapshot()
+    if not len(columns["step"]):
+        return None
+    return render_chart(columns, os.path.join(run_folder, CHART_FILE), os.path.basename(os.path.normpath(run_folder)))
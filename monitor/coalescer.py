@@ -0,0 +1,110 @@
+import os
+import re
+import asyncio
+
+# AI Toolkit names samples "<timestamp>__<step>_<prompt index>.<ext>"
+SAMPLE_NAME_PATTERN = re.compile(r'__(\d+)_(\d+)\.(?:png|jpe?g|webp)$', re.IGNORECASE)
+LOG_WINDOW = 5.0
+IMAGE_WINDOW = 3.0
+MAX_MEDIA_GROUP = 10  # Telegram's limit for sendMediaGroup
+
+def parse_sample_name(path):
+    # Returns (step, prompt index) for AI Toolkit sample images, else None
+    match = SAMPLE_NAME_PATTERN.search(os.path.basename(path))
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    return None
+
+class NotificationCoalescer:
+    # Collapses bursts before they become Telegram calls: log lines within a
+    # window collapse to the latest, and sample images of one step become one
+    # media group, or one contact sheet. dispatch(item, source, tokens) also gets
+    # the path the item came from, for routing, and the tokens passed to add()
+    # for every item it replaces. Must be used from the event loop thread.
+    def __init__(self, dispatch, log_window=LOG_WINDOW, image_window=IMAGE_WINDOW, max_group=MAX_MEDIA_GROUP, contact_sheets=False):
+        self.dispatch = dispatch
+        self.contact_sheets = contact_sheets
+        self.log_window = log_window
+        self.image_window = image_window
+        self.max_group = max_group
+        self.latest_log_lines = {}  # log file -> latest line
+        self.log_timers = {}
+        self.log_tokens = {}  # log file -> tokens of the lines collapsed so far
+        self.image_groups = {}  # (folder, step) -> [(prompt index, path)]
+        self.image_timers = {}
+        self.image_tokens = {}  # (folder, step) -> tokens of the images grouped so far
+
+    def add(self, item, token=None):
+        if item[0] == 'log':
+            self.add_log_line(item[1], item[2], token)
+        elif item[0] == 'image':
+            self.add_image(item[1], item[2], token)
+        else:
+            self.dispatch(item, None, [token] if token is not None else [])
+
+    def add_log_line(self, log_file, line, token=None):
+        self.latest_log_lines[log_file] = line
+        if token is not None:
+            self.log_tokens.setdefault(log_file, []).append(token)
+        # Window opens with the first line and is not extended, so a
+        # constantly changing log still reports every log_window seconds
+        if log_file not in self.log_timers:
+            loop = asyncio.get_running_loop()
+            self.log_timers[log_file] = loop.call_later(self.log_window, self.flush_log, log_file)
+
+    def flush_log(self, log_file):
+        self.log_timers.pop(log_file, None)
+        line = self.latest_log_lines.pop(log_file, None)
+        tokens = self.log_tokens.pop(log_file, [])
+        if line is not None:
+            self.dispatch(('message', f"Training update: {line}"), log_file, tokens)
+
+    def add_image(self, path, caption, token=None):
+        sample = parse_sample_name(path)
+        if sample is None:
+            self.dispatch(('image', path, caption), path, [token] if token is not None else [])
+            return
+
+        key = (os.path.dirname(path), sample[0])
+        if token is not None:
+            self.image_tokens.setdefault(key, []).append(token)
+        group = self.image_groups.setdefault(key, [])
+        if any(existing == path for _, existing in group):
+            return
+        group.append((sample[1], path))
+
+        timer = self.image_timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        if len(group) >= self.max_group:
+            self.flush_images(key)
+        else:
+            # Debounced: the group goes out once the step stops producing images
+            loop = asyncio.get_running_loop()
+            self.image_timers[key] = loop.call_later(self.image_window, self.flush_images, key)
+
+    def flush_images(self, key):
+        self.image_timers.pop(key, None)
+        group = self.image_groups.pop(key, [])
+        tokens = self.image_tokens.pop(key, [])
+        if not group:
+            return
+        paths = [path for _, path in sorted(group)]
+        folder, step = key
+        caption = f"Samples for {os.path.basename(os.path.dirname(folder)) or os.path.basename(folder)} at step {step}"
+        if self.contact_sheets:
+            self.dispatch(('contact_sheet', paths, caption), folder, tokens)
+        elif len(paths) == 1:
+            self.dispatch(('image', paths[0], caption), folder, tokens)
+        else:
+            self.dispatch(('images', paths, caption), folder, tokens)
+
+    def flush_all(self):
+        for log_file in list(self.log_timers):
+            self.log_timers[log_file].cancel()
+            self.flush_log(log_file)
+        for key in list(self.image_groups):
+            timer = self.image_timers.get(key)
+            if timer:
+                timer.cancel()
+            self.flush_images(key)
@@ -0,0 +1,166 @@
+import os
+import hashlib
+import threading
+import yaml
+import tracing
+from PIL import Image, ImageDraw, ImageFont
+from monitor.coalescer import parse_sample_name
+
+DEFAULT_SHEET_FOLDER = "contact_sheets"
+DEFAULT_HISTORY = 0
+CELL_SIZE = 512
+MAX_SHEET_EDGE = 2560  # Telegram scales photos down to this anyway
+LABEL_LINES = 3
+MAX_BLOCKS_PER_ROW = 3
+FONT_SIZE = 16
+PADDING = 8
+QUALITY = 90
+
+def load_font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        return ImageFont.load_default()  # Pillow < 10.1 has a single bitmap size
+
+def wrap_text(draw, text, font, width, max_lines):
+    lines = [""]
+    for word in text.split():
+        candidate = f"{lines[-1]} {word}".strip()
+        if lines[-1] and draw.textlength(candidate, font=font) > width:
+            lines.append(word)
+        else:
+            lines[-1] = candidate
+    if len(lines) > max_lines:
+        # Text continues past the last line
+        lines = lines[:max_lines]
+        while lines[-1] and draw.textlength(lines[-1] + "...", font=font) > width:
+            lines[-1] = lines[-1][:-1]
+        lines[-1] += "..."
+    return lines
+
+def read_sample_prompts(config_path):
+    with open(config_path, 'r', encoding='utf-8') as config_file:
+        data = yaml.safe_load(config_file) or {}
+    try:
+        return list(data["config"]["process"][0]["sample"]["prompts"])
+    except (KeyError, IndexError, TypeError):
+        return []
+
+class ContactSheetBuilder:
+    # Composes one step's sample images into a single labeled grid, one row
+    # per prompt; with history, each row also shows that prompt's images
+    # from the previous steps. build() is slow (PIL); call from a worker.
+    def __init__(self, output_folder=DEFAULT_SHEET_FOLDER, history=DEFAULT_HISTORY, cell_size=CELL_SIZE):
+        self.output_folder = output_folder
+        self.history = history
+        self.cell_size = cell_size
+        self.prompt_cache = {}  # run folder -> (config path, mtime, prompts)
+        self.lock = threading.Lock()
+        os.makedirs(self.output_folder, exist_ok=True)
+
+    def prompts_for(self, run_folder):
+        # AI Toolkit copies the run's config YAML into its output folder
+        config_path = None
+        with os.scandir(run_folder) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(('.yaml', '.yml')):
+                    config_path = entry.path
+                    break
+        if config_path is None:
+            return []
+        mtime = os.path.getmtime(config_path)
+        with self.lock:
+            cached = self.prompt_cache.get(run_folder)
+            if cached and cached[0] == config_path and cached[1] == mtime:
+                return cached[2]
+        try:
+            prompts = read_sample_prompts(config_path)
+        except (OSError, yaml.YAMLError):
+            prompts = []
+        with self.lock:
+            self.prompt_cache[run_folder] = (config_path, mtime, prompts)
+        return prompts
+
+    def previous_steps(self, samples_folder, step):
+        # {prompt index: {step: path}} for the last `history` sampled steps
+        found = {}
+        with os.scandir(samples_folder) as it:
+            for entry in it:
+                sample = parse_sample_name(entry.name)
+                if sample and sample[0] < step:
+                    found.setdefault(sample[0], {})[sample[1]] = entry.path
+        steps = sorted(found)[-self.history:] if self.history else []
+        history = {}
+        for previous_step in steps:
+            for prompt_index, path in found[previous_step].items():
+                history.setdefault(prompt_index, {})[previous_step] = path
+        return steps, history
+
+    @tracing.traced("contact_sheet.build")
+    def build(self, image_paths):
+        # Returns the sheet path for images of one run and step
+        samples = sorted((parse_sample_name(path), path) for path in image_paths)
+        step = samples[0][0][0]
+        samples_folder = os.path.dirname(samples[0][1])
+        run_folder = os.path.dirname(samples_folder)
+        run_name = os.path.basename(run_folder)
+        prompts = self.prompts_for(run_folder)
+        steps, history = self.previous_steps(samples_folder, step) if self.history else ([], {})
+        columns = steps + [step]
+
+        rows = []  # (label, [path or None per column])
+        for (_, prompt_index), path in samples:
+            prompt = prompts[prompt_index] if prompt_index < len(prompts) else ""
+            label = f"#{prompt_index}: {prompt}" if prompt else f"#{prompt_index}"
+            rows.append((label, [history.get(prompt_index, {}).get(column) for column in columns[:-1]] + [path]))
+
+        # With history each prompt gets a full-width row of steps; without,
+        # prompts sit side by side, up to MAX_BLOCKS_PER_ROW per row
+        blocks_per_row = 1 if steps else min(len(rows), MAX_BLOCKS_PER_ROW)
+        cells_per_row = blocks_per_row * len(columns)
+        cell = min(self.cell_size, (MAX_SHEET_EDGE - PADDING) // cells_per_row - PADDING)
+        block_width = len(columns) * (cell + PADDING)
+        font = load_font(FONT_SIZE)
+        line_height = FONT_SIZE + 4
+        header_height = (2 if steps else 1) * line_height + PADDING
+        label_height = LABEL_LINES * line_height + PADDING
+        row_height = label_height + cell + PADDING
+        width = blocks_per_row * block_width + PADDING
+        height = header_height + -(-len(rows) // blocks_per_row) * row_height
+        scale = min(1.0, MAX_SHEET_EDGE / height)
+
+        sheet = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(sheet)
+        draw.text((PADDING, PADDING // 2), f"{run_name} - step {step}", fill="black", font=font)
+        for column_index, column_step in enumerate(columns if steps else []):
+            x = PADDING + column_index * (cell + PADDING)
+            draw.text((x, PADDING // 2 + line_height), f"step {column_step}", fill="black", font=font)
+
+        for index, (label, paths) in enumerate(rows):
+            block_x = PADDING + (index % blocks_per_row) * block_width
+            y = header_height + (index // blocks_per_row) * row_height
+            for line_index, line in enumerate(wrap_text(draw, label, font, block_width - PADDING, LABEL_LINES)):
+                draw.text((block_x, y + line_index * line_height), line, fill="black", font=font)
+            for column_index, path in enumerate(paths):
+                x = block_x + column_index * (cell + PADDING)
+                if path is None:
+                    draw.rectangle([x, y + label_height, x + cell, y + label_height + cell], outline="lightgray")
+                    continue
+                try:
+                    with Image.open(path) as img:
+                        img.draft("RGB", (cell, cell))  # JPEG decodes at reduced size
+                        thumb = img.convert("RGB")
+                        thumb.thumbnail((cell, cell), Image.LANCZOS)
+                except OSError:
+                    continue
+                sheet.paste(thumb, (x + (cell - thumb.width) // 2, y + label_height + (cell - thumb.height) // 2))
+
+        if scale < 1.0:
+            sheet = sheet.resize((int(width * scale), int(height * scale)), Image.LANCZOS)
+        # Roots may share run names; a short hash of the output folder keeps their sheets apart
+        root_tag = hashlib.sha1(os.path.normcase(os.path.abspath(os.path.dirname(run_folder))).encode('utf-8')).hexdigest()[:8]
+        output_path = os.path.join(self.output_folder, f"{run_name}_{root_tag}_{step:09d}.jpg")
+        temp_path = f"{output_path}.{threading.get_ident()}.tmp"
+        sheet.save(temp_path, "JPEG", quality=QUALITY, optimize=True)
+        os.replace(temp_path, output_path)
+        return output_path
@@ -0,0 +1,91 @@
+import os
+import io
+import hashlib
+import threading
+from PIL import Image
+
+DEFAULT_MAX_EDGE = 1024
+DEFAULT_FORMAT = "jpeg"
+DEFAULT_QUALITY = 85
+DEFAULT_CACHE_FOLDER = "telegram_upload_cache"
+FORMAT_EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp"}
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+class PreparedImage:
+    def __init__(self, data, filename, original_size):
+        self.data = data
+        self.filename = filename
+        self.original_size = original_size
+
+    @property
+    def saved_bytes(self):
+        return self.original_size - len(self.data)
+
+class ImageRecompressor:
+    # Re-encodes samples for upload; call prepare() from a worker thread
+    def __init__(self, cache_folder=DEFAULT_CACHE_FOLDER, max_edge=DEFAULT_MAX_EDGE, image_format=DEFAULT_FORMAT, quality=DEFAULT_QUALITY):
+        self.cache_folder = cache_folder
+        self.max_edge = max_edge
+        self.image_format = image_format.lower()
+        self.quality = quality
+        self.extension = FORMAT_EXTENSIONS.get(self.image_format, ".jpg")
+        self.lock = threading.Lock()
+        self.total_original = 0
+        self.total_sent = 0
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+    def cache_path(self, data):
+        # Settings are part of the key so changing them never serves stale encodes
+        digest = hashlib.sha1(data)
+        digest.update(f"{self.max_edge}:{self.image_format}:{self.quality}".encode('utf-8'))
+        return os.path.join(self.cache_folder, digest.hexdigest() + self.extension)
+
+    def encode(self, data):
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+            if max(img.size) > self.max_edge:
+                img.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            output = io.BytesIO()
+            img.save(output, "JPEG" if self.image_format == "jpeg" else "WEBP", quality=self.quality, optimize=True)
+            return output.getvalue()
+
+    def prepare(self, image_path, data=None):
+        if data is None:
+            with open(image_path, 'rb') as image_file:
+                data = image_file.read()
+        name = os.path.splitext(os.path.basename(image_path))[0]
+
+        cache_path = self.cache_path(data)
+        if os.path.exists(cache_path):
+            with open(cache_path, 'rb') as cache_file:
+                encoded = cache_file.read()
+        else:
+            encoded = self.encode(data)
+            temp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as cache_file:
+                cache_file.write(encoded)
+            os.replace(temp_path, cache_path)
+
+        if len(encoded) >= len(data):
+            # Already small enough; re-encoding would only cost quality
+            return PreparedImage(data, os.path.basename(image_path), len(data))
+        return PreparedImage(encoded, name + self.extension, len(data))
+
+    def record_sent(self, prepared):
+        # Counted on successful upload only, so retries don't inflate the totals
+        with self.lock:
+            self.total_original += prepared.original_size
+            self.total_sent += len(prepared.data)
+
+    def summary(self):
+        with self.lock:
+            saved = self.total_original - self.total_sent
+            return f"{format_bytes(saved)} saved of {format_bytes(self.total_original)} in uploads"
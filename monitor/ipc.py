@@ -0,0 +1,184 @@
+import os
+import hmac
+import json
+import socket
+import asyncio
+import logging
+import secrets
+
+logger = logging.getLogger(__name__)
+
+# The notifier service (telegram_monitor.py) listens on localhost; the GUI and
+# training runner submit notifications to it as one JSON object per line and
+# get one JSON response line back. This module only uses the standard library
+# so the GUI can import it without the monitor's dependencies.
+#
+# Any local process can reach the port, so every request carries the shared
+# secret stored in ai_toolkit_helper_config.json as "notifier_secret", and
+# files are only sent from the monitored output folders or the folders listed
+# in "dataset_roots".
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 47831
+MAX_REQUEST_BYTES = 64 * 1024
+CONNECT_TIMEOUT = 1.0
+TEST_TIMEOUT = 30.0
+SECRET_KEY = "notifier_secret"
+
+def ensure_secret(config_file):
+    # Returns the shared secret, generating and saving one on first use.
+    # Only the GUI calls this; the monitor reads the secret from the config.
+    config = {}
+    if os.path.exists(config_file):
+        with open(config_file, 'r') as f:
+            config = json.load(f)
+    if not config.get(SECRET_KEY):
+        config[SECRET_KEY] = secrets.token_hex(32)
+        # Replaced atomically so a crash mid-write cannot empty the settings file
+        temp_path = f"{config_file}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(config, f)
+        os.replace(temp_path, config_file)
+    return config[SECRET_KEY]
+
+def is_within(path, folders):
+    # Symlinks and ".." are resolved first so they cannot escape the folders
+    path = os.path.normcase(os.path.realpath(path))
+    for folder in folders:
+        folder = os.path.normcase(os.path.realpath(folder))
+        if path == folder or path.startswith(folder.rstrip(os.sep) + os.sep):
+            return True
+    return False
+
+def item_paths(item):
+    if item[0] in ('image', 'document', 'chart'):
+        return [item[1]]
+    if item[0] == 'images':
+        return item[1]
+    return []
+
+def request_to_item(request):
+    # Maps an IPC request onto the monitor's queue items, or None if invalid
+    kind = request.get("type")
+    caption = request.get("caption") or ""
+    if kind == "message" and request.get("text"):
+        return ('message', str(request["text"]))
+    if kind == "image" and request.get("path"):
+        return ('image', str(request["path"]), caption)
+    if kind == "images" and isinstance(request.get("paths"), list) and request["paths"]:
+        return ('images', [str(path) for path in request["paths"]], caption)
+    if kind == "document" and request.get("path"):
+        return ('document', str(request["path"]), caption)
+    if kind == "chart" and request.get("run_folder"):
+        return ('chart', str(request["run_folder"]), caption)
+    return None
+
+class NotificationServer:
+    # submit(item) runs on the event loop thread; test(request) is a
+    # coroutine returning (ok, error) for "test" requests. Requests without
+    # the secret are refused, as are paths outside allowed_folders.
+    def __init__(self, submit, secret, allowed_folders, test=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.submit = submit
+        self.secret = secret
+        self.allowed_folders = list(allowed_folders)
+        self.test = test
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=MAX_REQUEST_BYTES)
+        logger.info(f"Notifier service listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.handle_request(line)
+                writer.write(json.dumps(response).encode('utf-8') + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            # ValueError covers lines longer than MAX_REQUEST_BYTES
+            logger.warning(f"Dropped notifier client: {str(e)}")
+        finally:
+            writer.close()
+
+    async def handle_request(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"ok": False, "error": "Request is not valid JSON"}
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "Request must be a JSON object"}
+        if not hmac.compare_digest(str(request.get("secret", "")).encode('utf-8'), self.secret.encode('utf-8')):
+            return {"ok": False, "error": "Invalid secret"}
+
+        kind = request.get("type")
+        if kind == "ping":
+            return {"ok": True}
+        if kind == "test":
+            if self.test is None:
+                return {"ok": False, "error": "Test messages are not supported"}
+            ok, error = await self.test(request)
+            return {"ok": ok, "error": error}
+
+        item = request_to_item(request)
+        if item is None:
+            return {"ok": False, "error": f"Invalid request: {kind}"}
+        outside = [path for path in item_paths(item) if not is_within(path, self.allowed_folders)]
+        if outside:
+            logger.warning(f"Refused notifier request for a path outside the allowed folders: {outside[0]}")
+            return {"ok": False, "error": f"Path is outside the output and dataset folders: {outside[0]}"}
+        self.submit(item)
+        return {"ok": True}
+
+class NotifierClient:
+    # Blocking client; raises OSError when the service is not running
+    def __init__(self, secret, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=CONNECT_TIMEOUT):
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def request(self, payload, timeout=None):
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.settimeout(timeout or self.timeout)
+            sock.sendall(json.dumps(dict(payload, secret=self.secret)).encode('utf-8') + b"\n")
+            with sock.makefile('rb') as stream:
+                line = stream.readline()
+        if not line:
+            raise ConnectionError("Notifier service closed the connection")
+        return json.loads(line)
+
+    def is_available(self):
+        try:
+            return self.request({"type": "ping"}).get("ok", False)
+        except (OSError, ValueError):
+            return False
+
+    def send_message(self, text):
+        return self.request({"type": "message", "text": text})
+
+    def send_image(self, path, caption=""):
+        return self.request({"type": "image", "path": path, "caption": caption})
+
+    def send_chart(self, run_folder, caption=""):
+        return self.request({"type": "chart", "run_folder": run_folder, "caption": caption})
+
+    def send_test(self, token, chat_id, text):
+        # Waits for the actual Telegram round trip, hence the longer timeout
+        return self.request({"type": "test", "token": token, "chat_id": chat_id, "text": text}, timeout=TEST_TIMEOUT)
+
+def notify(text, secret, port=DEFAULT_PORT):
+    # Best effort: notifications are skipped when the service is not running
+    try:
+        return NotifierClient(secret, port=port).send_message(text).get("ok", False)
+    except (OSError, ValueError):
+        return False
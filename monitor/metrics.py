@@ -0,0 +1,185 @@
+import os
+import re
+import json
+import math
+import time
+import threading
+from array import array
+
+# AI Toolkit's progress bar, e.g.
+#   my_lora:  12%|█▏        | 120/1000 [01:23<10:11,  1.44it/s, lr: 1.0e-04 loss: 3.512e-01]
+STEP_PATTERN = re.compile(r'(\d+)/(\d+)\s*\[')
+RATE_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(s/it|it/s)')
+LR_PATTERN = re.compile(r'\blr[:=]\s*([0-9.]+(?:e[-+]?\d+)?)', re.IGNORECASE)
+LOSS_PATTERN = re.compile(r'\bloss[:=]\s*([0-9.]+(?:e[-+]?\d+)?)', re.IGNORECASE)
+
+FIELDS = ("step", "loss", "lr", "rate")
+MAX_POINTS = 4096
+METRICS_FILE = "metrics.json"
+SAVE_INTERVAL = 10.0
+
+def parse_metrics_line(line):
+    # Returns (step, loss, lr, it/s) with NaN for missing values, or None
+    step_match = STEP_PATTERN.search(line)
+    loss_match = LOSS_PATTERN.search(line)
+    if not step_match or not loss_match:
+        return None
+    lr_match = LR_PATTERN.search(line)
+    rate_match = RATE_PATTERN.search(line)
+    rate = math.nan
+    if rate_match:
+        rate = float(rate_match.group(1))
+        if rate_match.group(2) == 's/it' and rate > 0:
+            rate = 1.0 / rate
+    try:
+        return (int(step_match.group(1)), float(loss_match.group(1)),
+                float(lr_match.group(1)) if lr_match else math.nan, rate)
+    except ValueError:
+        return None
+
+def mean(values):
+    values = [value for value in values if not math.isnan(value)]
+    return sum(values) / len(values) if values else math.nan
+
+class MetricSeries:
+    # Per-run time series in flat float arrays, bounded to max_points: when
+    # full, neighbouring points are averaged pairwise and each new point then
+    # averages twice as many steps. Memory stays fixed however long the run.
+    def __init__(self, max_points=MAX_POINTS):
+        self.max_points = max_points
+        self.columns = {field: array('d') for field in FIELDS}
+        self.stride = 1  # Raw steps per stored point
+        self.pending = []  # Raw points not yet averaged into a stored point
+        self.last_step = -1
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.columns["step"])
+
+    def append(self, step, loss, lr, rate):
+        with self.lock:
+            # The progress bar redraws the same step many times
+            if step <= self.last_step:
+                return False
+            self.last_step = step
+            self.pending.append((step, loss, lr, rate))
+            if len(self.pending) >= self.stride:
+                self.store(self.pending)
+                self.pending = []
+                if len(self) >= self.max_points:
+                    self.compact()
+            return True
+
+    def store(self, points):
+        # A stored point carries the last step of the points it averages
+        self.columns["step"].append(points[-1][0])
+        for index, field in enumerate(FIELDS[1:], 1):
+            self.columns[field].append(mean([point[index] for point in points]))
+
+    def compact(self):
+        for field, column in self.columns.items():
+            merged = array('d')
+            for i in range(0, len(column) - 1, 2):
+                merged.append(column[i + 1] if field == "step" else mean(column[i:i + 2]))
+            if len(column) % 2:
+                merged.append(column[-1])
+            self.columns[field] = merged
+        self.stride *= 2
+
+    def snapshot(self):
+        # Copies for readers on other threads, e.g. the chart renderer
+        with self.lock:
+            return {field: array('d', column) for field, column in self.columns.items()}
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "stride": self.stride,
+                "last_step": self.last_step,
+                "pending": self.pending,
+                "series": {field: column.tolist() for field, column in self.columns.items()},
+            }
+
+    @classmethod
+    def from_dict(cls, data, max_points=MAX_POINTS):
+        series = cls(max_points)
+        series.stride = data.get("stride", 1)
+        series.last_step = data.get("last_step", -1)
+        series.pending = [tuple(point) for point in data.get("pending", [])]
+        for field in FIELDS:
+            series.columns[field] = array('d', data.get("series", {}).get(field, []))
+        return series
+
+def save_series(series, run_folder):
+    path = os.path.join(run_folder, METRICS_FILE)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w') as metrics_file:
+        json.dump(series.to_dict(), metrics_file)
+    os.replace(temp_path, path)
+
+def parse_log_file(log_path, series=None):
+    # Streams a whole log; text mode splits tqdm's \r updates into lines
+    series = series or MetricSeries()
+    with open(log_path, 'r', encoding='utf-8', errors='replace') as log_file:
+        for line in log_file:
+            metrics = parse_metrics_line(line)
+            if metrics:
+                series.append(*metrics)
+    return series
+
+def load_run_metrics(run_folder):
+    # Saved series when the monitor recorded one, otherwise parsed from training.log
+    path = os.path.join(run_folder, METRICS_FILE)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as metrics_file:
+                return MetricSeries.from_dict(json.load(metrics_file))
+        except (OSError, ValueError):
+            pass
+    log_path = os.path.join(run_folder, 'training.log')
+    if os.path.exists(log_path):
+        return parse_log_file(log_path)
+    return MetricSeries()
+
+class MetricsRecorder:
+    # Feeds tailed log lines into one series per run folder and saves them
+    # next to the run at most every save_interval seconds
+    def __init__(self, save_interval=SAVE_INTERVAL):
+        self.save_interval = save_interval
+        self.runs = {}
+        self.dirty = set()
+        self.last_save = time.monotonic()
+        self.lock = threading.Lock()
+
+    def series_for(self, run_folder):
+        with self.lock:
+            series = self.runs.get(run_folder)
+            if series is None:
+                series = load_run_metrics(run_folder)
+                self.runs[run_folder] = series
+            return series
+
+    def add_lines(self, run_folder, lines):
+        series = self.series_for(run_folder)
+        added = False
+        for line in lines:
+            metrics = parse_metrics_line(line)
+            if metrics and series.append(*metrics):
+                added = True
+        if added:
+            with self.lock:
+                self.dirty.add(run_folder)
+        if time.monotonic() - self.last_save >= self.save_interval:
+            self.save_dirty()
+        return added
+
+    def save_dirty(self):
+        with self.lock:
+            dirty = list(self.dirty)
+            self.dirty.clear()
+            self.last_save = time.monotonic()
+        for run_folder in dirty:
+            try:
+                save_series(self.runs[run_folder], run_folder)
+            except OSError:
+                pass  # Run folder removed; nothing left to persist
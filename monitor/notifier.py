@@ -0,0 +1,218 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import telegram
+import tracing
+from telegram.error import TelegramError
+from telegram.request import HTTPXRequest
+from monitor.rate_limit import RateLimiter, retry_after_seconds
+from monitor.image_pipeline import PreparedImage, format_bytes
+
+logger = logging.getLogger(__name__)
+
+MAX_RATE_LIMIT_RETRIES = 10
+
+# Send outcomes: RETRY means the notification should stay in the outbox
+SENT = "sent"
+RETRY = "retry"
+DROPPED = "dropped"
+CONNECTION_POOL_SIZE = 8  # Above the monitor's MAX_CONCURRENT_SENDS plus IPC test sends
+MAX_MEDIA_GROUP = 10  # Telegram's limit for sendMediaGroup
+
+@tracing.traced("upload.prepare")
+def load_upload(image_path, recompressor=None):
+    # Reads and (unless sending the original) re-encodes in a worker thread
+    with open(image_path, 'rb') as image_file:
+        image_data = image_file.read()
+    if not image_data:
+        return None
+    if recompressor is None:
+        return PreparedImage(image_data, os.path.basename(image_path), len(image_data))
+    return recompressor.prepare(image_path, image_data)
+
+def is_transient(error):
+    # Network trouble and rate limits pass; rejected requests never will
+    if isinstance(error, telegram.error.BadRequest):
+        return False
+    return isinstance(error, (telegram.error.NetworkError, telegram.error.RetryAfter, OSError))
+
+def send_outcome(error):
+    return RETRY if is_transient(error) else DROPPED
+
+class TelegramNotifier:
+    def __init__(self, token, chat_id, recompressor=None, send_originals=False, base_url=None):
+        self.token = token
+        self.chat_id = chat_id
+        # One pooled HTTP client for the notifier's lifetime, so concurrent sends
+        # reuse open connections instead of paying a TLS handshake each
+        request = HTTPXRequest(connection_pool_size=CONNECTION_POOL_SIZE)
+        # base_url lets a local Bot API stand-in (benchmarks/fake_bot_api.py) replace Telegram
+        if base_url:
+            self.bot = telegram.Bot(token=self.token, base_url=base_url, request=request)
+        else:
+            self.bot = telegram.Bot(token=self.token, request=request)
+        self.rate_limiter = RateLimiter()
+        self.recompressor = recompressor
+        self.send_originals = send_originals
+        self.upload_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upload")
+
+    async def start(self):
+        # Fetches the bot's identity once and opens the connection pool
+        await self.bot.initialize()
+
+    async def close(self):
+        await self.bot.shutdown()
+        self.upload_executor.shutdown(wait=False)
+
+    async def prepare_upload(self, image_path, as_document=False, recompress=True):
+        recompressor = self.recompressor if recompress and not as_document else None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.upload_executor, load_upload, image_path, recompressor)
+
+    def record_upload(self, prepared):
+        if self.recompressor and prepared.saved_bytes > 0:
+            self.recompressor.record_sent(prepared)
+            return f" ({format_bytes(prepared.original_size)} -> {format_bytes(len(prepared.data))}; {self.recompressor.summary()})"
+        return ""
+
+    async def call_api(self, method, chat_id=None, **kwargs):
+        # Waits for the chat's token bucket and backs off on 429 instead of dropping.
+        # chat_id overrides the default chat; the bot and its connections are shared.
+        chat_id = chat_id or self.chat_id
+        for attempt in range(MAX_RATE_LIMIT_RETRIES):
+            with tracing.span("telegram.rate_limit_wait"):
+                await self.rate_limiter.acquire(chat_id)
+            try:
+                with tracing.span(f"telegram.{method.__name__}"):
+                    return await method(chat_id=chat_id, **kwargs)
+            except telegram.error.RetryAfter as e:
+                seconds = retry_after_seconds(e)
+                logger.warning(f"Rate limited by Telegram, retrying in {seconds:.0f}s")
+                self.rate_limiter.retry_after(chat_id, seconds)
+                last_error = e
+        logger.error(f"Still rate limited after {MAX_RATE_LIMIT_RETRIES} attempts")
+        raise last_error
+
+    async def send_message(self, message, chat_id=None):
+        try:
+            await self.call_api(self.bot.send_message, chat_id, text=message)
+            logger.info(f"Message sent: {message}")
+            return SENT
+        except TelegramError as e:
+            logger.error(f"Failed to send message: {str(e)}")
+            return send_outcome(e)
+
+    async def send_media_group(self, image_paths, caption=None, as_document=None, chat_id=None):
+        as_document = self.send_originals if as_document is None else as_document
+        media_type = telegram.InputMediaDocument if as_document else telegram.InputMediaPhoto
+        prepared_images = await asyncio.gather(
+            *(self.prepare_upload(image_path, as_document) for image_path in image_paths),
+            return_exceptions=True)
+        readable = []
+        for image_path, prepared in zip(image_paths, prepared_images):
+            if prepared is None or isinstance(prepared, Exception):
+                logger.warning(f"Skipping unreadable image in group: {os.path.basename(image_path)}")
+                continue
+            readable.append((image_path, prepared))
+        if not readable:
+            return DROPPED
+        if len(readable) == 1:
+            # A media group needs at least two items
+            return await self.send_image(readable[0][0], caption, as_document=as_document, chat_id=chat_id)
+
+        # Telegram takes 2 to 10 items per group; larger sets are split evenly
+        # so no group is left with a single item. The caption goes on the first.
+        groups = -(-len(readable) // MAX_MEDIA_GROUP)
+        size, extra = divmod(len(readable), groups)
+        start = 0
+        for index in range(groups):
+            end = start + size + (1 if index < extra else 0)
+            outcome = await self.send_group([prepared for _, prepared in readable[start:end]], caption if index == 0 else None, media_type, chat_id)
+            if outcome != SENT:
+                return outcome
+            start = end
+        return SENT
+
+    async def send_group(self, uploads, caption, media_type, chat_id=None):
+        media = [media_type(media=prepared.data, filename=prepared.filename, caption=caption if index == 0 else None)
+                 for index, prepared in enumerate(uploads)]
+        try:
+            await self.call_api(self.bot.send_media_group, chat_id, media=media)
+            saved = ""
+            for prepared in uploads:
+                saved = self.record_upload(prepared) or saved
+            logger.info(f"Media group sent: {len(media)} images{saved}")
+            return SENT
+        except TelegramError as e:
+            logger.error(f"Failed to send media group: {str(e)}")
+            return send_outcome(e)
+
+    async def send_image(self, image_path, caption=None, max_retries=5, retry_delay=2, as_document=None, recompress=True, chat_id=None):
+        filename = os.path.basename(image_path)
+        as_document = self.send_originals if as_document is None else as_document
+        for attempt in range(max_retries):
+            try:
+                try:
+                    prepared = await self.prepare_upload(image_path, as_document, recompress)
+                except FileNotFoundError:
+                    logger.error(f"Image file not found: {filename}")
+                    return DROPPED
+
+                # The watcher only hands over complete files, so empty means gone wrong
+                if prepared is None:
+                    logger.error(f"Image file is empty: {filename}")
+                    return DROPPED
+
+                if as_document:
+                    await self.call_api(
+                        self.bot.send_document,
+                        chat_id,
+                        document=prepared.data,
+                        filename=prepared.filename,
+                        caption=f"{caption}\nFilename: {filename}"
+                    )
+                else:
+                    await self.call_api(
+                        self.bot.send_photo,
+                        chat_id,
+                        photo=prepared.data, 
+                        filename=prepared.filename,
+                        caption=f"{caption}\nFilename: {filename}"
+                    )
+                logger.info(f"Image sent: {filename}{self.record_upload(prepared)}")
+                return SENT
+            except PermissionError:
+                logger.warning(f"Permission denied for {filename}. Retrying...")
+                await asyncio.sleep(retry_delay)
+            except telegram.error.BadRequest as e:
+                if "File must be non-empty" in str(e):
+                    logger.warning(f"File {filename} is empty. Retrying...")
+                    await asyncio.sleep(retry_delay)
+                else:
+                    logger.error(f"Bad request error for {filename}: {str(e)}")
+                    return DROPPED
+            except Exception as e:
+                logger.error(f"Error sending image {filename}: {str(e)}")
+                return send_outcome(e)
+        
+        logger.error(f"Failed to send image after {max_retries} attempts: {filename}")
+        return RETRY
+
+async def send_test_message(token, chat_id, text, base_url=None, notifier=None):
+    # Returns (ok, error). Reuses notifier when it already holds these
+    # credentials, otherwise a short-lived one is set up for the test.
+    if notifier is None or notifier.token != token or str(notifier.chat_id) != str(chat_id):
+        test_notifier = TelegramNotifier(token, chat_id, base_url=base_url)
+    else:
+        test_notifier = notifier
+    try:
+        if test_notifier is not notifier:
+            await test_notifier.start()
+        await test_notifier.call_api(test_notifier.bot.send_message, text=text)
+        return True, None
+    except Exception as e:
+        return False, str(e)
+    finally:
+        if test_notifier is not notifier:
+            await test_notifier.close()
@@ -0,0 +1,130 @@
+import json
+import time
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTBOX_FILE = "notification_outbox.sqlite3"
+MAX_AGE = 3 * 24 * 3600  # Older entries are dropped rather than replayed
+RETRY_BASE_DELAY = 5.0
+RETRY_MAX_DELAY = 300.0
+MAX_MESSAGE_LENGTH = 4000  # Telegram allows 4096 characters
+MAX_CAPTION_LENGTH = 1000  # and 1024 for captions
+MAX_MEDIA_GROUP = 10
+
+class Outbox:
+    # SQLite journal of outgoing notifications. Entries are written before
+    # the send starts and deleted once it succeeded (or can never succeed),
+    # so whatever is left after a crash or outage is replayed on the next run.
+    # Use from the event loop thread only.
+    def __init__(self, path=DEFAULT_OUTBOX_FILE):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        # WAL with synchronous=NORMAL survives process kills at a fraction of the fsync cost
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, item TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, chat_id TEXT)")
+        # Outboxes from before per-root chats have no chat_id; NULL is the default chat
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(entries)")]
+        if "chat_id" not in columns:
+            self.connection.execute("ALTER TABLE entries ADD COLUMN chat_id TEXT")
+        self.connection.commit()
+
+    def add(self, item, chat_id=None):
+        now = time.time()
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO entries (created, item, next_attempt, chat_id) VALUES (?, ?, ?, ?)",
+                (now, json.dumps(list(item)), now, None if chat_id is None else str(chat_id)))
+        return cursor.lastrowid
+
+    def replace(self, entry_ids, item, chat_id=None):
+        # Swaps entries journaled on arrival for the one notification they were
+        # coalesced into, in one transaction
+        now = time.time()
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO entries (created, item, next_attempt, chat_id) VALUES (?, ?, ?, ?)",
+                (now, json.dumps(list(item)), now, None if chat_id is None else str(chat_id)))
+            self.connection.executemany("DELETE FROM entries WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+        return cursor.lastrowid
+
+    def ack(self, entry_ids):
+        with self.connection:
+            self.connection.executemany("DELETE FROM entries WHERE id = ?", [(entry_id,) for entry_id in entry_ids])
+
+    def defer(self, entry_ids):
+        # Exponential backoff per entry, capped at RETRY_MAX_DELAY
+        now = time.time()
+        with self.connection:
+            for entry_id in entry_ids:
+                self.connection.execute(
+                    "UPDATE entries SET attempts = attempts + 1, "
+                    "next_attempt = ? + MIN(?, ? * (1 << MIN(attempts, 16))) WHERE id = ?",
+                    (now, RETRY_MAX_DELAY, RETRY_BASE_DELAY, entry_id))
+
+    def due(self, exclude=()):
+        # [(id, item, chat id or None)] ready for another attempt, oldest first
+        now = time.time()
+        with self.connection:
+            expired = self.connection.execute("DELETE FROM entries WHERE created < ?", (now - MAX_AGE,)).rowcount
+        if expired:
+            logger.warning(f"Dropped {expired} notifications older than {MAX_AGE // 3600} hours")
+        rows = self.connection.execute(
+            "SELECT id, item, chat_id FROM entries WHERE next_attempt <= ? ORDER BY id", (now,)).fetchall()
+        return [(entry_id, tuple(json.loads(item)), chat_id) for entry_id, item, chat_id in rows if entry_id not in exclude]
+
+    def pending_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+def image_paths(item):
+    return [item[1]] if item[0] == 'image' else list(item[1])
+
+def batch_entries(entries):
+    # Turns a replayed backlog into few calls: all text in as few messages
+    # as fit, all sample images in media groups. Returns [(ids, item)].
+    batches = []
+    messages = []
+    groups = []  # [(ids, paths, captions)]; an entry is never split across groups
+    for entry_id, item in entries:
+        if item[0] == 'message':
+            messages.append((entry_id, item[1]))
+        elif item[0] in ('image', 'images'):
+            paths = image_paths(item)
+            if not groups or len(groups[-1][1]) + len(paths) > MAX_MEDIA_GROUP:
+                groups.append(([], [], []))
+            groups[-1][0].append(entry_id)
+            groups[-1][1].extend(paths)
+            if item[2] and item[2] not in groups[-1][2]:
+                groups[-1][2].append(item[2])
+        else:
+            batches.append(([entry_id], item))
+
+    for ids, paths, captions in groups:
+        if len(ids) > 1:
+            captions.insert(0, "Queued while offline:")
+        caption = "\n".join(captions)[:MAX_CAPTION_LENGTH]
+        if len(paths) == 1:
+            batches.append((ids, ('image', paths[0], caption)))
+        else:
+            batches.append((ids, ('images', paths, caption)))
+
+    chunks = []  # [(ids, lines)], each within one Telegram message
+    for entry_id, text in messages:
+        text = text[:MAX_MESSAGE_LENGTH]
+        if not chunks or len("\n".join(chunks[-1][1] + [text])) > MAX_MESSAGE_LENGTH:
+            chunks.append(([], []))
+        chunks[-1][0].append(entry_id)
+        chunks[-1][1].append(text)
+    for ids, lines in chunks:
+        if len(lines) > 1:
+            lines.insert(0, "Queued while offline:")
+        batches.append((ids, ('message', "\n".join(lines))))
+    return batches
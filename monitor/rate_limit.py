@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+# Telegram allows roughly one message per second per chat (short bursts are
+# tolerated) and about 30 per second across all chats for one bot
+PER_CHAT_RATE = 1.0
+PER_CHAT_BURST = 3
+GLOBAL_RATE = 30.0
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        # Seconds to wait before a token is available; takes the token when 0
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds):
+        # Honour a retry_after from the server, and start empty once it passes
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+        self.updated = self.blocked_until
+
+class RateLimiter:
+    def __init__(self, per_chat_rate=PER_CHAT_RATE, per_chat_burst=PER_CHAT_BURST, global_rate=GLOBAL_RATE):
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_buckets = {}
+
+    def bucket_for(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        return bucket
+
+    async def acquire(self, chat_id):
+        chat_bucket = self.bucket_for(chat_id)
+        while True:
+            delay = chat_bucket.delay()
+            if delay == 0:
+                break
+            await asyncio.sleep(delay)
+        while True:
+            delay = self.global_bucket.delay()
+            if delay == 0:
+                break
+            await asyncio.sleep(delay)
+
+    def retry_after(self, chat_id, seconds):
+        self.bucket_for(chat_id).pause(seconds)
+
+def retry_after_seconds(error):
+    # python-telegram-bot reports retry_after as int seconds or a timedelta
+    retry_after = error.retry_after
+    if hasattr(retry_after, 'total_seconds'):
+        return retry_after.total_seconds()
+    return float(retry_after)
@@ -0,0 +1,118 @@
+import os
+import fnmatch
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One monitor process watches any number of output folders. Each root has
+# its own routing: the chat its notifications go to (default: the configured
+# telegram_chat_id), a label prefixed to them, and which runs and kinds of
+# events it reports. Configured in ai_toolkit_helper_config.json as
+#
+#   "monitor_roots": [
+#       {"path": "C:/ai-toolkit", "label": "4090"},
+#       {"path": "E:/scratch/output", "label": "scratch", "chat_id": "-1001234",
+#        "runs": ["flux_*"], "exclude_runs": ["*_test"], "logs": false}
+#   ]
+#
+# A path may be an AI Toolkit folder or an output folder. Without
+# monitor_roots the single ai_toolkit_folder is watched as before.
+
+class MonitorRoot:
+    def __init__(self, path, label=None, chat_id=None, runs=None, exclude_runs=None, logs=True, samples=True):
+        self.output_folder = output_folder_for(path)
+        self.label = label
+        self.chat_id = chat_id
+        self.runs = runs or ["*"]
+        self.exclude_runs = exclude_runs or []
+        self.logs = logs
+        self.samples = samples
+
+    def run_name(self, path):
+        relative = os.path.relpath(path, self.output_folder)
+        run = relative.split(os.sep, 1)[0]
+        if run in (".", "..") or relative.startswith(".."):
+            return None
+        return run
+
+    def notifies(self, path, kind):
+        # kind is "logs" or "samples"
+        if not getattr(self, kind):
+            return False
+        run = self.run_name(path)
+        if run is None:
+            return False
+        return (any(fnmatch.fnmatchcase(run, pattern) for pattern in self.runs) and
+                not any(fnmatch.fnmatchcase(run, pattern) for pattern in self.exclude_runs))
+
+AI_TOOLKIT_MARKERS = ("run.py", "toolkit")
+
+def output_folder_for(path):
+    # An AI Toolkit checkout is always watched through its output folder,
+    # even before the first run creates it; any other path is the output folder
+    output_folder = os.path.join(path, "output")
+    if os.path.isdir(output_folder):
+        return os.path.normpath(output_folder)
+    if any(os.path.exists(os.path.join(path, marker)) for marker in AI_TOOLKIT_MARKERS):
+        logger.warning(f"AI Toolkit output folder does not exist yet: {output_folder}")
+        return os.path.normpath(output_folder)
+    return os.path.normpath(path)
+
+def load_roots(config):
+    entries = config.get("monitor_roots") or []
+    if not entries and config.get("ai_toolkit_folder"):
+        entries = [{"path": config["ai_toolkit_folder"]}]
+    roots = []
+    seen = set()
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        root = MonitorRoot(entry["path"], entry.get("label"), entry.get("chat_id"), entry.get("runs"),
+                           entry.get("exclude_runs"), entry.get("logs", True), entry.get("samples", True))
+        key = os.path.normcase(root.output_folder)
+        if key in seen:
+            logger.warning(f"Output folder listed twice in monitor_roots: {root.output_folder}")
+            continue
+        seen.add(key)
+        roots.append(root)
+    # With several roots every notification needs to say where it came from
+    if len(roots) > 1:
+        for root in roots:
+            if not root.label:
+                parent, name = os.path.split(root.output_folder)
+                root.label = os.path.basename(parent) if name == "output" else name
+    return roots
+
+class RootRouter:
+    # Maps event paths to their root; nested roots resolve to the innermost
+    def __init__(self, roots):
+        self.roots = sorted(roots, key=lambda root: len(root.output_folder), reverse=True)
+
+    def root_for(self, path):
+        if not path:
+            return None
+        path = os.path.normcase(os.path.normpath(path))
+        for root in self.roots:
+            folder = os.path.normcase(root.output_folder)
+            if path == folder or path.startswith(folder + os.sep):
+                return root
+        return None
+
+def item_source(item):
+    # Path that decides the route of an item submitted without one (e.g. over IPC)
+    if item[0] in ('chart', 'document', 'image'):
+        return item[1]
+    if item[0] in ('images', 'contact_sheet') and item[1]:
+        return item[1][0]
+    return None
+
+def label_item(item, label):
+    # Prefixes the message text or caption with the root's label
+    if not label:
+        return item
+    if item[0] == 'message':
+        return ('message', f"[{label}] {item[1]}")
+    caption = item[2] if len(item) > 2 else None
+    if item[0] == 'chart' and not caption:
+        caption = f"Loss chart for {os.path.basename(os.path.normpath(item[1]))}"
+    return (item[0], item[1], f"[{label}] {caption}" if caption else f"[{label}]") + tuple(item[3:])
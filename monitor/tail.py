@@ -0,0 +1,86 @@
+import os
+import threading
+
+HEAD_FINGERPRINT_BYTES = 64
+
+class FollowedFile:
+    def __init__(self, path, offset, file_id):
+        self.path = path
+        self.offset = offset
+        self.file_id = file_id
+        self.partial = b''
+        self.head = b''  # First bytes of the file, to spot rotation when inodes get reused
+
+def file_identity(stat):
+    return (stat.st_dev, stat.st_ino)
+
+def split_lines(data):
+    # Returns (complete lines, trailing partial line). tqdm progress bars
+    # rewrite the line with "\r", so treat it as a line end too.
+    lines = data.replace(b'\r', b'\n').split(b'\n')
+    return lines[:-1], lines[-1]
+
+class LogTailer:
+    def __init__(self, max_read=4 * 1024 * 1024):
+        self.files = {}
+        self.max_read = max_read
+        self.lock = threading.Lock()
+
+    def follow(self, path, from_end=True):
+        # Existing logs start at their end so history isn't replayed on startup
+        with self.lock:
+            if path in self.files:
+                return
+            try:
+                stat = os.stat(path)
+                with open(path, 'rb') as f:
+                    head = f.read(HEAD_FINGERPRINT_BYTES) if from_end else b''
+            except FileNotFoundError:
+                self.files[path] = FollowedFile(path, 0, None)
+                return
+            followed = FollowedFile(path, len(head) if not from_end else stat.st_size, file_identity(stat))
+            followed.head = head[:followed.offset]
+            self.files[path] = followed
+
+    def forget(self, path):
+        with self.lock:
+            self.files.pop(path, None)
+
+    def read_new_lines(self, path):
+        # Reads only bytes appended since the last call; each complete line is returned once
+        with self.lock:
+            followed = self.files.get(path)
+            if followed is None:
+                # First sighting after startup: the file is new, read it from the start
+                followed = self.files[path] = FollowedFile(path, 0, None)
+
+            try:
+                stat = os.stat(path)
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                return []
+
+            with f:
+                # followed.head always holds the first min(offset, 64) bytes already consumed
+                identity = file_identity(stat)
+                replaced = followed.file_id is not None and identity != followed.file_id
+                if followed.head and f.read(len(followed.head)) != followed.head:
+                    replaced = True  # Same inode reused for a new file, or rewritten in place
+                if replaced or stat.st_size < followed.offset:
+                    # Rotated or truncated: start over from the beginning
+                    followed.offset = 0
+                    followed.partial = b''
+                    followed.head = b''
+                followed.file_id = identity
+
+                if stat.st_size == followed.offset:
+                    return []
+                f.seek(followed.offset)
+                data = f.read(self.max_read)
+
+            if len(followed.head) < HEAD_FINGERPRINT_BYTES:
+                followed.head = (followed.head + data)[:HEAD_FINGERPRINT_BYTES]
+            followed.offset += len(data)
+
+            lines, followed.partial = split_lines(followed.partial + data)
+            return [line.decode('utf-8', errors='replace').strip() for line in lines if line.strip()]
@@ -0,0 +1,150 @@
+import os
+import asyncio
+import fnmatch
+import logging
+import time
+from collections import OrderedDict
+from watchdog.events import FileSystemEventHandler
+
+logger = logging.getLogger(__name__)
+
+IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg', '*.webp')
+LOG_PATTERNS = ('training.log',)
+# Checkpoints, optimizer state and caches are large, frequent writes we never notify about
+# loss_chart.png is rendered into the run folder by monitor/charts.py, not by training
+IGNORED_PATTERNS = ('*.safetensors', '*.ckpt', '*.pt', '*.pth', '*.bin', '*.npz', '*.tmp', '*.part', 'loss_chart.png')
+STABILITY_INTERVAL = 0.5
+STABILITY_TIMEOUT = 300
+RECENTLY_READY_LIMIT = 1000
+
+def matches(path, patterns):
+    name = os.path.basename(path).lower()
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+def is_image(path):
+    return matches(path, IMAGE_PATTERNS)
+
+class FilteredEventHandler(FileSystemEventHandler):
+    # Drops irrelevant file events in dispatch(), before any on_* handler runs
+    relevant_patterns = IMAGE_PATTERNS + LOG_PATTERNS
+    ignored_patterns = IGNORED_PATTERNS
+
+    def dispatch(self, event):
+        if not event.is_directory:
+            paths = [event.src_path, getattr(event, 'dest_path', '') or '']
+            paths = [path for path in paths if path and not matches(path, self.ignored_patterns)]
+            if not any(matches(path, self.relevant_patterns) for path in paths):
+                return
+        super().dispatch(event)
+
+class OutputWatchManager:
+    # Watches output/, each run folder and its samples folder non-recursively,
+    # so writes anywhere deeper in the tree never wake the monitor
+    def __init__(self, observer, handler, output_folder):
+        self.observer = observer
+        self.handler = handler
+        self.output_folder = os.path.normpath(output_folder)
+        self.watched = set()
+
+    def watch_folder(self, path):
+        path = os.path.normpath(path)
+        if path in self.watched or not os.path.isdir(path):
+            return False
+        self.observer.schedule(self.handler, path, recursive=False)
+        self.watched.add(path)
+        return True
+
+    def start(self):
+        self.watch_folder(self.output_folder)
+        with os.scandir(self.output_folder) as it:
+            for entry in it:
+                if entry.is_dir():
+                    self.watch_run(entry.path)
+
+    def watch_run(self, run_path):
+        self.watch_folder(run_path)
+        self.watch_folder(os.path.join(run_path, 'samples'))
+
+    def folder_created(self, path):
+        # Returns images that were written before the new watch was in place
+        path = os.path.normpath(path)
+        parent = os.path.dirname(path)
+        if parent == self.output_folder:
+            self.watch_run(path)
+        elif os.path.basename(path) == 'samples' and os.path.dirname(parent) == self.output_folder:
+            self.watch_folder(path)
+        else:
+            return []
+        samples = path if os.path.basename(path) == 'samples' else os.path.join(path, 'samples')
+        if not os.path.isdir(samples):
+            return []
+        with os.scandir(samples) as it:
+            return [entry.path for entry in it if entry.is_file() and is_image(entry.path)]
+
+class PendingFile:
+    def __init__(self):
+        self.first_seen = time.monotonic()
+        self.last_stat = None
+
+def stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+class FileStabilityTracker:
+    # Decides when a written file is complete: immediately on close-after-write
+    # where the platform reports it (inotify), otherwise once size and mtime
+    # are unchanged across two checks. Use from the event loop thread.
+    def __init__(self, on_ready, interval=STABILITY_INTERVAL, timeout=STABILITY_TIMEOUT):
+        self.on_ready = on_ready
+        self.interval = interval
+        self.timeout = timeout
+        self.pending = {}
+        self.recently_ready = OrderedDict()  # path -> signature it was reported with
+        self.wakeup = asyncio.Event()
+
+    def written(self, path):
+        if path not in self.pending:
+            self.pending[path] = PendingFile()
+        self.wakeup.set()
+
+    def closed(self, path):
+        self.pending.pop(path, None)
+        signature = stat_signature(path)
+        if signature and signature[0] > 0:
+            self.ready(path, signature)
+
+    def ready(self, path, signature):
+        # The close event and the stability check can both fire for one write
+        if self.recently_ready.get(path) == signature:
+            return
+        self.recently_ready[path] = signature
+        self.recently_ready.move_to_end(path)
+        if len(self.recently_ready) > RECENTLY_READY_LIMIT:
+            self.recently_ready.popitem(last=False)
+        self.on_ready(path)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            await asyncio.sleep(self.interval)
+            paths = list(self.pending)
+            signatures = await loop.run_in_executor(None, lambda: [stat_signature(path) for path in paths])
+            now = time.monotonic()
+            for path, signature in zip(paths, signatures):
+                pending = self.pending.get(path)
+                if pending is None:
+                    continue  # Closed while we were checking
+                if signature is None or now - pending.first_seen > self.timeout:
+                    del self.pending[path]
+                    logger.warning(f"Gave up waiting for {os.path.basename(path)} to finish writing")
+                elif signature[0] > 0 and signature == pending.last_stat:
+                    del self.pending[path]
+                    self.ready(path, signature)
+                else:
+                    pending.last_stat = signature
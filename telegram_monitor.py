@@ -1,13 +1,21 @@
 import os
 import json
+import signal
 import asyncio
 import logging
-import time
-from queue import Queue, Empty
-import telegram
-from telegram.error import TelegramError
+import tracing
 from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+from monitor.tail import LogTailer
+from monitor.coalescer import NotificationCoalescer
+from monitor.watcher import FilteredEventHandler, OutputWatchManager, FileStabilityTracker, is_image
+from monitor.image_pipeline import ImageRecompressor, DEFAULT_MAX_EDGE, DEFAULT_FORMAT, DEFAULT_QUALITY
+from monitor.notifier import TelegramNotifier, send_test_message, RETRY, DROPPED
+from monitor.outbox import Outbox, batch_entries
+from monitor.metrics import MetricsRecorder
+from monitor.charts import render_run_chart
+from monitor.contact_sheet import ContactSheetBuilder
+from monitor.ipc import NotificationServer, DEFAULT_PORT, SECRET_KEY
+from monitor.roots import load_roots, RootRouter, item_source, label_item
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
@@ -18,79 +26,117 @@ logging.getLogger('telegram').setLevel(logging.WARNING)
 logging.getLogger('httpx').setLevel(logging.WARNING)
 
 CONFIG_FILE = "ai_toolkit_helper_config.json"
+MAX_CONCURRENT_SENDS = 4
+REPLAY_INTERVAL = 15.0
 
-class TelegramNotifier:
-    def __init__(self, token, chat_id):
-        self.token = token
-        self.chat_id = chat_id
-        self.bot = telegram.Bot(token=self.token)
+class OutputFolderHandler(FilteredEventHandler):
+    # One handler, tailer and metrics recorder for every root; events are
+    # matched to their root by path and dropped if its filters exclude them
+    def __init__(self, loop, queue, router, observer=None):
+        self.loop = loop
+        self.queue = queue
+        self.router = router
+        self.observer = observer
+        self.tailer = LogTailer()
+        self.metrics = MetricsRecorder()
+        self.watches = {}  # root -> OutputWatchManager
+        self.awaiting = {}  # normcased output folder -> root whose output folder does not exist yet
+        for root in router.roots:
+            if os.path.isdir(root.output_folder):
+                # Logs that already exist are followed from their current end
+                for log_file in find_training_logs(root.output_folder):
+                    self.tailer.follow(log_file, from_end=True)
 
-    async def send_message(self, message):
-        try:
-            await self.bot.send_message(chat_id=self.chat_id, text=message)
-            logger.info(f"Message sent: {message}")
-        except TelegramError as e:
-            logger.error(f"Failed to send message: {str(e)}")
-
-    async def send_image(self, image_path, caption=None, max_retries=5, retry_delay=2, min_file_size=100):
-        filename = os.path.basename(image_path)
-        for attempt in range(max_retries):
-            try:
-                if not os.path.exists(image_path):
-                    logger.error(f"Image file not found: {filename}")
-                    return
-                
-                # Check file size and wait if it's too small
-                file_size = os.path.getsize(image_path)
-                if file_size < min_file_size:
-                    logger.info(f"File {filename} is too small ({file_size} bytes). Waiting...")
-                    await asyncio.sleep(retry_delay)
-                    continue
-
-                with open(image_path, 'rb') as image_file:
-                    await self.bot.send_photo(
-                        chat_id=self.chat_id, 
-                        photo=image_file, 
-                        caption=f"{caption}\nFilename: {filename}"
-                    )
-                logger.info(f"Image sent: {filename}")
-                return
-            except PermissionError:
-                logger.warning(f"Permission denied for {filename}. Retrying...")
-                await asyncio.sleep(retry_delay)
-            except telegram.error.BadRequest as e:
-                if "File must be non-empty" in str(e):
-                    logger.warning(f"File {filename} is empty. Retrying...")
-                    await asyncio.sleep(retry_delay)
-                else:
-                    logger.error(f"Bad request error for {filename}: {str(e)}")
-                    break
-            except Exception as e:
-                logger.error(f"Error sending image {filename}: {str(e)}")
-                break
-        
-        logger.error(f"Failed to send image after {max_retries} attempts: {filename}")
+    def notifies(self, path, kind):
+        root = self.router.root_for(path)
+        return root is not None and root.notifies(path, kind)
 
-class OutputFolderHandler(FileSystemEventHandler):
-    def __init__(self, queue):
-        self.queue = queue
+    def watch_root(self, root):
+        # Until the output folder exists, its parent is watched for it to appear
+        if os.path.isdir(root.output_folder):
+            self.watches[root] = OutputWatchManager(self.observer, self, root.output_folder)
+            self.watches[root].start()
+            logger.info(f"Monitoring started for folder: {root.output_folder}" + (f" ({root.label})" if root.label else ""))
+            return True
+        parent = os.path.dirname(root.output_folder)
+        if not os.path.isdir(parent):
+            logger.error(f"Output folder not found: {root.output_folder}")
+            return False
+        self.awaiting[os.path.normcase(root.output_folder)] = root
+        self.observer.schedule(self, parent, recursive=False)
+        logger.info(f"Waiting for output folder to be created: {root.output_folder}")
+        # It may have appeared before the watch was in place
+        self.output_folder_created(root.output_folder)
+        return True
+
+    def output_folder_created(self, path):
+        root = self.awaiting.get(os.path.normcase(os.path.normpath(path)))
+        if root is not None and os.path.isdir(root.output_folder):
+            del self.awaiting[os.path.normcase(root.output_folder)]
+            self.watch_root(root)
 
     def on_created(self, event):
-        if not event.is_directory and event.src_path.lower().endswith(('.png', '.jpg', '.jpeg')):
-            filename = os.path.basename(event.src_path)
-            logger.info(f"Image detected: {filename}")
-            self.queue.put(('image', event.src_path, "New image generated"))
+        if event.is_directory:
+            self.output_folder_created(event.src_path)
+            watches = self.watches.get(self.router.root_for(event.src_path))
+            if watches:
+                for image_path in watches.folder_created(event.src_path):
+                    self.publish_image('file_written', image_path)
+        elif is_image(event.src_path):
+            self.publish_image('file_written', event.src_path)
 
     def on_modified(self, event):
         if event.is_directory:
             log_file = os.path.join(event.src_path, 'training.log')
-            if os.path.exists(log_file):
-                with open(log_file, 'r') as f:
-                    lines = f.readlines()
-                    if lines:
-                        last_line = lines[-1].strip()
-                        logger.info(f"Log update: {last_line}")
-                        self.queue.put(('message', f"Training update: {last_line}"))
+        elif is_image(event.src_path):
+            self.publish_image('file_written', event.src_path)
+            return
+        else:
+            log_file = event.src_path
+        if os.path.exists(log_file):
+            self.forward_log_lines(log_file)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            self.output_folder_created(event.dest_path)
+        # Writers that save to a temp name and rename produce a complete file
+        elif is_image(event.dest_path):
+            self.publish_image('file_closed', event.dest_path)
+
+    def on_closed(self, event):
+        # Close-after-write, reported by inotify on Linux
+        if is_image(event.src_path):
+            self.publish_image('file_closed', event.src_path)
+
+    def publish_image(self, kind, image_path):
+        if self.notifies(image_path, "samples"):
+            self.publish((kind, image_path))
+
+    def publish(self, item):
+        # Watchdog calls handlers on its own thread; hand items to the event loop
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    def forward_log_lines(self, log_file):
+        with tracing.span("log.read"):
+            lines = self.tailer.read_new_lines(log_file)
+        if lines:
+            # Every line feeds the run's loss/lr/speed series
+            with tracing.span("metrics.parse", lines=len(lines)):
+                self.metrics.add_lines(os.path.dirname(log_file), lines)
+            # Only the newest line is worth a notification
+            last_line = lines[-1]
+            logger.info(f"Log update: {last_line}")
+            if self.notifies(log_file, "logs"):
+                self.publish(('log', log_file, last_line))
+
+def find_training_logs(output_folder):
+    logs = []
+    with os.scandir(output_folder) as it:
+        for entry in it:
+            log_file = os.path.join(entry.path, 'training.log')
+            if entry.is_dir() and os.path.exists(log_file):
+                logs.append(log_file)
+    return logs
 
 def load_config():
     if os.path.exists(CONFIG_FILE):
@@ -98,60 +144,250 @@ def load_config():
             return json.load(config_file)
     return {}
 
-async def process_queue(queue, notifier):
-    empty_queue_message_interval = 60
-    last_empty_message_time = 0
+async def send_chart(notifier, run_folder, caption, metrics=None, chat_id=None):
+    loop = asyncio.get_running_loop()
+    chart_path = await loop.run_in_executor(None, render_run_chart, run_folder, metrics)
+    run_name = os.path.basename(os.path.normpath(run_folder))
+    if chart_path:
+        return await notifier.send_image(chart_path, caption or f"Loss chart for {run_name}", chat_id=chat_id)
+    return await notifier.send_message(f"No training metrics recorded yet for {run_name}", chat_id)
 
-    while True:
+async def send_contact_sheet(notifier, image_paths, caption, sheets=None, chat_id=None):
+    # Originals mode and disabled sheets (e.g. replayed from the outbox) fall back to plain uploads
+    if sheets is not None and not notifier.send_originals and (len(image_paths) > 1 or sheets.history):
+        loop = asyncio.get_running_loop()
         try:
-            item = queue.get(block=True, timeout=1)
-            if item[0] == 'message':
-                await notifier.send_message(item[1])
-            elif item[0] == 'image':
-                await notifier.send_image(item[1], item[2])
-        except Empty:
-            current_time = time.time()
-            if current_time - last_empty_message_time > empty_queue_message_interval:
-                logger.debug("Queue empty for the last minute.")
-                last_empty_message_time = current_time
+            sheet_path = await loop.run_in_executor(None, sheets.build, image_paths)
+            try:
+                # The sheet is already a sized JPEG; another re-encode would only blur the labels
+                return await notifier.send_image(sheet_path, caption, recompress=False, chat_id=chat_id)
+            finally:
+                # A retry rebuilds the sheet from the samples, so it is never kept
+                try:
+                    os.remove(sheet_path)
+                except OSError:
+                    pass
         except Exception as e:
-            logger.error(f"Error processing queue item: {str(e)}")
-        
-        await asyncio.sleep(0.1)
+            logger.error(f"Contact sheet failed, sending images separately: {str(e)}")
+    if len(image_paths) == 1:
+        return await notifier.send_image(image_paths[0], caption, chat_id=chat_id)
+    return await notifier.send_media_group(image_paths, caption, chat_id=chat_id)
+
+async def send_item(notifier, item, metrics=None, sheets=None, chat_id=None):
+    # Returns the notifier's outcome: SENT, RETRY or DROPPED. chat_id None
+    # is the notifier's default chat.
+    if item[0] == 'message':
+        return await notifier.send_message(item[1], chat_id)
+    if item[0] == 'image':
+        return await notifier.send_image(item[1], item[2], chat_id=chat_id)
+    if item[0] == 'images':
+        return await notifier.send_media_group(item[1], item[2], chat_id=chat_id)
+    if item[0] == 'document':
+        return await notifier.send_image(item[1], item[2], as_document=True, chat_id=chat_id)
+    if item[0] == 'chart':
+        return await send_chart(notifier, item[1], item[2], metrics, chat_id)
+    if item[0] == 'contact_sheet':
+        return await send_contact_sheet(notifier, item[1], item[2], sheets, chat_id)
+    logger.error(f"Unknown notification type: {item[0]}")
+    return DROPPED
+
+async def process_queue(queue, notifier, max_concurrent_sends=MAX_CONCURRENT_SENDS, metrics=None, outbox=None, sheets=None,
+                        router=None, **coalescer_options):
+    # Items are coalesced first; resulting sends run as concurrent tasks,
+    # at most max_concurrent_sends at a time. With an outbox, log lines and
+    # images are journaled as they arrive, replaced by what they coalesce into,
+    # and removed only once that is delivered.
+    # With a router, each send goes to its root's chat with its root's label.
+    semaphore = asyncio.Semaphore(max_concurrent_sends)
+    pending = set()
+    in_flight = set()  # Outbox entry ids being coalesced or sent; replay skips them
+    state = {"online": True}
+
+    async def deliver(entry_ids, item, chat_id=None):
+        async with semaphore:
+            try:
+                with tracing.span(f"notify.{item[0]}"):
+                    outcome = await send_item(notifier, item, metrics, sheets, chat_id)
+            except Exception as e:
+                logger.error(f"Error processing queue item: {str(e)}")
+                outcome = RETRY
+        state["online"] = outcome != RETRY
+        if outbox is not None:
+            in_flight.difference_update(entry_ids)
+            if outcome == RETRY:
+                outbox.defer(entry_ids)
+            else:
+                outbox.ack(entry_ids)
+        return outcome
+
+    def route(item, source=None):
+        root = router.root_for(source or item_source(item)) if router else None
+        if root:
+            return label_item(item, root.label), root.chat_id
+        return item, None
+
+    def journal(item):
+        # What a crash inside a coalescing window would otherwise lose, stored
+        # in the form a replay can send; returns the entry id or None
+        if outbox is None or item[0] not in ('log', 'image'):
+            return None
+        source = item[1]
+        if item[0] == 'log':
+            item = ('message', f"Training update: {item[2]}")
+        item, chat_id = route(item, source)
+        with tracing.span("outbox.write"):
+            entry_id = outbox.add(item, chat_id)
+        in_flight.add(entry_id)
+        return entry_id
+
+    def dispatch(item, source=None, journaled=()):
+        item, chat_id = route(item, source)
+        entry_ids = []
+        if outbox is not None:
+            with tracing.span("outbox.write"):
+                entry_ids = [outbox.replace(journaled, item, chat_id)]
+            in_flight.difference_update(journaled)
+        # While offline, new items wait in the outbox for the next batched replay
+        if outbox is not None and not state["online"]:
+            return
+        in_flight.update(entry_ids)
+        task = asyncio.create_task(deliver(entry_ids, item, chat_id))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    async def replay():
+        # Sends what is left from earlier runs and outages as coalesced batches,
+        # never combining entries meant for different chats
+        while True:
+            entries = outbox.due(exclude=in_flight)
+            if entries:
+                by_chat = {}
+                for entry_id, item, chat_id in entries:
+                    by_chat.setdefault(chat_id, []).append((entry_id, item))
+                batches = [(entry_ids, item, chat_id) for chat_id, chat_entries in by_chat.items()
+                           for entry_ids, item in batch_entries(chat_entries)]
+                logger.info(f"Replaying {len(entries)} queued notifications in {len(batches)} sends")
+                for index, (entry_ids, item, chat_id) in enumerate(batches):
+                    in_flight.update(entry_ids)
+                    if await deliver(entry_ids, item, chat_id) == RETRY:
+                        # Still offline; the rest backs off along with this batch
+                        outbox.defer([entry_id for ids, _, _ in batches[index + 1:] for entry_id in ids])
+                        break
+            await asyncio.sleep(REPLAY_INTERVAL)
+
+    coalescer = NotificationCoalescer(dispatch, contact_sheets=sheets is not None, **coalescer_options)
+
+    def image_ready(image_path):
+        logger.info(f"Image detected: {os.path.basename(image_path)}")
+        item = ('image', image_path, "New image generated")
+        coalescer.add(item, journal(item))
+
+    tracker = FileStabilityTracker(image_ready)
+    tracker_task = asyncio.create_task(tracker.run())
+    replay_task = asyncio.create_task(replay()) if outbox is not None else None
+    try:
+        while True:
+            item = await queue.get()
+            if item[0] == 'file_written':
+                tracker.written(item[1])
+            elif item[0] == 'file_closed':
+                tracker.closed(item[1])
+            else:
+                coalescer.add(item, journal(item))
+            queue.task_done()
+    finally:
+        tracker_task.cancel()
+        if replay_task:
+            replay_task.cancel()
+        coalescer.flush_all()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
 
 async def main():
     config = load_config()
+    tracing.configure(config, "monitor")
     token = config.get("telegram_bot_token")
     chat_id = config.get("telegram_chat_id")
-    ai_toolkit_folder = config.get("ai_toolkit_folder")
+    roots = load_roots(config)
+    base_url = config.get("telegram_api_base_url")
 
-    if not token or not chat_id or not ai_toolkit_folder:
+    if not token or not chat_id or not roots:
         logger.error("Telegram bot token, chat ID, or AI Toolkit folder not set in config file.")
         return
 
-    notifier = TelegramNotifier(token, chat_id)
+    recompressor = ImageRecompressor(
+        max_edge=int(config.get("telegram_image_max_edge", DEFAULT_MAX_EDGE)),
+        image_format=config.get("telegram_image_format", DEFAULT_FORMAT),
+        quality=int(config.get("telegram_image_quality", DEFAULT_QUALITY)),
+    )
+    # This process is the app's single notifier: the bot and its connection
+    # pool live as long as the monitor, and the GUI submits through IPC
+    notifier = TelegramNotifier(token, chat_id, recompressor, config.get("telegram_send_originals", False), base_url)
+    await notifier.start()
+    sheets = None
+    if config.get("telegram_contact_sheets", True):
+        sheets = ContactSheetBuilder(history=int(config.get("telegram_contact_sheet_history", 0)))
 
-    output_folder = os.path.join(ai_toolkit_folder, "output")
-    if not os.path.exists(output_folder):
-        logger.error(f"Output folder not found: {output_folder}")
-        return
+    queue = asyncio.Queue()
+    outbox = Outbox()
+    if outbox.pending_count():
+        logger.info(f"{outbox.pending_count()} notifications left from an earlier run will be replayed")
+
+    # stop_telegram_monitoring terminates this process; on POSIX that becomes
+    # a cancellation so queued items are flushed into the outbox first
+    main_task = asyncio.current_task()
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, main_task.cancel)
+    except (NotImplementedError, RuntimeError):
+        pass  # Not on Windows; unacknowledged entries are still replayed on the next start
 
-    queue = Queue()
-    event_handler = OutputFolderHandler(queue)
+    async def run_test(request):
+        return await send_test_message(request.get("token"), request.get("chat_id"),
+                                       request.get("text") or "Test message from AI Toolkit Helper!",
+                                       base_url, notifier)
+
+    # Files are only sent from the watched output folders and the configured dataset folders.
+    # The GUI creates the secret; without one the service is not offered.
+    allowed_folders = [root.output_folder for root in roots] + list(config.get("dataset_roots") or [])
+    server = None
+    if config.get(SECRET_KEY):
+        server = NotificationServer(queue.put_nowait, config[SECRET_KEY], allowed_folders, run_test,
+                                    port=int(config.get("notifier_port", DEFAULT_PORT)))
+        try:
+            await server.start()
+        except OSError as e:
+            logger.error(f"Notifier service port unavailable, only the output folder is monitored: {str(e)}")
+            server = None
+    else:
+        logger.error(f"No {SECRET_KEY} in {CONFIG_FILE}; open the Settings tab once to create it. Only the output folder is monitored.")
+
+    # Every root shares one observer, handler, queue, outbox and bot, so
+    # adding a root only adds its watches. The service keeps running for IPC
+    # even when there is nothing to watch yet.
+    router = RootRouter(roots)
     observer = Observer()
-    observer.schedule(event_handler, output_folder, recursive=True)
-    observer.start()
+    event_handler = OutputFolderHandler(asyncio.get_running_loop(), queue, router, observer)
+    watching = [root for root in roots if event_handler.watch_root(root)]
+    if watching:
+        observer.start()
 
-    logger.info(f"Monitoring started for folder: {output_folder}")
     await notifier.send_message("Telegram monitor started")
 
     try:
-        await process_queue(queue, notifier)
-    except KeyboardInterrupt:
-        observer.stop()
+        await process_queue(queue, notifier, metrics=event_handler.metrics, outbox=outbox, sheets=sheets, router=router)
     finally:
-        observer.join()
+        if server:
+            await server.stop()
+        if observer.is_alive():
+            observer.stop()
+            observer.join()
+        event_handler.metrics.save_dirty()
         await notifier.send_message("Telegram monitor stopped")
+        await notifier.close()
+        outbox.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    except asyncio.CancelledError:
+        pass  # Stopped by SIGTERM
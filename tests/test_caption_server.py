@@ -0,0 +1,43 @@
+import asyncio
+import unittest
+from caption_server import CaptionBatcher
+
+class FakeCaptioner:
+    def __init__(self):
+        self.calls = []
+
+    def caption_images(self, images, detail_level, profile):
+        self.calls.append(list(images))
+        return [f"caption of {image}" for image in images]
+
+class CaptionBatcherTest(unittest.TestCase):
+    def test_run_survives_every_client_leaving_during_the_wait(self):
+        async def scenario():
+            captioner = FakeCaptioner()
+            batcher = CaptionBatcher(captioner, max_batch=8, max_wait=0.2)
+            runner = asyncio.ensure_future(batcher.run())
+            try:
+                # Every client disconnects while the batch is still filling; the
+                # last arrival wakes the batcher, which then finds nothing waiting
+                clients = [asyncio.ensure_future(batcher.caption(f"image {i}", "Short")) for i in range(2)]
+                await asyncio.sleep(0.05)
+                for client in clients:
+                    client.cancel()
+                late_client = asyncio.ensure_future(batcher.caption("late image", "Short"))
+                await asyncio.sleep(0)
+                late_client.cancel()
+                await asyncio.sleep(0.3)
+                self.assertFalse(runner.done())
+
+                # The batcher still serves the next client
+                caption = await asyncio.wait_for(batcher.caption("image 2", "Short"), 2)
+                self.assertEqual(caption, "caption of image 2")
+                self.assertEqual(captioner.calls, [["image 2"]])
+            finally:
+                runner.cancel()
+                batcher.close()
+
+        asyncio.run(scenario())
+
+if __name__ == "__main__":
+    unittest.main()
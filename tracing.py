@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import atexit
+import asyncio
+import functools
+import threading
+from collections import deque, Counter
+
+# Lightweight spans for the GUI and the Telegram monitor. Disabled, span()
+# returns a shared no-op, so instrumented code pays one call and a flag
+# check. Enabled, finished spans are kept in memory and written on exit (or
+# by save()) as Chrome trace-event JSON (open in chrome://tracing or
+# https://ui.perfetto.dev) plus a per-span summary.
+#
+#   AI_TOOLKIT_HELPER_TRACE=1    enable tracing ("tracing_enabled" in the config)
+#   AI_TOOLKIT_HELPER_PROFILE=1  also run the sampling profiler ("tracing_profile")
+
+TRACE_ENV_VAR = "AI_TOOLKIT_HELPER_TRACE"
+PROFILE_ENV_VAR = "AI_TOOLKIT_HELPER_PROFILE"
+TRACE_FOLDER = "traces"
+MAX_SPANS = 200000  # Oldest spans are dropped beyond this
+PROFILE_INTERVAL = 0.005
+
+class NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        # Spans inside asyncio tasks get a lane per task, so concurrent
+        # coroutines on one thread don't show up as wrongly nested
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        self.lane = id(task) if task else threading.get_ident()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args = dict(self.args, error=exc_type.__name__)
+        self.tracer.record(self.name, self.start, end - self.start, self.lane, self.args)
+        return False
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.process_name = "app"
+        self.spans = deque(maxlen=MAX_SPANS)  # (name, start ns, duration ns, lane, args)
+        self.lane_names = {}
+        self.origin = time.perf_counter_ns()
+        self.profiler = None
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def record(self, name, start, duration, lane, args):
+        # deque.append is atomic, so worker threads need no lock
+        self.spans.append((name, start, duration, lane, args))
+        if lane not in self.lane_names:
+            self.lane_names[lane] = threading.current_thread().name
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": self.process_name}}]
+        for lane, thread_name in list(self.lane_names.items()):
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": lane, "args": {"name": thread_name}})
+        for name, start, duration, lane, args in list(self.spans):
+            events.append({"name": name, "ph": "X", "pid": pid, "tid": lane,
+                           "ts": (start - self.origin) / 1000, "dur": duration / 1000, "args": args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self):
+        # {name: (count, total ms, p50 ms, p95 ms, max ms)}
+        durations = {}
+        for name, _, duration, _, _ in list(self.spans):
+            durations.setdefault(name, []).append(duration / 1e6)
+        result = {}
+        for name, values in durations.items():
+            values.sort()
+            result[name] = (len(values), sum(values), values[len(values) // 2],
+                            values[min(len(values) - 1, int(len(values) * 0.95))], values[-1])
+        return result
+
+    def format_summary(self):
+        rows = sorted(self.summary().items(), key=lambda item: item[1][1], reverse=True)
+        lines = [f"{'span':<32} {'count':>8} {'total ms':>11} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for name, (count, total, p50, p95, longest) in rows:
+            lines.append(f"{name:<32} {count:>8} {total:>11.1f} {p50:>9.2f} {p95:>9.2f} {longest:>9.2f}")
+        return "\n".join(lines)
+
+    def save(self, folder=TRACE_FOLDER):
+        # Returns the trace path, or None when nothing was recorded
+        if not self.spans and not self.profiler:
+            return None
+        os.makedirs(folder, exist_ok=True)
+        base = os.path.join(folder, f"{self.process_name}_{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}")
+        with open(base + ".trace.json", 'w') as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+        with open(base + ".summary.txt", 'w') as summary_file:
+            summary_file.write(self.format_summary() + "\n")
+        if self.profiler:
+            self.profiler.save(base + ".folded")
+        return base + ".trace.json"
+
+class SamplingProfiler:
+    # Samples every thread's stack on an interval and counts them in the
+    # folded format flamegraph tools read (e.g. speedscope, flamegraph.pl)
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        own_ident = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            samples = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                samples.append(";".join(reversed(stack)))
+            with self.lock:
+                self.stacks.update(samples)
+
+    def save(self, path):
+        with self.lock:
+            stacks = self.stacks.most_common()
+        with open(path, 'w') as folded_file:
+            for stack, count in stacks:
+                folded_file.write(f"{stack} {count}\n")
+
+tracer = Tracer()
+
+def span(name, **args):
+    return tracer.span(name, **args)
+
+def traced(name):
+    # Decorator form of span() for whole functions
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def env_flag(name):
+    return os.environ.get(name, "").lower() not in ("", "0", "false", "no")
+
+def configure(config, process_name):
+    # Call once at startup; the environment overrides the config file
+    tracer.process_name = process_name
+    tracer.enabled = env_flag(TRACE_ENV_VAR) or bool(config.get("tracing_enabled", False))
+    if not tracer.enabled:
+        return False
+    if env_flag(PROFILE_ENV_VAR) or config.get("tracing_profile", False):
+        tracer.profiler = SamplingProfiler().start()
+    atexit.register(save)
+    return True
+
+def save(folder=TRACE_FOLDER):
+    path = tracer.save(folder)
+    if path:
+        print(f"Trace written to {path}")
+    return path